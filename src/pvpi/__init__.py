@@ -1,3 +1,27 @@
-from .client import PvPiClient
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ["PvPiClient"]
+if TYPE_CHECKING:
+    from .async_client import AsyncPvPiClient
+    from .client import PvPiClient, PvPiSnapshot
+
+__all__ = ["AsyncPvPiClient", "PvPiClient", "PvPiSnapshot"]
+
+# Public name -> submodule, imported on first access so `import pvpi.<module>` (e.g. by the CLI) stays cheap
+_LAZY_IMPORTS = {
+    "AsyncPvPiClient": ".async_client",
+    "PvPiClient": ".client",
+    "PvPiSnapshot": ".client",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
@@ -0,0 +1,178 @@
+import logging
+from datetime import datetime, time
+from typing import Literal
+
+from pvpi.async_transports import AsyncBaseTransportInterface, AsyncZmqSerialProxyInterface
+from pvpi.client import (
+    SNAPSHOT_COMMANDS,
+    PvPiChargeState,
+    PvPiChargeStateDescriptions,
+    PvPiClient,
+    PvPiFaultState,
+    PvPiSnapshot,
+    _check_ok,
+    _fault_descriptions,
+    _parse_battery_current,
+    _parse_battery_voltage,
+    _parse_board_temp,
+    _parse_charge_state,
+    _parse_device_version,
+    _parse_fault_code,
+    _parse_mcu_time,
+    _parse_pv_current,
+    _parse_pv_voltage,
+    _power_off_command,
+    _set_alarm_command,
+    _set_max_charge_current_command,
+    _set_max_input_current_command,
+    _set_mcu_time_command,
+    _set_on_off_command,
+    _set_wakeup_voltage_command,
+    _set_watchdog_command,
+    _table_soc_estimator,
+)
+from pvpi.soc import SocEstimator
+
+_logger = logging.getLogger(__name__)
+
+
+class AsyncPvPiClient:
+    """
+    Asyncio counterpart of `PvPiClient`, talking to the UART proxy.
+
+    Every method is a coroutine and several may be awaited concurrently, e.g.
+    `await asyncio.gather(client.get_battery_voltage(), client.get_pv_voltage())`.
+    """
+
+    voltage_soc_table = PvPiClient.voltage_soc_table
+
+    def __init__(self, interface: AsyncBaseTransportInterface | None = None, soc_estimator: SocEstimator | None = None):
+        self._interface = interface or AsyncZmqSerialProxyInterface()
+        self.soc_estimator = soc_estimator or _table_soc_estimator(self.voltage_soc_table)
+
+    def close(self):
+        self._interface.close()
+
+    async def get_alive(self) -> bool:
+        """Return True if PV PI is responsive"""
+        return await self._interface.write(message=b"GET_ALIVE") == "ALIVE"
+
+    async def get_device_version(self) -> tuple[str, str, str]:
+        """Return the device name and version"""
+        return _parse_device_version(await self._interface.write(message=b"GET_VERSION"))
+
+    async def get_battery_voltage(self) -> float:
+        """Read battery voltage (V)"""
+        return _parse_battery_voltage(await self._interface.write(b"GET_BAT_V"))
+
+    async def get_battery_current(self) -> float:
+        """Read battery current (A)"""
+        return _parse_battery_current(await self._interface.write(b"GET_BAT_C"))
+
+    async def get_pv_voltage(self) -> float:
+        """Read PV (solar) voltage (V)"""
+        return _parse_pv_voltage(await self._interface.write(b"GET_PV_V"))
+
+    async def get_pv_current(self) -> float:
+        """Read PV (solar) current (A)"""
+        return _parse_pv_current(await self._interface.write(b"GET_PV_C"))
+
+    async def get_board_temp(self) -> int:
+        """Get the PVPI Board temperature (Degrees Celsius)"""
+        return _parse_board_temp(await self._interface.write(b"GET_TEMP"))
+
+    async def estimated_soc(self) -> float:
+        """
+        Estimate State of Charge (SoC %) of the battery (by default 12V (4S) LiFePO4)
+        from resting voltage using linear interpolation.
+        """
+        return self.soc_estimator(await self.get_battery_voltage())
+
+    @classmethod
+    def soc_from_voltage(cls, voltage: float) -> float:
+        """Estimate State of Charge (SoC %) from an already-read battery voltage, using `voltage_soc_table`."""
+        return _table_soc_estimator(cls.voltage_soc_table)(voltage)
+
+    async def read_snapshot(self) -> PvPiSnapshot:
+        """Read all telemetry in a single pipelined transport exchange"""
+        responses = await self._interface.write_many(SNAPSHOT_COMMANDS)
+        return PvPiSnapshot.from_responses(responses, soc_from_voltage=self.soc_estimator)
+
+    # ---------------------- Time Sync Commands ---------------------- #
+    async def set_mcu_time(self, dt: datetime | None = None):
+        """Returns success bool for setting STM32 RTC"""
+        resp = await self._interface.write(_set_mcu_time_command(dt))
+        _check_ok(resp, "Failed to set MCU time")
+
+    async def get_mcu_time(self) -> datetime:
+        """Read STM32 RTC"""
+        return _parse_mcu_time(await self._interface.write(b"GET_TIME"))
+
+    async def set_alarm(self, pyt: time):
+        """Set Pv PI STM32 alarm using a datetime time object"""
+        resp = (await self._interface.write(_set_alarm_command(pyt))).replace(" ", "")
+        _check_ok(resp, "Failed to set alarm")
+
+    # ---------------------- Power Commands ---------------------- #
+    async def power_off(self, delay_s: int = 30):
+        """Schedule power-off after delay (seconds)"""
+        resp = await self._interface.write(_power_off_command(delay_s))
+        _check_ok(resp, "Failed to power off")
+
+    async def set_watchdog(self, watchdog_period_min: int):
+        """Set the power watchdog"""
+        resp = await self._interface.write(_set_watchdog_command(watchdog_period_min))
+        _check_ok(resp, "Failed to set power watchdog")
+
+    async def stop_watchdog(self):
+        """Stop the Power watchdog"""
+        resp = await self._interface.write(b"WATCHDOG_OFF")
+        _check_ok(resp, "Failed to stop power watchdog")
+
+    async def set_wakeup_voltage(self, voltage: float):
+        """Set the voltage at which the PV PI will wake the system"""
+        resp = await self._interface.write(_set_wakeup_voltage_command(voltage))
+        _check_ok(resp, "Failed to set wakeup voltage")
+
+    async def set_max_charge_current(self, current: float):
+        """Set the maximum battery charge current for the PV PI"""
+        resp = await self._interface.write(_set_max_charge_current_command(current))
+        _check_ok(resp, "Failed to set max charge current")
+
+    async def set_max_input_current(self, current: float):
+        """Set the maximum input current for the PV PI"""
+        resp = await self._interface.write(_set_max_input_current_command(current))
+        _check_ok(resp, "Failed to set max charge current")
+
+    # ---------------------- Fault and Status Commands ---------------------- #
+    async def get_charge_state_code(self) -> PvPiChargeState:
+        """Get PV PI charge state"""
+        return _parse_charge_state(await self._interface.write(b"GET_CHARGE_STATE"))
+
+    async def get_charge_state(self) -> str:
+        """Get PV PI charge state description"""
+        charge_state_code = await self.get_charge_state_code()
+        return PvPiChargeStateDescriptions[charge_state_code]
+
+    async def get_fault_code(self) -> PvPiFaultState:
+        return _parse_fault_code(await self._interface.write(b"GET_FAULT_CODE"))
+
+    async def get_fault_states(self) -> list[str]:
+        """Get PV PI fault states description"""
+        return _fault_descriptions(await self.get_fault_code())
+
+    # ---------------------- Set Behaviour Commands ---------------------- #
+    async def set_mppt_state(self, state: Literal["ON", "OFF"]):
+        """Enable/Disable the Maximum Power Point Tracking"""
+        resp = await self._interface.write(_set_on_off_command("SET_MPPT_STATE", state))
+        _check_ok(resp, "Failed to set MPPT")
+
+    async def set_ts_state(self, state: Literal["ON", "OFF"]):
+        """Enable/Disable the BQ25756 Battery Temperature monitoring"""
+        resp = await self._interface.write(_set_on_off_command("SET_TS_STATE", state))
+        _check_ok(resp, "Failed to set TS")
+
+    async def set_charge_state(self, state: Literal["ON", "OFF"]):
+        """Enable/Disable the PV PI charging"""
+        resp = await self._interface.write(_set_on_off_command("SET_CHARGE_STATE", state))
+        _check_ok(resp, "Failed to set charging state")
@@ -0,0 +1,120 @@
+"""Asyncio transports, kept apart from `pvpi.transports` so sync callers don't pay for importing asyncio."""
+
+import asyncio
+import itertools
+import json
+import logging
+from collections.abc import Sequence
+from typing import Protocol
+
+import zmq
+import zmq.asyncio
+
+from pvpi.transports import _decode_reply, _new_client_id, default_proxy_addr
+
+_logger = logging.getLogger(__name__)
+
+
+class AsyncBaseTransportInterface(Protocol):
+    async def write(self, message: bytes) -> str: ...
+    def close(self) -> None: ...
+
+    async def write_many(self, messages: Sequence[bytes]) -> list[str]:
+        """Send several commands in one exchange, returning responses in request order."""
+        return [await self.write(message) for message in messages]
+
+
+class AsyncZmqSerialProxyInterface(AsyncBaseTransportInterface):
+    """
+    Asyncio DEALER transport to the UART proxy.
+
+    Requests are tagged with a sequence number, so several awaits can be outstanding on the one socket and
+    each completes as soon as the proxy answers it.
+    """
+
+    def __init__(self, addr: str | None = None, recv_timeout_ms=10_000, max_in_flight: int = 64):
+        self.addr = addr or default_proxy_addr()
+        self.recv_timeout_ms = recv_timeout_ms
+
+        _logger.info("Connecting to socket at %s", self.addr)
+        self.context = zmq.asyncio.Context()
+        self.socket = self.context.socket(zmq.DEALER)
+        self.client_id = _new_client_id("async")
+        self.socket.setsockopt(zmq.IDENTITY, self.client_id)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.setsockopt(zmq.CONNECT_TIMEOUT, 2_000)  # ms
+        self.socket.connect(self.addr)
+
+        self._seq = itertools.count(1)
+        self._pending: dict[int, asyncio.Future] = {}
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._reader: asyncio.Task | None = None
+
+    @classmethod
+    async def connect(cls, *args, **kwargs) -> "AsyncZmqSerialProxyInterface":
+        """Create an interface and check the proxy answers a heartbeat"""
+        interface = cls(*args, **kwargs)
+        if not await interface.send_heartbeat():
+            interface.close()
+            raise ValueError("AsyncZmqSerialProxyInterface failed heartbeat")
+        return interface
+
+    def close(self):
+        _logger.info("Closing socket...")
+        if self._reader is not None:
+            self._reader.cancel()
+        self.socket.close()
+        self.context.term()
+
+    async def _read_replies(self):
+        """Dispatch every reply to the future of the request it answers"""
+        while True:
+            seq, responses = _decode_reply(await self.socket.recv_multipart())
+            future = self._pending.pop(seq, None)
+            if future is None or future.done():
+                _logger.debug("Discarding stale reply [%i] from proxy", seq)
+                continue
+            future.set_result(responses)
+
+    async def _request(self, frames: list[bytes]) -> list[bytes]:
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read_replies())
+
+        async with self._in_flight:
+            seq = next(self._seq)
+            future = asyncio.get_running_loop().create_future()
+            self._pending[seq] = future
+            try:
+                await self.socket.send_multipart([str(seq).encode(), *frames])
+                _logger.debug("Written to proxy [%i]: %s", seq, frames)
+                responses = await asyncio.wait_for(future, self.recv_timeout_ms / 1000)
+            except TimeoutError:
+                _logger.debug("Timed out waiting for response from zmq-serial proxy")
+                raise zmq.Again("Timed out waiting for response from zmq-serial proxy") from None
+            finally:
+                self._pending.pop(seq, None)
+            _logger.debug("Received from proxy [%i]: %s", seq, responses)
+            return responses
+
+    async def send_heartbeat(self) -> bool:
+        try:
+            _logger.info("Sending heartbeat")
+            return await self.write(b"") == ""
+        except Exception:
+            _logger.debug("Heartbeat failed to respond")
+            return False
+
+    async def get_proxy_stats(self) -> dict:
+        """Return the proxy's serial queue depth and wait time statistics"""
+        return json.loads(await self.write(b"PROXY_STATS"))
+
+    async def write(self, message: bytes) -> str:
+        return (await self.write_many([message]))[0]
+
+    async def write_many(self, messages: Sequence[bytes]) -> list[str]:
+        if not messages:
+            return []
+        responses = await self._request(list(messages))
+        if len(responses) != len(messages):
+            raise ValueError(f"Expected {len(messages)} responses from proxy, got {len(responses)}")
+        return [response.decode() for response in responses]
@@ -0,0 +1,128 @@
+"""
+Repeatable performance benchmarks, run with `pvpi bench`.
+
+Each suite is a module with a `run(params: BenchParams) -> list[BenchResult]` function. Results are emitted as
+JSON so runs from different commits (or devices) can be compared.
+"""
+
+import gc
+import importlib
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Sequence
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from importlib import metadata
+
+# Suite name -> module implementing it
+SUITES = {
+    "datapath": "pvpi.bench.datapath",
+    "transport": "pvpi.bench.transport",
+    "import": "pvpi.bench.startup",
+}
+
+
+@dataclass
+class BenchParams:
+    repeat: int = 5
+    days: int = 60  # days of synthetic history
+    period_sec: int = 10  # seconds between synthetic history rows
+    soc_size: int = 200_000  # voltages per SoC estimate run
+    log_rows: int = 20_000  # rows per logger run
+    chart_max_points: int = 1000  # dashboard chart point budget, as `PvPiConfig.chart_max_points`
+    load_clients: tuple[int, ...] = (1, 4, 16)  # client counts of the proxy load test sweep
+    load_duration_sec: float = 3.0  # per load test
+    import_budget_scale: float = 1.0  # multiplies the import time budgets, e.g. 10 on a Pi Zero
+
+
+@dataclass
+class BenchResult:
+    name: str
+    repeat: int
+    items: int  # units of work per run, e.g. rows logged
+    min_ms: float
+    median_ms: float
+    mean_ms: float
+    max_ms: float
+    peak_mem_kib: float  # peak traced allocation during one run
+    items_per_sec: float
+    extra: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def measure(
+    name: str,
+    func: Callable[[], object],
+    repeat: int = 5,
+    items: int = 1,
+    setup: Callable[[], object] | None = None,
+    **extra,
+) -> BenchResult:
+    """
+    Time `func` over `repeat` runs, then trace its peak memory over one more.
+
+    `setup`, if given, runs untimed before every run (e.g. to reset a cache). Memory is traced separately
+    because tracemalloc slows allocation-heavy code down several times.
+    """
+    timings_ms = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings_ms.append((time.perf_counter() - start) * 1000)
+
+    if setup is not None:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    median_ms = statistics.median(timings_ms)
+    return BenchResult(
+        name=name,
+        repeat=repeat,
+        items=items,
+        min_ms=round(min(timings_ms), 3),
+        median_ms=round(median_ms, 3),
+        mean_ms=round(statistics.fmean(timings_ms), 3),
+        max_ms=round(max(timings_ms), 3),
+        peak_mem_kib=round(peak / 1024, 1),
+        items_per_sec=round(items / (median_ms / 1000), 1) if median_ms else 0.0,
+        extra=extra,
+    )
+
+
+def environment() -> dict:
+    """Where the benchmarks ran, to tell results from different devices apart"""
+    try:
+        version = metadata.version("pvpi")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    return {
+        "pvpi_version": version,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def run_suites(suites: Sequence[str], params: BenchParams) -> dict:
+    """Run the named suites, returning the JSON-serializable report"""
+    results = []
+    for suite in suites:
+        module = importlib.import_module(SUITES[suite])
+        for result in module.run(params):
+            results.append({"suite": suite, **result.as_dict()})
+    return {"environment": environment(), "params": asdict(params), "results": results}
@@ -0,0 +1,213 @@
+"""Benchmarks of the non-transport hot paths: logging, history loading, SoC estimation and dashboard transforms."""
+
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pvpi import telemetry_store
+from pvpi.bench import BenchParams, BenchResult, measure
+from pvpi.charts import DownsampleMethod, trend_frame
+from pvpi.client import PvPiClient
+from pvpi.history import CSV_TIMESTAMP_FORMAT, IncrementalHistoryLoader
+from pvpi.logging_ import RotatingCSVLogger
+from pvpi.soc import SocEstimator
+from pvpi.telemetry_store import DEFAULT_CHANNELS, BinaryTelemetryLogger
+from pvpi.utils import local_timezone
+
+
+def synthetic_day(day: date, period_sec: int, rng: np.random.Generator) -> pd.DataFrame:
+    """One day of plausible log rows: a half-sine solar day charging a 12 V battery"""
+    seconds = np.arange(0, 24 * 60 * 60, period_sec)
+    hours = seconds / 3600
+    sun = np.clip(np.sin(np.pi * (hours - 6) / 12), 0, None)
+    pv_voltage = np.where(sun > 0, 18.0, 0.4) + rng.normal(0, 0.01, len(seconds))
+    pv_current = sun * 5.5 + np.abs(rng.normal(0, 0.005, len(seconds)))
+    battery_current = sun * 5.0 - 0.4 + rng.normal(0, 0.01, len(seconds))
+    battery_voltage = 12.9 + 0.4 * sun + rng.normal(0, 0.005, len(seconds))
+    temperature = np.round(25 + 10 * sun)
+    timestamps = pd.Timestamp(day) + pd.to_timedelta(seconds, unit="s")
+    return pd.DataFrame(
+        {
+            "Timestamp": timestamps,
+            "Battery Voltage": battery_voltage.round(3),
+            "Battery Current": battery_current.round(3),
+            "PV Voltage": pv_voltage.round(3),
+            "PV Current": pv_current.round(3),
+            "PV PI Temperature": temperature,
+        }
+    )
+
+
+def write_synthetic_history(log_dir: Path, days: int, period_sec: int, log_format: str = "csv", seed: int = 0) -> int:
+    """Write `days` daily log files ending today, in the manager's file format. Returns the rows written."""
+    log_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    rows = 0
+    for offset in range(days - 1, -1, -1):
+        day = date.today() - timedelta(days=offset)
+        frame = synthetic_day(day, period_sec, rng)
+        rows += len(frame)
+        if log_format == "binary":
+            dtype = [("Timestamp", "<i8")] + [(name, "<f4") for name in DEFAULT_CHANNELS]
+            records = np.empty(len(frame), dtype=dtype)
+            local = frame["Timestamp"].dt.tz_localize(
+                local_timezone(), ambiguous=np.zeros(len(frame), dtype=bool), nonexistent="shift_forward"
+            )
+            records["Timestamp"] = local.dt.as_unit("ns").astype("int64")
+            for name in DEFAULT_CHANNELS:
+                records[name] = frame[name]
+            path = log_dir / f"{day:%Y-%m-%d}{telemetry_store.FILE_SUFFIX}"
+            path.write_bytes(telemetry_store._encode_header(DEFAULT_CHANNELS) + records.tobytes())
+        else:
+            frame.to_csv(log_dir / f"{day:%Y-%m-%d}.csv", index=False, date_format=CSV_TIMESTAMP_FORMAT)
+    return rows
+
+
+def dashboard_pipeline(
+    frame: pd.DataFrame, max_points: int = 1000, method: DownsampleMethod = "minmax"
+) -> list[pd.DataFrame]:
+    """
+    The dashboard's chart transforms of the loaded date range: one `set_index`, then per chart rolling mean,
+    downsampling to `max_points` (0 keeps every point) and long format
+    """
+    df_charts = frame.set_index("Timestamp")
+    series = [
+        df_charts["PV Voltage"],
+        df_charts["PV Current"],
+        df_charts["PV Voltage"] * df_charts["PV Current"],
+        df_charts["Battery Voltage"],
+        df_charts["Battery Current"],
+        df_charts["Battery Voltage"] * df_charts["Battery Current"],
+        df_charts["PV PI Temperature"],
+    ]
+    return [trend_frame(values, max_points=max_points, method=method) for values in series]
+
+
+def _bench_loggers(params: BenchParams, tmp: Path) -> list[BenchResult]:
+    results = []
+    for name, logger_class, kwargs in (
+        ("log_stats_csv", RotatingCSVLogger, {}),
+        ("log_stats_csv_group_commit", RotatingCSVLogger, {"flush_interval_sec": 5}),
+        ("log_stats_binary", BinaryTelemetryLogger, {}),
+    ):
+        log_dir = tmp / name
+        log_dir.mkdir()
+
+        def log_rows(logger_class=logger_class, log_dir=log_dir, kwargs=kwargs):
+            logger = logger_class(log_dir, **kwargs)
+            for i in range(params.log_rows):
+                logger.log_stats(13.1, 2.5, 18.0, 1.9, 30 + i % 5)
+            logger.close()
+
+        results.append(measure(name, log_rows, repeat=params.repeat, items=params.log_rows, **kwargs))
+    return results
+
+
+def _bench_history(params: BenchParams, tmp: Path) -> tuple[list[BenchResult], pd.DataFrame]:
+    results = []
+    frame = None
+    for log_format in ("csv", "binary"):
+        log_dir = tmp / f"history_{log_format}"
+        rows = write_synthetic_history(log_dir, params.days, params.period_sec, log_format)
+        loader = IncrementalHistoryLoader(log_dir, log_format)
+
+        results.append(
+            measure(
+                f"load_all_data_{log_format}_cold",
+                loader.load,
+                repeat=params.repeat,
+                items=rows,
+                setup=loader.reset,
+                days=params.days,
+            )
+        )
+        frame = loader.load()
+        results.append(measure(f"load_all_data_{log_format}_unchanged", loader.load, repeat=params.repeat))
+
+        # The dashboard's default view, for which only the last days' files are opened
+        start_date, end_date = loader.date_range()
+        start_date = max(start_date, end_date - timedelta(days=2))
+        window_loader = IncrementalHistoryLoader(log_dir, log_format, start=start_date, end=end_date)
+        results.append(
+            measure(
+                f"load_window_{log_format}_cold",
+                window_loader.load,
+                repeat=params.repeat,
+                items=int(frame["Timestamp"].dt.date.between(start_date, end_date).sum()),
+                setup=window_loader.reset,
+                days=(end_date - start_date).days + 1,
+            )
+        )
+
+        # One new row per refresh, as when the manager logs between dashboard refreshes
+        logger = (
+            BinaryTelemetryLogger(log_dir, retention_days=params.days + 1)
+            if log_format == "binary"
+            else RotatingCSVLogger(log_dir, retention_days=params.days + 1)
+        )
+        results.append(
+            measure(
+                f"load_all_data_{log_format}_append",
+                loader.load,
+                repeat=params.repeat,
+                items=1,
+                setup=lambda logger=logger: (logger.log_stats(13.1, 2.5, 18.0, 1.9, 30), logger.flush()),
+            )
+        )
+        logger.close()
+    return results, frame
+
+
+def run(params: BenchParams) -> list[BenchResult]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="pvpi-bench-") as tmp:
+        tmp = Path(tmp)
+        results += _bench_loggers(params, tmp)
+        history_results, frame = _bench_history(params, tmp)
+        results += history_results
+
+    voltages = pd.Series(np.random.default_rng(0).uniform(11.8, 14.5, params.soc_size))
+    voltage_list = voltages.tolist()
+    soc_estimator = SocEstimator()
+    results.append(
+        measure(
+            "estimated_soc",
+            lambda: [PvPiClient.soc_from_voltage(voltage) for voltage in voltage_list],
+            repeat=params.repeat,
+            items=params.soc_size,
+        )
+    )
+    results.append(
+        measure(
+            "estimated_soc_series",
+            lambda: soc_estimator.estimate(voltages),
+            repeat=params.repeat,
+            items=params.soc_size,
+        )
+    )
+
+    # The loader only reads the date range's files, so the pipeline starts from the range's rows
+    end_date = frame["Timestamp"].max().date()
+    for name, start_date, max_points, method in (
+        ("dashboard_pipeline_2d", end_date - timedelta(days=2), params.chart_max_points, "minmax"),
+        ("dashboard_pipeline_all", frame["Timestamp"].min().date(), params.chart_max_points, "minmax"),
+        ("dashboard_pipeline_all_lttb", frame["Timestamp"].min().date(), params.chart_max_points, "lttb"),
+        ("dashboard_pipeline_all_full", frame["Timestamp"].min().date(), 0, "minmax"),
+    ):
+        window = frame[frame["Timestamp"] >= pd.Timestamp(start_date)]
+        charts = dashboard_pipeline(window, max_points, method)
+        results.append(
+            measure(
+                name,
+                lambda window=window, max_points=max_points, method=method: dashboard_pipeline(
+                    window, max_points, method
+                ),
+                repeat=params.repeat,
+                items=len(window),
+                chart_points=sum(len(chart) for chart in charts),  # rows serialized to the browser
+            )
+        )
+    return results
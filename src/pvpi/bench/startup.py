@@ -0,0 +1,79 @@
+"""
+Cold start cost of the package and CLI, measured with `python -X importtime` in fresh interpreters.
+
+Each module has an import time budget and a list of heavy dependencies it must not pull in. The dependency check
+is the reliable regression guard, since it doesn't depend on the machine; `pvpi bench` exits non-zero if either
+is exceeded.
+"""
+
+import statistics
+import subprocess
+import sys
+
+from pvpi.bench import BenchParams, BenchResult
+
+_HEAVY = ("asyncio", "zmq", "serial", "pydantic", "pydantic_settings", "numpy", "pandas", "streamlit")
+
+# Module -> (import time budget in ms on a desktop-class machine, heavy modules it must not import).
+# `pvpi.client` is what most commands add on top of `pvpi.cli`, so it may bring in the sync transports.
+IMPORT_BUDGETS = {
+    "pvpi": (5.0, _HEAVY),
+    "pvpi.cli": (60.0, _HEAVY),
+    "pvpi.client": (120.0, ("asyncio", "pydantic", "pydantic_settings", "numpy", "pandas", "streamlit")),
+}
+
+
+def _import_once(module: str) -> tuple[float, set[str], int]:
+    """Import `module` in a fresh interpreter: cumulative import ms, every module imported and max RSS in KiB"""
+    code = f"import resource, {module}; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+    cumulative_ms = 0.0
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the column header
+        imported.add(name.strip())
+        if name.strip() == module and not name[1:].startswith(" "):
+            cumulative_ms = int(cumulative) / 1000
+    return cumulative_ms, imported, int(result.stdout.strip() or 0)
+
+
+def run(params: BenchParams) -> list[BenchResult]:
+    results = []
+    for module, (budget_ms, forbidden) in IMPORT_BUDGETS.items():
+        timings_ms = []
+        imported: set[str] = set()
+        max_rss_kib = 0
+        for _ in range(params.repeat):
+            elapsed_ms, imported, max_rss_kib = _import_once(module)
+            timings_ms.append(elapsed_ms)
+        budget_ms *= params.import_budget_scale
+        heavy_imports = sorted(name for name in forbidden if name in imported)
+        median_ms = statistics.median(timings_ms)
+        results.append(
+            BenchResult(
+                name=f"import_{module}",
+                repeat=params.repeat,
+                items=1,
+                min_ms=round(min(timings_ms), 3),
+                median_ms=round(median_ms, 3),
+                mean_ms=round(statistics.fmean(timings_ms), 3),
+                max_ms=round(max(timings_ms), 3),
+                peak_mem_kib=float(max_rss_kib),
+                items_per_sec=round(1000 / median_ms, 1) if median_ms else 0.0,
+                extra={
+                    "budget_ms": budget_ms,
+                    "heavy_imports": heavy_imports,
+                    "modules_imported": len(imported),
+                    # Best of the runs, so a busy machine doesn't fail the check
+                    "over_budget": min(timings_ms) > budget_ms or bool(heavy_imports),
+                    "peak_mem": "process max RSS",
+                },
+            )
+        )
+    return results
@@ -0,0 +1,320 @@
+"""
+Load test of the UART proxy: N concurrent clients against a `ZmqSerialProxy` backed by a simulated PV Pi.
+
+Each client runs a closed loop of requests drawn from a weighted mix, and the report gives latency
+percentiles, throughput, per-client fairness and timeouts, so saturation and tail latency can be compared
+across queueing changes.
+"""
+
+import asyncio
+import multiprocessing
+import random
+import resource
+import socket
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import zmq
+
+from pvpi.bench import BenchParams, BenchResult, measure
+from pvpi.client import SNAPSHOT_COMMANDS
+from pvpi.services.zmq_serial_proxy import TELEMETRY_READ_COMMANDS, ZmqSerialProxy
+from pvpi.simulator import SimulatedPvPi, SimulatedSerialDevice
+from pvpi.transports import SerialInterface, ZmqSerialProxyInterface
+
+# Request kind -> relative weight. Roughly a manager, dashboards polling live metrics and the odd cron job.
+DEFAULT_MIX = {"read": 60, "snapshot": 25, "write": 5, "heartbeat": 10}
+REQUEST_KINDS = ("read", "snapshot", "write", "heartbeat", "alive")
+
+
+def parse_mix(text: str) -> dict[str, int]:
+    """Parse a request mix such as `read=60,snapshot=25,write=5,heartbeat=10`"""
+    mix = {}
+    for item in text.split(","):
+        kind, _, weight = item.partition("=")
+        kind = kind.strip()
+        if kind not in REQUEST_KINDS:
+            raise ValueError(f"Unknown request kind {kind!r}, expected one of {', '.join(REQUEST_KINDS)}")
+        mix[kind] = int(weight or 1)
+    return mix
+
+
+@dataclass
+class LoadTestParams:
+    clients: int = 4
+    duration_sec: float = 5.0
+    mix: Mapping[str, int] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    think_ms: float = 0.0  # pause between a client's requests; 0 runs each client flat out
+    uart_latency_ms: float = 5.0  # simulated PV Pi time per command
+    uart_jitter_ms: float = 0.0
+    uart: str = "inprocess"  # "inprocess" or "pty" (through SerialInterface, like the real deployment)
+    endpoint: str = "tcp"  # proxy endpoint clients connect to: "tcp" (loopback) or "ipc" (Unix socket)
+    cache_ttl_sec: float = 1.0
+    recv_timeout_ms: int = 2_000
+    processes: bool = False  # one process per client instead of one thread
+    seed: int = 0
+
+
+@dataclass
+class _ClientResult:
+    latencies_ms: dict[str, list[float]]
+    timeouts: int = 0
+    errors: int = 0
+
+
+def _free_tcp_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _proxy_addr(endpoint: str) -> str:
+    """A free proxy address for the endpoint kind"""
+    if endpoint == "ipc":
+        return f"ipc://{tempfile.gettempdir()}/pvpi-bench-{uuid.uuid4().hex[:12]}.ipc"
+    return f"tcp://127.0.0.1:{_free_tcp_port()}"
+
+
+def _percentile(sorted_values: Sequence[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _latency_summary(latencies_ms: Sequence[float]) -> dict:
+    ordered = sorted(latencies_ms)
+    return {
+        "count": len(ordered),
+        "min_ms": round(ordered[0], 3) if ordered else 0.0,
+        "p50_ms": round(_percentile(ordered, 50), 3),
+        "p95_ms": round(_percentile(ordered, 95), 3),
+        "p99_ms": round(_percentile(ordered, 99), 3),
+        "max_ms": round(ordered[-1], 3) if ordered else 0.0,
+        "mean_ms": round(statistics.fmean(ordered), 3) if ordered else 0.0,
+    }
+
+
+def _jain_fairness(values: Sequence[float]) -> float:
+    """Jain's fairness index: 1 when every client got the same throughput, 1/N when one got it all"""
+    if not values or not any(values):
+        return 0.0
+    return sum(values) ** 2 / (len(values) * sum(value * value for value in values))
+
+
+class _ProxyThread:
+    """Runs a `ZmqSerialProxy` on its own event loop thread"""
+
+    def __init__(self, params: LoadTestParams, addr: str):
+        self.params = params
+        self.addr = addr
+        self.pvpi = SimulatedPvPi(
+            latency_sec=params.uart_latency_ms / 1000, jitter_sec=params.uart_jitter_ms / 1000, seed=params.seed
+        )
+        self._device: SimulatedSerialDevice | None = None
+        self._proxy: ZmqSerialProxy | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="pvpi-loadtest-proxy", daemon=True)
+
+    def __enter__(self) -> "_ProxyThread":
+        serial_interface = self.pvpi
+        if self.params.uart == "pty":
+            self._device = SimulatedSerialDevice(self.pvpi).start()
+            serial_interface = SerialInterface(port=self._device.port, timeout_sec=1)
+        self._serial_interface = serial_interface
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def __exit__(self, *exc):
+        self._loop.call_soon_threadsafe(self._proxy.close)
+        self._thread.join()
+        self._serial_interface.close()
+        if self._device is not None:
+            self._device.stop()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        is_ipc = self.addr.startswith("ipc://")
+        self._proxy = ZmqSerialProxy(
+            serial_interface=self._serial_interface,
+            bind_addr="" if is_ipc else self.addr.replace("127.0.0.1", "*"),
+            ipc_addr=self.addr if is_ipc else "",
+            timeout_ms=100,
+            cache_ttl_sec=self.params.cache_ttl_sec,
+        )
+        self._loop.call_soon(self._started.set)
+        try:
+            self._loop.run_until_complete(self._proxy.run())
+        finally:
+            self._loop.close()
+
+
+def _warm_up():
+    """Submitted to each worker before the test; unpickling it imports this module in worker processes"""
+    time.sleep(0.1)
+
+
+def _client(index: int, params: LoadTestParams, addr: str, start_at: float, stop_at: float) -> _ClientResult:
+    """One client's closed request loop. Runs in a worker thread or process."""
+    rng = random.Random(params.seed * 1_000 + index)
+    kinds = list(params.mix)
+    weights = [params.mix[kind] for kind in kinds]
+    result = _ClientResult(latencies_ms={kind: [] for kind in kinds})
+    interface = ZmqSerialProxyInterface(addr, recv_timeout_ms=params.recv_timeout_ms)
+    try:
+        time.sleep(max(0.0, start_at - time.time()))  # start every client together
+        while time.time() < stop_at:
+            kind = rng.choices(kinds, weights)[0]
+            started = time.perf_counter()
+            try:
+                if kind == "read":
+                    interface.write(rng.choice(TELEMETRY_READ_COMMANDS))
+                elif kind == "snapshot":
+                    interface.write_many(SNAPSHOT_COMMANDS)
+                elif kind == "write":
+                    interface.write(b"SET_CHARGE_STATE,ON")
+                elif kind == "alive":
+                    interface.write(b"GET_ALIVE")
+                else:
+                    interface.write(b"")
+            except zmq.Again:
+                result.timeouts += 1
+                continue
+            except Exception:
+                result.errors += 1
+                continue
+            result.latencies_ms[kind].append((time.perf_counter() - started) * 1000)
+            if params.think_ms:
+                time.sleep(params.think_ms / 1000)
+    finally:
+        interface.close()
+    return result
+
+
+def run_load_test(params: LoadTestParams) -> dict:
+    """Run one load test, returning its JSON-serializable report"""
+    addr = _proxy_addr(params.endpoint)
+    with _ProxyThread(params, addr) as proxy:
+        if params.processes:
+            executor = ProcessPoolExecutor(max_workers=params.clients, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            executor = ThreadPoolExecutor(max_workers=params.clients)
+        with executor:
+            # Start (and import into) every worker first, so slow process start-up doesn't eat into the test
+            for future in [executor.submit(_warm_up) for _ in range(params.clients)]:
+                future.result()
+            start_at = time.time() + 0.5 + 0.05 * params.clients  # leave time for every client to connect
+            stop_at = start_at + params.duration_sec
+            futures = [
+                executor.submit(_client, index, params, addr, start_at, stop_at) for index in range(params.clients)
+            ]
+            client_results = [future.result() for future in futures]
+        elapsed_sec = max(time.time(), stop_at) - start_at
+
+        stats_interface = ZmqSerialProxyInterface(addr)
+        try:
+            proxy_stats = stats_interface.get_proxy_stats()
+        finally:
+            stats_interface.close()
+        uart_commands = proxy.pvpi.commands_served
+
+    all_latencies = []
+    by_kind: dict[str, list[float]] = {}
+    per_client = []
+    for index, client_result in enumerate(client_results):
+        latencies = [latency for values in client_result.latencies_ms.values() for latency in values]
+        all_latencies += latencies
+        for kind, values in client_result.latencies_ms.items():
+            by_kind.setdefault(kind, []).extend(values)
+        per_client.append(
+            {
+                "client": index,
+                "requests_per_sec": round(len(latencies) / elapsed_sec, 1),
+                "timeouts": client_result.timeouts,
+                "errors": client_result.errors,
+                **_latency_summary(latencies),
+            }
+        )
+
+    throughputs = [client["requests_per_sec"] for client in per_client]
+    return {
+        "params": {**params.__dict__, "mix": dict(params.mix)},
+        "elapsed_sec": round(elapsed_sec, 3),
+        "requests": len(all_latencies),
+        "requests_per_sec": round(len(all_latencies) / elapsed_sec, 1),
+        "uart_commands_per_sec": round(uart_commands / elapsed_sec, 1),
+        "timeouts": sum(result.timeouts for result in client_results),
+        "errors": sum(result.errors for result in client_results),
+        "latency": _latency_summary(all_latencies),
+        "latency_by_kind": {kind: _latency_summary(values) for kind, values in by_kind.items()},
+        "fairness": {
+            "jain_index": round(_jain_fairness(throughputs), 4),
+            "min_max_ratio": round(min(throughputs) / max(throughputs), 4) if max(throughputs, default=0) else 0.0,
+        },
+        "clients": per_client,
+        "proxy_stats": proxy_stats,
+    }
+
+
+def _bench_endpoints(params: BenchParams) -> list[BenchResult]:
+    """Round trip latency over loopback TCP vs the IPC socket, for requests the proxy answers without the UART"""
+    results = []
+    round_trips = 1_000
+    for endpoint in ("tcp", "ipc"):
+        addr = _proxy_addr(endpoint)
+        with _ProxyThread(LoadTestParams(uart_latency_ms=0, cache_ttl_sec=3_600), addr):
+            interface = ZmqSerialProxyInterface(addr)
+            try:
+                for name, message in (("heartbeat", b""), ("cached_read", b"GET_BAT_V")):
+                    results.append(
+                        measure(
+                            f"proxy_{name}_{endpoint}",
+                            lambda message=message, interface=interface: [
+                                interface.write(message) for _ in range(round_trips)
+                            ],
+                            repeat=params.repeat,
+                            items=round_trips,
+                            endpoint=endpoint,
+                        )
+                    )
+            finally:
+                interface.close()
+    return results
+
+
+def run(params: BenchParams) -> list[BenchResult]:
+    """TCP vs IPC round trips, then a client count sweep at the default request mix, for `pvpi bench`"""
+    results = _bench_endpoints(params)
+    for clients in params.load_clients:
+        report = run_load_test(LoadTestParams(clients=clients, duration_sec=params.load_duration_sec))
+        latency = report["latency"]
+        results.append(
+            BenchResult(
+                name=f"proxy_load_{clients}_clients",
+                repeat=1,
+                items=report["requests"],
+                min_ms=latency["min_ms"],
+                median_ms=latency["p50_ms"],
+                mean_ms=latency["mean_ms"],
+                max_ms=latency["max_ms"],
+                peak_mem_kib=float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss),
+                items_per_sec=report["requests_per_sec"],
+                extra={
+                    "p95_ms": latency["p95_ms"],
+                    "p99_ms": latency["p99_ms"],
+                    "timeouts": report["timeouts"],
+                    "fairness": report["fairness"]["jain_index"],
+                    "uart_commands_per_sec": report["uart_commands_per_sec"],
+                    "peak_mem": "process max RSS",
+                },
+            )
+        )
+    return results
@@ -0,0 +1,81 @@
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+
+DownsampleMethod = Literal["minmax", "lttb"]
+
+
+def _minmax_indices(values: np.ndarray, max_points: int) -> np.ndarray:
+    """Positions of the min and max of each of at most `max_points // 2` equal-width buckets, in order"""
+    width = -(-len(values) // max(1, max_points // 2))
+    n_buckets = -(-len(values) // width)
+    padding = n_buckets * width - len(values)
+    lows = np.pad(values, (0, padding), constant_values=np.inf).reshape(n_buckets, width)
+    highs = np.pad(values, (0, padding), constant_values=-np.inf).reshape(n_buckets, width)
+    offsets = np.arange(n_buckets) * width
+    return np.unique(np.concatenate([offsets + lows.argmin(axis=1), offsets + highs.argmax(axis=1)]))
+
+
+def _lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Positions picked by Largest-Triangle-Three-Buckets, always keeping the first and last points"""
+    n = len(y)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    selected = np.empty(max_points, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        # Third vertex: the average of the next bucket (or the last point)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        # Twice the area of the triangle each candidate makes with the previous pick and that average
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(areas.argmax())
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample(series: pd.Series, max_points: int, method: DownsampleMethod = "minmax") -> pd.Series:
+    """
+    At most `max_points` points of a time series that keep its shape.
+
+    "minmax" keeps the lowest and highest point of each bucket, so every peak and dip survives; "lttb" picks the
+    point of each bucket that best preserves the line's visual shape. NaNs are dropped.
+    """
+    series = series.dropna()
+    if max_points <= 0 or len(series) <= max_points:
+        return series
+    values = series.to_numpy(dtype=float)
+    if method == "lttb":
+        if max_points < 3:
+            return series.iloc[[0, -1]].iloc[:max_points]
+        x = series.index.to_numpy().astype("int64", copy=False).astype(float)
+        return series.iloc[_lttb_indices(x, values, max_points)]
+    return series.iloc[_minmax_indices(values, max_points)]
+
+
+def trend_frame(
+    series: pd.Series, window: int = 12, max_points: int = 0, method: DownsampleMethod = "minmax"
+) -> pd.DataFrame:
+    """
+    Long-form frame of a series ("Raw Data") and its centred moving average, as charted by the dashboard.
+
+    The moving average is taken over the full series; each line is then downsampled to half of `max_points`
+    (0 keeps every point), so the chart's size doesn't grow with the date range.
+    """
+    trend = series.rolling(window=window, center=True).mean()
+    if max_points:
+        series = downsample(series, max_points // 2, method)
+        trend = downsample(trend, max_points // 2, method)
+    x = series.index.name or "index"
+    return pd.concat(
+        [
+            pd.DataFrame({x: line.index, "Type": name, "Value": line.to_numpy()})
+            for name, line in (("Raw Data", series), ("Moving Average", trend))
+        ],
+        ignore_index=True,
+    )
@@ -1,17 +1,15 @@
-import asyncio
+import json
 import logging
+import time
 from datetime import datetime
 from pathlib import Path
 
 import click
 
-from pvpi.client import PvPiClient
-from pvpi.config import PvPiConfig
 from pvpi.logging_ import init_logging
-from pvpi.services import system_manager
-from pvpi.services.zmq_serial_proxy import ZmqSerialProxy
-from pvpi.systemd import install_systemd, uninstall_systemd, restart_systemd, run_dashboard
-from pvpi.transports import SerialInterface
+
+# Commands import what they need when they run, so e.g. `pvpi get-faults` doesn't load the proxy, manager,
+# pydantic config or benchmarks on a Pi Zero. `pvpi bench --suite import` checks the start-up cost.
 
 logger = logging.getLogger("pvpi")
 
@@ -25,6 +23,8 @@ def cli(verbose: bool = False):
 
 @cli.command(short_help="Set Pv Pi MCU clock to match current device clock")
 def set_mcu_clock():
+    from pvpi.client import PvPiClient
+
     pvpi = PvPiClient()
     pvpi.get_alive()
     pvpi.set_mcu_time()
@@ -32,8 +32,13 @@ def set_mcu_clock():
 
 
 @cli.command(short_help="Run Pv Pi function test with default parameters")
-def connection_test():
-    client = PvPiClient()
+@click.option("--config", type=click.Path(file_okay=True, dir_okay=False), help="Config with the battery for SoC.")
+def connection_test(config: str | None = None):
+    from pvpi.client import PvPiClient
+    from pvpi.config import PvPiConfig
+    from pvpi.soc import SocEstimator
+
+    client = PvPiClient(soc_estimator=SocEstimator.from_config(PvPiConfig.from_file(path=config)))
     logger.info("Running PV PI function test!")
     logger.info("Checking connection...")
 
@@ -69,50 +74,50 @@ def connection_test():
     logger.info("PV PI Fault state: %s", client.get_fault_states())
 
     logger.info("PV PI Battery and PV input...")
-    bat_v = client.get_battery_voltage()
-    bat_c = client.get_battery_current()
-    bat_soc = client.estimated_soc()
-    pv_v = client.get_pv_voltage()
-    pv_c = client.get_pv_current()
-    temperature = client.get_board_temp()
-    logger.info("Battery: %s V, %s A", bat_v, bat_c)
-    logger.info("Estimated Battery SoC: %s %%", bat_soc)
-    logger.info("PV: %s V, %s A", pv_v, pv_c)
-    logger.info("PV PI Temp: %sC", temperature)
+    snapshot = client.read_snapshot()
+    logger.info("Battery: %s V, %s A", snapshot.battery_voltage, snapshot.battery_current)
+    logger.info("Estimated Battery SoC: %s %%", snapshot.soc)
+    logger.info("PV: %s V, %s A", snapshot.pv_voltage, snapshot.pv_current)
+    logger.info("PV PI Temp: %sC", snapshot.board_temp)
 
 
 @cli.command(short_help="Get Pv Pi Statistics")
-def get_stats():
-    client = PvPiClient()
+@click.option("--config", type=click.Path(file_okay=True, dir_okay=False), help="Config with the battery for SoC.")
+def get_stats(config: str | None = None):
+    from pvpi.client import PvPiClient
+    from pvpi.config import PvPiConfig
+    from pvpi.soc import SocEstimator
 
-    logger.info("PV PI Battery and PV input...")
-    bat_v = client.get_battery_voltage()
-    bat_c = client.get_battery_current()
-    bat_soc = client.estimated_soc()
+    client = PvPiClient(soc_estimator=SocEstimator.from_config(PvPiConfig.from_file(path=config)))
 
-    pv_v = client.get_pv_voltage()
-    pv_c = client.get_pv_current()
-    temperature = client.get_board_temp()
-    logger.info("Battery: %s V, %s A", bat_v, bat_c)
-    logger.info("Estimated Battery SoC: %s %%", bat_soc)
+    logger.info("PV PI Battery and PV input...")
+    snapshot = client.read_snapshot()
+    logger.info("Battery: %s V, %s A", snapshot.battery_voltage, snapshot.battery_current)
+    logger.info("Estimated Battery SoC: %s %%", snapshot.soc)
 
-    logger.info("PV: %s V, %s A", pv_v, pv_c)
-    logger.info("PV PI Temp: %sC", temperature)
+    logger.info("PV: %s V, %s A", snapshot.pv_voltage, snapshot.pv_current)
+    logger.info("PV PI Temp: %sC", snapshot.board_temp)
 
 
 @cli.command(short_help="Get Pv Pi Fault States")
 def get_faults():
+    from pvpi.client import PvPiClient
+
     client = PvPiClient()
     logger.info("PV PI Fault state: %s", client.get_fault_states())
 
 
 @cli.command(short_help="Get BQ25756 charging State")
 def get_charge_state():
+    from pvpi.client import PvPiClient
+
     client = PvPiClient()
     logger.info("BQ25756 Charge state: %s", client.get_charge_state())
 
 @cli.command(short_help="Get PV Pi PCB and Firmwware version")
 def get_version():
+    from pvpi.client import PvPiClient
+
     client = PvPiClient()
     device_name, hw_version, fw_version = client.get_device_version()
     logger.info("Device name: %s, PCB version: %s, Firmware version: %s", device_name, hw_version, fw_version)
@@ -120,6 +125,8 @@ def get_version():
 @cli.command(short_help="Set the maximum input current for the PV Pi")
 @click.option("--current", type=int, required=True, help="Maximum charge current in amps")
 def set_input_current(current: int):
+    from pvpi.client import PvPiClient
+
     client = PvPiClient()
     client.set_max_input_current(current)
     logger.info("PV Pi max input current set to: %s", current)
@@ -127,6 +134,8 @@ def set_input_current(current: int):
 @cli.command(short_help="Set the maximum battery charge current for the PV Pi")
 @click.option("--current", type=int, required=True, help="Maximum charge current in amps")
 def set_charge_current(current: int):
+    from pvpi.client import PvPiClient
+
     client = PvPiClient()
     client.set_max_charge_current(current)
     logger.info("PV Pi max battery charge current set to: %s", current)
@@ -134,6 +143,8 @@ def set_charge_current(current: int):
 @cli.command(short_help="Enable/Disable Pv Pi MPPT")
 @click.option("--enable", is_flag=True, help="Enable PV Pi MPPT.")
 def set_mppt(enable: bool = True):
+    from pvpi.client import PvPiClient
+
     state = "ON" if enable else "OFF"
     logger.info("Setting PV PI MPPT "  + state)
 
@@ -145,6 +156,8 @@ def set_mppt(enable: bool = True):
 @cli.command(short_help="Enable/Disable Pv Pi Charging")
 @click.option("--enable", is_flag=True, help="Enable PV Pi Charging.")
 def set_charging(enable: bool = True):
+    from pvpi.client import PvPiClient
+
     state = "ON" if enable else "OFF"
     logger.info("Setting PV PI Charging "  + state)
 
@@ -156,6 +169,8 @@ def set_charging(enable: bool = True):
 @cli.command(short_help="Enable/Disable BQ25756 Battery Temperature monitoring.")
 @click.option("--enable", is_flag=True, help="Enable BQ25756 Battery Temperature monitoring.")
 def set_ts(enable: bool = True):
+    from pvpi.client import PvPiClient
+
     state = "ON" if enable else "OFF"
     logger.info("Setting BQ25756 Temperature monitoring "  + state)
 
@@ -167,15 +182,236 @@ def set_ts(enable: bool = True):
 @cli.command()
 @click.option("--config", type=click.Path(file_okay=True, dir_okay=False))
 def uart_proxy(config: str | None = None):
+    import asyncio
+
+    from pvpi.config import PvPiConfig
+    from pvpi.metrics import MetricsRegistry, start_metrics_server
+    from pvpi.services.zmq_serial_proxy import ZmqSerialProxy
+    from pvpi.soc import SocEstimator
+    from pvpi.transports import SerialInterface
+
     _config = PvPiConfig.from_file(path=config)
     serial_interface = SerialInterface(port=_config.uart_port)
-    proxy_server = ZmqSerialProxy(serial_interface=serial_interface)
+    registry = None
+    if _config.proxy_metrics_port:
+        registry = MetricsRegistry()
+        try:
+            start_metrics_server(registry, _config.proxy_metrics_port)
+        except OSError as e:
+            logger.warning("Proxy metrics disabled, could not serve them on port %i: %s", _config.proxy_metrics_port, e)
+            registry = None
+    proxy_server = ZmqSerialProxy(
+        serial_interface=serial_interface,
+        bind_addr=_config.proxy_tcp_addr,
+        ipc_addr=_config.proxy_ipc_addr,
+        cache_ttl_sec=_config.proxy_cache_ttl,
+        sample_period_sec=_config.telemetry_publish_period,
+        shm_path=_config.telemetry_shm_path,
+        soc_estimator=SocEstimator.from_config(_config),
+        metrics=registry,
+    )
     asyncio.run(proxy_server.run())
 
 
+@cli.command(short_help="Serve a simulated Pv Pi on a pseudo-terminal")
+@click.option("--link", type=click.Path(dir_okay=False), help="Also symlink the pty here, e.g. for uart_port.")
+@click.option("--latency-ms", type=float, default=5.0, show_default=True, help="Time taken to answer each command.")
+@click.option("--jitter-ms", type=float, default=0.0, show_default=True, help="Random extra latency per command.")
+@click.option("--time-scale", type=float, default=1.0, show_default=True, help="Simulated seconds per real second.")
+@click.option("--seed", type=int, help="Seed for repeatable jitter and noise.")
+def simulate(link: str | None, latency_ms: float, jitter_ms: float, time_scale: float, seed: int | None):
+    from pvpi.simulator import SimulatedPvPi, SimulatedSerialDevice
+
+    pvpi = SimulatedPvPi(
+        latency_sec=latency_ms / 1000, jitter_sec=jitter_ms / 1000, time_scale=time_scale, seed=seed
+    )
+    with SimulatedSerialDevice(pvpi, link=Path(link) if link else None) as device:
+        logger.info("Set uart_port to %s to use it. Ctrl-C to stop.", device.port)
+        try:
+            while True:
+                time.sleep(60)
+                logger.info("Commands served: %i", pvpi.commands_served)
+        except KeyboardInterrupt:
+            pass
+
+
+@cli.command(short_help="Run performance benchmarks and print the results as JSON")
+@click.option("--suite", "suites", multiple=True, help="Suite to run: datapath, transport or import (default all).")
+@click.option("--repeat", type=int, default=5, show_default=True, help="Timed runs per benchmark.")
+@click.option("--days", type=int, default=60, show_default=True, help="Days of synthetic log history.")
+@click.option("--period", type=int, default=10, show_default=True, help="Seconds between synthetic log rows.")
+@click.option("--import-budget-scale", type=float, default=1.0, show_default=True, help="Scale import time budgets.")
+@click.option("--output", type=click.Path(dir_okay=False), help="Also write the JSON results to this file.")
+def bench(
+    suites: tuple[str, ...], repeat: int, days: int, period: int, import_budget_scale: float, output: str | None
+):
+    from pvpi.bench import SUITES, BenchParams, run_suites
+
+    unknown = sorted(set(suites) - set(SUITES))
+    if unknown:
+        raise click.BadParameter(f"unknown suite {', '.join(unknown)}, expected one of {', '.join(SUITES)}")
+    params = BenchParams(repeat=repeat, days=days, period_sec=period, import_budget_scale=import_budget_scale)
+    report = run_suites(suites or list(SUITES), params)
+    for result in report["results"]:
+        logger.info(
+            "%s/%s: median %.3f ms, peak %.1f KiB",
+            result["suite"],
+            result["name"],
+            result["median_ms"],
+            result["peak_mem_kib"],
+        )
+    text = json.dumps(report, indent=2)
+    if output:
+        Path(output).write_text(text)
+    click.echo(text)
+    over_budget = [result["name"] for result in report["results"] if result["extra"].get("over_budget")]
+    if over_budget:
+        raise click.ClickException(f"Over budget: {', '.join(over_budget)}")
+
+
+@cli.command(short_help="Load test the UART proxy with concurrent clients against a simulated Pv Pi")
+@click.option("--clients", default="1,4,16", show_default=True, help="Client count, or a comma separated sweep.")
+@click.option("--duration", type=float, default=5.0, show_default=True, help="Seconds per load test.")
+@click.option("--mix", default="read=60,snapshot=25,write=5,heartbeat=10", show_default=True, help="Request mix.")
+@click.option("--think-ms", type=float, default=0.0, show_default=True, help="Pause between a client's requests.")
+@click.option("--uart-latency-ms", type=float, default=5.0, show_default=True, help="Simulated time per command.")
+@click.option("--uart-jitter-ms", type=float, default=0.0, show_default=True, help="Simulated latency jitter.")
+@click.option("--uart", type=click.Choice(["inprocess", "pty"]), default="inprocess", show_default=True)
+@click.option("--endpoint", type=click.Choice(["tcp", "ipc"]), default="tcp", show_default=True, help="Proxy socket.")
+@click.option("--cache-ttl", type=float, default=1.0, show_default=True, help="Proxy read cache TTL in seconds.")
+@click.option("--timeout-ms", type=int, default=2_000, show_default=True, help="Client receive timeout.")
+@click.option("--processes", is_flag=True, help="Run each client in its own process rather than a thread.")
+@click.option("--output", type=click.Path(dir_okay=False), help="Also write the JSON results to this file.")
+def loadtest(
+    clients: str,
+    duration: float,
+    mix: str,
+    think_ms: float,
+    uart_latency_ms: float,
+    uart_jitter_ms: float,
+    uart: str,
+    endpoint: str,
+    cache_ttl: float,
+    timeout_ms: int,
+    processes: bool,
+    output: str | None,
+):
+    from pvpi.bench.transport import LoadTestParams, parse_mix, run_load_test
+
+    reports = []
+    for n_clients in (int(n) for n in clients.split(",")):
+        params = LoadTestParams(
+            clients=n_clients,
+            duration_sec=duration,
+            mix=parse_mix(mix),
+            think_ms=think_ms,
+            uart_latency_ms=uart_latency_ms,
+            uart_jitter_ms=uart_jitter_ms,
+            uart=uart,
+            endpoint=endpoint,
+            cache_ttl_sec=cache_ttl,
+            recv_timeout_ms=timeout_ms,
+            processes=processes,
+        )
+        report = run_load_test(params)
+        latency = report["latency"]
+        logger.info(
+            "%i clients: %.1f req/s, p50 %.2f ms, p95 %.2f ms, p99 %.2f ms, %i timeouts, fairness %.3f",
+            n_clients,
+            report["requests_per_sec"],
+            latency["p50_ms"],
+            latency["p95_ms"],
+            latency["p99_ms"],
+            report["timeouts"],
+            report["fairness"]["jain_index"],
+        )
+        reports.append(report)
+    text = json.dumps(reports, indent=2)
+    if output:
+        Path(output).write_text(text)
+    click.echo(text)
+
+
+@cli.command(short_help="Get UART proxy queue depth and wait time statistics")
+def proxy_stats():
+    from pvpi.transports import ZmqSerialProxyInterface
+
+    interface = ZmqSerialProxyInterface()
+    try:
+        for name, value in interface.get_proxy_stats().items():
+            if name != "serial_commands":  # shown by transport-stats
+                logger.info("%s: %s", name, value)
+    finally:
+        interface.close()
+
+
+@cli.command(short_help="Run raw PV Pi commands from stdin over one connection")
+@click.argument("commands", type=click.File("r"), default="-")
+def batch(commands):
+    """
+    Run raw PV Pi commands read from COMMANDS (default stdin), one per line (e.g. `GET_BAT_V`), printing one response line each.
+
+    Blank lines and `#` comments are skipped. A command that gets no reply prints `ERROR,TIMEOUT` and the batch
+    carries on. Responses are flushed as they arrive, so a script can hold `pvpi batch` open as a co-process.
+    """
+    import zmq
+
+    from pvpi.client import PvPiClient
+
+    client = PvPiClient()
+    for line in commands:
+        command = line.strip()
+        if not command or command.startswith("#"):
+            continue
+        try:
+            response = client.send_command(command)
+        except zmq.Again:
+            logger.warning("No response to %s", command)
+            response = "ERROR,TIMEOUT"
+        click.echo(response)
+
+
+@cli.command(short_help="Time PV Pi commands end to end and on the UART, to tell UART latency from proxy overhead")
+@click.option("--count", default=20, show_default=True, help="Snapshots & single reads to time")
+@click.option("--json", "as_json", is_flag=True, help="Print the raw statistics as JSON (percentiles are upper bounds)")
+def transport_stats(count: int, as_json: bool = False):
+    from pvpi.client import PvPiClient
+
+    client = PvPiClient(instrument=True)
+    for _ in range(count):
+        client.read_snapshot()
+        client.get_battery_voltage()
+    stats = client.transport_stats()
+    if as_json:
+        click.echo(json.dumps(stats, indent=2))
+        return
+    uart = stats.get("uart", {})
+    row = "%-22s %6s %9s %9s %6s %9s %9s %8s"
+    logger.info(row, "command", "count", "mean ms", "p99 ≤ ms", "uart", "uart ms", "overhead", "failures")
+    for name, command in stats["client"].items():
+        uart_command = uart.get(name, {})
+        timed = command["timed"] > 0
+        uart_timed = uart_command.get("timed", 0) > 0
+        logger.info(
+            row,
+            name,
+            command["count"],
+            f"{command['mean_ms']:.3f}" if timed else "-",
+            f"{command['p99_ms']:.3f}" if timed else "-",
+            uart_command.get("count", "-"),
+            f"{uart_command['mean_ms']:.3f}" if uart_timed else "-",
+            f"{command['mean_ms'] - uart_command['mean_ms']:.3f}" if timed and uart_timed else "-",
+            command["failures"] + command["timeouts"],
+        )
+    logger.info("p99 is an upper bound, at most 12.5% above the true value (the top of its latency histogram bucket)")
+
+
 @cli.command()
 @click.option("--config", type=click.Path(file_okay=True, dir_okay=False))
 def manager(config: str | None = None):
+    from pvpi.config import PvPiConfig
+    from pvpi.services import system_manager
+
     _config = PvPiConfig.from_file(path=config)
     system_manager.run(config=_config)
 
@@ -183,22 +419,30 @@ def manager(config: str | None = None):
 @cli.command(short_help="Launch the Streamlit web dashboard")
 @click.option("--config", type=click.Path(file_okay=True, dir_okay=False))
 def dashboard(config: str | None = None):
+    from pvpi.systemd import run_dashboard
+
     run_dashboard(config_path=config)
 
 
 @cli.command(short_help="Install Pv Pi logger & UART proxy as systemd services")
 @click.option("--config", type=click.Path(exists=True, file_okay=True, dir_okay=False))
 def install(config: str | None = None):
+    from pvpi.systemd import install_systemd
+
     config_path = Path(config).resolve() if config else None
     install_systemd(config_path=config_path)
 
 
 @cli.command(short_help="Uninstall Pv Pi logger & UART proxy as systemd services")
 def uninstall():
+    from pvpi.systemd import uninstall_systemd
+
     uninstall_systemd()
 
 @cli.command(short_help="Restart Pv Pi logger & UART proxy systemd services")
 def restart():
+    from pvpi.systemd import restart_systemd
+
     restart_systemd()
 
 if __name__ == "__main__":
@@ -1,13 +1,40 @@
+import functools
+import json
 import logging
+from collections.abc import Callable, Iterator, Sequence
+from dataclasses import asdict, dataclass, field
 from datetime import datetime, time
 from enum import IntEnum, IntFlag, StrEnum
+from pathlib import Path
 from typing import Literal
 
-from pvpi.transports import BaseTransportInterface, SerialInterface, ZmqSerialProxyInterface
+from platformdirs import user_cache_dir
+
+from pvpi.instrumentation import InstrumentedTransport
+from pvpi.soc import SOC_TABLES, SocEstimator
+from pvpi.transports import (
+    DEFAULT_TELEMETRY_ADDR,
+    PROXY_PROBE_TIMEOUT_MS,
+    BaseTransportInterface,
+    SerialInterface,
+    ZmqSerialProxyInterface,
+    ZmqTelemetrySubscriber,
+    listening_proxy_addr,
+)
 
 _logger = logging.getLogger(__name__)
 
 
+@functools.cache
+def _cached_table_estimator(table: tuple[tuple[float, float], ...]) -> SocEstimator:
+    return SocEstimator(cells=1, table=table)
+
+
+def _table_soc_estimator(voltage_soc_table: Sequence[tuple[float, float]]) -> SocEstimator:
+    """Estimator for a battery voltage → SoC table such as `PvPiClient.voltage_soc_table`, built once per table"""
+    return _cached_table_estimator(tuple(map(tuple, voltage_soc_table)))
+
+
 class PvPiUnits(StrEnum):
     mV = "MILLIVOLTS"
     mA = "MILLIAMPS"
@@ -59,38 +86,292 @@ PvPiFaultStateDescriptions = {
 }
 
 
+def _parse_milli_reading(resp: str, unit: PvPiUnits, error: str) -> float:
+    unit_, value = resp.split(",")
+    if unit_ == unit:
+        return int(value) / 1000
+    else:
+        raise ValueError(error)
+
+
+def _parse_battery_voltage(resp: str) -> float:
+    return _parse_milli_reading(resp, PvPiUnits.mV, "Failed to read battery voltage")
+
+
+def _parse_battery_current(resp: str) -> float:
+    return _parse_milli_reading(resp, PvPiUnits.mA, "Failed to read battery current")
+
+
+def _parse_pv_voltage(resp: str) -> float:
+    return _parse_milli_reading(resp, PvPiUnits.mV, "Failed to read PV (solar) voltage")
+
+
+def _parse_pv_current(resp: str) -> float:
+    return _parse_milli_reading(resp, PvPiUnits.mA, "Failed to read PV (solar) current")
+
+
+def _parse_board_temp(resp: str) -> int:
+    type_, value = resp.split(",")
+    if type_ == "TEMP":
+        return int(value)
+    else:
+        raise ValueError("Failed to read board temperature")
+
+
+def _parse_charge_state(resp: str) -> PvPiChargeState:
+    type_, value = resp.split(",")
+    if type_ != "CHARGE_STATE":
+        raise ValueError("Failed to read Pv Pi charge state")
+    return PvPiChargeState(int(value))
+
+
+def _parse_fault_code(resp: str) -> PvPiFaultState:
+    type_, value = resp.split(",")
+    if type_ != "FAULT_CODE":
+        raise ValueError("Failed to read Pv Pi fault state")
+    return PvPiFaultState(int(value))
+
+
+def _parse_mcu_time(resp: str) -> datetime:
+    type_, *values = resp.split(",")
+    if type_ != "GET_TIME":
+        raise ValueError("Failed to read STM32 RTC")
+    try:
+        year, month, day, hour, minute, second = map(int, values)
+        dt = datetime(2000 + year, month, day, hour, minute, second)
+        return dt
+    except Exception:
+        _logger.error("Failed to parse STM32 RTC response %s", values)
+        raise
+
+
+def _parse_device_version(resp: str) -> tuple[str, str, str]:
+    _, device_name, hw_version, fw_version = resp.split(",")
+    return device_name, hw_version, fw_version
+
+
+def _check_ok(resp: str, error: str):
+    _, success = resp.split(",")
+    if success != "OK":
+        raise ValueError(error)
+
+
+# ---------------------- Command builders (validate arguments, return the wire command) ---------------------- #
+def _set_mcu_time_command(dt: datetime | None) -> bytes:
+    dt = dt or datetime.now()
+    return f"SET_TIME,{dt.year % 100},{dt.month},{dt.day},{dt.hour},{dt.minute},{dt.second}".encode()
+
+
+def _set_alarm_command(pyt: time) -> bytes:
+    return f"SET_ALARM,{pyt.hour},{pyt.minute},{pyt.second}".encode()
+
+
+def _power_off_command(delay_s: int) -> bytes:
+    if delay_s < 1 or delay_s > 60:
+        raise ValueError("Power off delay must be between 1-60 secs")
+    return f"POWER_OFF,{delay_s}".encode()
+
+
+def _set_watchdog_command(watchdog_period_min: int) -> bytes:
+    if watchdog_period_min < 1 or watchdog_period_min > 60:
+        raise ValueError("Power watchdog period must be 1-60 mins")
+    return f"WATCHDOG_ON,{watchdog_period_min}".encode()
+
+
+def _set_wakeup_voltage_command(voltage: float) -> bytes:
+    if voltage < 11.5 or voltage > 14.4:
+        raise ValueError(f"Voltage value {voltage} is invalid! Must be >11.5 and <14.4")
+    millivolts = voltage * 1000
+    return f"SET_WAKEUP_MILLIVOLT,{millivolts}".encode()
+
+
+def _set_max_charge_current_command(current: float) -> bytes:
+    if current < 0.4 or current > 10:
+        raise ValueError(f"Current value {current} is invalid! Must be >0.4 and <10")
+    milliamps = current * 1000
+    return f"SET_CHARGE_MILLIAMPS,{milliamps}".encode()
+
+
+def _set_max_input_current_command(current: float) -> bytes:
+    if current < 0.4 or current > 8:
+        raise ValueError(f"Current value {current} is invalid! Must be >0.4 and <8")
+    milliamps = current * 1000
+    return f"SET_INPUT_MILLIAMPS,{milliamps}".encode()
+
+
+def _set_on_off_command(name: str, state: Literal["ON", "OFF"]) -> bytes:
+    state = state.upper()
+    if state not in ("ON", "OFF"):
+        raise ValueError("State can only be set to 'ON' or 'OFF'")
+    return f"{name},{state}".encode()
+
+
+def _fault_descriptions(fault_codes: PvPiFaultState) -> list[str]:
+    return [PvPiFaultStateDescriptions[f] for f in PvPiFaultState if f in fault_codes]
+
+
+# Commands read by `PvPiClient.read_snapshot`, in `PvPiSnapshot.from_responses` order
+SNAPSHOT_COMMANDS = (
+    b"GET_BAT_V",
+    b"GET_BAT_C",
+    b"GET_PV_V",
+    b"GET_PV_C",
+    b"GET_TEMP",
+    b"GET_CHARGE_STATE",
+    b"GET_FAULT_CODE",
+    b"GET_TIME",
+)
+
+
+@dataclass(frozen=True)
+class PvPiSnapshot:
+    """A single telemetry sample of the PV Pi"""
+
+    battery_voltage: float  # V
+    battery_current: float  # A
+    pv_voltage: float  # V
+    pv_current: float  # A
+    board_temp: int  # Degrees Celsius
+    soc: float  # %
+    charge_state: PvPiChargeState
+    fault_code: PvPiFaultState
+    mcu_time: datetime
+    sampled_at: datetime = field(default_factory=datetime.now)  # host clock
+
+    @classmethod
+    def from_responses(cls, responses: Sequence[str], soc_from_voltage: Callable[[float], float]) -> "PvPiSnapshot":
+        """Build a snapshot from the raw responses to `SNAPSHOT_COMMANDS`"""
+        if len(responses) != len(SNAPSHOT_COMMANDS):
+            raise ValueError(f"Expected {len(SNAPSHOT_COMMANDS)} snapshot responses, got {len(responses)}")
+        bat_v, bat_c, pv_v, pv_c, temp, charge_state, fault_code, mcu_time = responses
+        battery_voltage = _parse_battery_voltage(bat_v)
+        return cls(
+            battery_voltage=battery_voltage,
+            battery_current=_parse_battery_current(bat_c),
+            pv_voltage=_parse_pv_voltage(pv_v),
+            pv_current=_parse_pv_current(pv_c),
+            board_temp=_parse_board_temp(temp),
+            soc=soc_from_voltage(battery_voltage),
+            charge_state=_parse_charge_state(charge_state),
+            fault_code=_parse_fault_code(fault_code),
+            mcu_time=_parse_mcu_time(mcu_time),
+        )
+
+    @property
+    def fault_states(self) -> list[str]:
+        """Fault states description"""
+        return _fault_descriptions(self.fault_code)
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data["charge_state"] = int(self.charge_state)
+        data["fault_code"] = int(self.fault_code)
+        data["mcu_time"] = self.mcu_time.isoformat()
+        data["sampled_at"] = self.sampled_at.isoformat()
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw: str | bytes) -> "PvPiSnapshot":
+        data = json.loads(raw)
+        data["charge_state"] = PvPiChargeState(data["charge_state"])
+        data["fault_code"] = PvPiFaultState(data["fault_code"])
+        data["mcu_time"] = datetime.fromisoformat(data["mcu_time"])
+        data["sampled_at"] = datetime.fromisoformat(data["sampled_at"])
+        return cls(**data)
+
+
+# Last working transport choice, so short-lived commands skip probing a proxy that just failed its heartbeat
+TRANSPORT_CACHE_PATH = Path(user_cache_dir("pvpi")) / "transport.json"
+TRANSPORT_CACHE_TTL_SEC = 60
+
+
+def _read_transport_choice() -> str | None:
+    """The cached transport choice, or None if there is none or it is stale"""
+    try:
+        choice = json.loads(TRANSPORT_CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        return None
+    if not 0 <= datetime.now().timestamp() - choice.get("checked_at", 0) <= TRANSPORT_CACHE_TTL_SEC:
+        return None
+    return choice.get("transport")
+
+
+def _write_transport_choice(transport: str):
+    try:
+        TRANSPORT_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        TRANSPORT_CACHE_PATH.write_text(json.dumps({"transport": transport, "checked_at": datetime.now().timestamp()}))
+    except OSError:
+        _logger.debug("Could not cache transport choice at %s", TRANSPORT_CACHE_PATH)
+
+
 def _get_interface():
+    """
+    The UART proxy if it answers (over IPC if it is listening there), else the serial port.
+
+    A proxy that isn't listening is skipped without waiting for a heartbeat. One that is listening but failed its
+    heartbeat within the last `TRANSPORT_CACHE_TTL_SEC` is skipped too.
+    """
+    proxy_addr = listening_proxy_addr()
+    if proxy_addr is None:
+        _logger.info("Defaulted to SerialInterface (no UART proxy listening)")
+        return SerialInterface()
+
+    cached = _read_transport_choice()
+    if cached == "serial":
+        _logger.info("Defaulted to SerialInterface (UART proxy recently failed its heartbeat)")
+        return SerialInterface()
     try:
-        interface = ZmqSerialProxyInterface()
+        interface = ZmqSerialProxyInterface(proxy_addr, probe_timeout_ms=PROXY_PROBE_TIMEOUT_MS)
         _logger.info("Defaulted to ZmqSerialProxyInterface")
+        if cached != "proxy":
+            _write_transport_choice("proxy")
         return interface
     except Exception:
         _logger.info("Defaulted to SerialInterface")
-        pass
+    _write_transport_choice("serial")
     return SerialInterface()
 
 
 class PvPiClient:
-    # Voltage → SoC lookup table for a 12v LiFePO4 battery
-    voltage_soc_table = [
-        (14.4, 100),
-        (13.6, 100),
-        (13.4, 99),
-        (13.3, 90),
-        (13.2, 80),
-        (13.1, 70),
-        (13.0, 60),
-        (12.9, 50),
-        (12.8, 40),
-        (12.7, 30),
-        (12.6, 20),
-        (12.5, 15),
-        (12.4, 10),
-        (12.0, 0),
-    ]
-
-    def __init__(self, interface: BaseTransportInterface | None = None):
+    # Voltage → SoC lookup table for a 12v LiFePO4 battery, the estimate used when no `soc_estimator` is given.
+    # Override it in a subclass for another battery, or pass a `SocEstimator`.
+    voltage_soc_table = [(round(voltage * 4, 3), soc) for voltage, soc in SOC_TABLES["lifepo4"]]
+
+    def __init__(
+        self,
+        interface: BaseTransportInterface | None = None,
+        instrument: bool = False,
+        soc_estimator: SocEstimator | None = None,
+    ):
+        """
+        Args:
+            interface: Transport to the PV Pi, by default the UART proxy if it is running, else the serial port
+            instrument: Record per-command transport timings, see `transport_stats`
+            soc_estimator: Battery voltage → SoC, e.g. `SocEstimator.from_config(config)`; default `voltage_soc_table`
+        """
         self._interface = interface or _get_interface()
+        self.soc_estimator = soc_estimator or _table_soc_estimator(self.voltage_soc_table)
+        if instrument:
+            self._interface = InstrumentedTransport(self._interface)
+
+    def send_command(self, command: str) -> str:
+        """Send a raw PV Pi command, e.g. `GET_BAT_V` or `SET_CHARGE_STATE,ON`, returning its raw response"""
+        return self._interface.write(command.encode())
+
+    def transport_stats(self) -> dict[str, dict[str, dict]]:
+        """
+        Per-command transport timings, bytes and failures.
+
+        `client` holds this client's round trips (needs `instrument=True`). Behind the UART proxy, `uart` holds the
+        proxy's own UART transactions, so the difference between the two is proxy overhead (or cache hits).
+        """
+        stats = {}
+        if isinstance(self._interface, InstrumentedTransport):
+            stats["client"] = self._interface.stats.as_dict()
+        get_proxy_stats = getattr(self._interface, "get_proxy_stats", None)
+        if get_proxy_stats is not None:
+            stats["uart"] = get_proxy_stats().get("serial_commands", {})
+        return stats
 
     def get_alive(self) -> bool:
         """Return True if PV PI is responsive"""
@@ -98,178 +379,115 @@ class PvPiClient:
 
     def get_device_version(self)-> tuple[str, str, str]:
         """Return the device name and version"""
-        resp = self._interface.write(message=b"GET_VERSION")
-        _, device_name, hw_version, fw_version = resp.split(",")
-        return device_name, hw_version, fw_version
+        return _parse_device_version(self._interface.write(message=b"GET_VERSION"))
 
     def get_battery_voltage(self) -> float:
         """Read battery voltage (V)"""
-        resp = self._interface.write(b"GET_BAT_V")
-        unit, value = resp.split(",")
-        if unit == PvPiUnits.mV:
-            return int(value) / 1000
-        else:
-            raise ValueError("Failed to read battery voltage")
+        return _parse_battery_voltage(self._interface.write(b"GET_BAT_V"))
 
     def get_battery_current(self) -> float:
         """Read battery current (A)"""
-        resp = self._interface.write(b"GET_BAT_C")
-        unit, value = resp.split(",")
-        if unit == PvPiUnits.mA:
-            return int(value) / 1000
-        else:
-            raise ValueError("Failed to read battery current")
+        return _parse_battery_current(self._interface.write(b"GET_BAT_C"))
 
     def get_pv_voltage(self) -> float:
         """Read PV (solar) voltage (V)"""
-        resp = self._interface.write(b"GET_PV_V")
-        unit, value = resp.split(",")
-        if unit == PvPiUnits.mV:
-            return int(value) / 1000
-        else:
-            raise ValueError("Failed to read PV (solar) voltage")
-
-    def get_pv_current(self):
+        return _parse_pv_voltage(self._interface.write(b"GET_PV_V"))
+
+    def get_pv_current(self) -> float:
         """Read PV (solar) current (A)"""
-        resp = self._interface.write(b"GET_PV_C")
-        unit, value = resp.split(",")
-        if unit == PvPiUnits.mA:
-            return int(value) / 1000
-        else:
-            raise ValueError("Failed to read PV (solar) current")
+        return _parse_pv_current(self._interface.write(b"GET_PV_C"))
 
     def get_board_temp(self) -> int:
         """Get the PVPI Board temperature (Degrees Celsius)"""
-        resp = self._interface.write(b"GET_TEMP")
-        type_, value = resp.split(",")
-        if type_ == "TEMP":
-            return int(value)
-        else:
-            raise ValueError("Failed to read board temperature")
+        return _parse_board_temp(self._interface.write(b"GET_TEMP"))
 
     def estimated_soc(self) -> float:
         """
-        Estimate State of Charge (SoC %) of a 12V (4S) LiFePO4 battery
+        Estimate State of Charge (SoC %) of the battery (by default 12V (4S) LiFePO4)
         from resting voltage using linear interpolation.
         """
+        return self.soc_estimator(self.get_battery_voltage())
+
+    @classmethod
+    def soc_from_voltage(cls, voltage: float) -> float:
+        """Estimate State of Charge (SoC %) from an already-read battery voltage, using `voltage_soc_table`."""
+        return _table_soc_estimator(cls.voltage_soc_table)(voltage)
+
+    def read_snapshot(self) -> PvPiSnapshot:
+        """Read all telemetry in a single pipelined transport exchange"""
+        responses = self._interface.write_many(SNAPSHOT_COMMANDS)
+        return PvPiSnapshot.from_responses(responses, soc_from_voltage=self.soc_estimator)
+
+    @staticmethod
+    def subscribe(
+        addr: str = DEFAULT_TELEMETRY_ADDR, conflate: bool = False, timeout_ms: int | None = None
+    ) -> Iterator[PvPiSnapshot | None]:
+        """
+        Iterate over the telemetry snapshots published by the UART proxy (`telemetry_publish_period`).
 
-        voltage = self.get_battery_voltage()
-
-        # Safety check
-        if not self.voltage_soc_table:
-            return 0.0
-
-        # Linear interpolation
-        for i in range(len(self.voltage_soc_table) - 1):
-            v1, soc1 = self.voltage_soc_table[i]
-            v2, soc2 = self.voltage_soc_table[i + 1]
-
-            if v2 <= voltage <= v1:
-                return round(soc2 + (soc1 - soc2) * (voltage - v2) / (v1 - v2), 2)
+        Args:
+            addr: Proxy telemetry PUB socket address
+            conflate: Only keep the most recent snapshot, dropping any the caller was too slow to read
+            timeout_ms: Yield None when no snapshot arrives within this time, rather than blocking forever
+        """
+        subscriber = ZmqTelemetrySubscriber(addr=addr, conflate=conflate, recv_timeout_ms=timeout_ms)
+        try:
+            while True:
+                raw = subscriber.recv()
+                yield None if raw is None else PvPiSnapshot.from_json(raw)
+        finally:
+            subscriber.close()
 
-        return 0.0
-        
     # ---------------------- Time Sync Commands ---------------------- #
     def set_mcu_time(self, dt: datetime | None = None):
         """Returns success bool for setting STM32 RTC"""
-        dt = dt or datetime.now()
-        cmd = f"SET_TIME,{dt.year % 100},{dt.month},{dt.day},{dt.hour},{dt.minute},{dt.second}"
-        resp = self._interface.write(cmd.encode())
-        _, success = resp.split(",")
-        if success != "OK":
-            raise ValueError("Failed to set MCU time")
+        resp = self._interface.write(_set_mcu_time_command(dt))
+        _check_ok(resp, "Failed to set MCU time")
 
     def get_mcu_time(self) -> datetime:
         """Read STM32 RTC"""
-        resp = self._interface.write(b"GET_TIME")
-        type_, *values = resp.split(",")
-        if type_ != "GET_TIME":
-            raise ValueError("Failed to read STM32 RTC")
-        try:
-            year, month, day, hour, minute, second = map(int, values)
-            dt = datetime(2000 + year, month, day, hour, minute, second)
-            return dt
-        except Exception:
-            _logger.error("Failed to parse STM32 RTC response %s", values)
-            raise
+        return _parse_mcu_time(self._interface.write(b"GET_TIME"))
 
     def set_alarm(self, pyt: time):
         """Set Pv PI STM32 alarm using a datetime time object"""
-        cmd = f"SET_ALARM,{pyt.hour},{pyt.minute},{pyt.second}".encode()
-        resp = self._interface.write(cmd).replace(" ", "")
-        _, success = resp.split(",")
-        if success != "OK":
-            raise ValueError("Failed to set alarm")
+        resp = self._interface.write(_set_alarm_command(pyt)).replace(" ", "")
+        _check_ok(resp, "Failed to set alarm")
 
     # ---------------------- Power Commands ---------------------- #
     def power_off(self, delay_s: int = 30):
         """Schedule power-off after delay (seconds)"""
-        if delay_s < 1 or delay_s > 60:
-            raise ValueError("Power off delay must be between 1-60 secs")
-        cmd = f"POWER_OFF,{delay_s}".encode()
-        resp = self._interface.write(cmd)
-        _, success = resp.split(",")
-        if success != "OK":
-            raise ValueError("Failed to power off")
+        resp = self._interface.write(_power_off_command(delay_s))
+        _check_ok(resp, "Failed to power off")
 
     def set_watchdog(self, watchdog_period_min: int):
         """Set the power watchdog"""
-        if watchdog_period_min < 1 or watchdog_period_min > 60:
-            raise ValueError("Power watchdog period must be 1-60 mins")
-        cmd = f"WATCHDOG_ON,{watchdog_period_min}".encode()
-        resp = self._interface.write(cmd)
-        _, success = resp.split(",")
-        if success != "OK":
-            raise ValueError("Failed to set power watchdog")
+        resp = self._interface.write(_set_watchdog_command(watchdog_period_min))
+        _check_ok(resp, "Failed to set power watchdog")
 
     def stop_watchdog(self):
         """Stop the Power watchdog"""
         resp = self._interface.write(b"WATCHDOG_OFF")
-        _, success = resp.split(",")
-        if success != "OK":
-            raise ValueError("Failed to stop power watchdog")
+        _check_ok(resp, "Failed to stop power watchdog")
 
     def set_wakeup_voltage(self, voltage: float):
         """Set the voltage at which the PV PI will wake the system"""
-        if voltage < 11.5 or voltage > 14.4:
-            raise ValueError(f"Voltage value {voltage} is invalid! Must be >11.5 and <14.4")
-        millivolts = voltage * 1000
-        cmd = f"SET_WAKEUP_MILLIVOLT,{millivolts}".encode()
-        resp = self._interface.write(cmd)
-        _, success = resp.split(",")
-        if success != "OK":
-            raise ValueError("Failed to set wakeup voltage")
+        resp = self._interface.write(_set_wakeup_voltage_command(voltage))
+        _check_ok(resp, "Failed to set wakeup voltage")
 
     def set_max_charge_current(self, current: float):
         """Set the maximum battery charge current for the PV PI"""
-        if current < 0.4 or current > 10:
-            raise ValueError(f"Current value {current} is invalid! Must be >0.4 and <10")
-        milliamps = current * 1000
-        cmd = f"SET_CHARGE_MILLIAMPS,{milliamps}".encode()
-        resp = self._interface.write(cmd)
-        _, success = resp.split(",")
-        if success != "OK":
-            raise ValueError("Failed to set max charge current")
+        resp = self._interface.write(_set_max_charge_current_command(current))
+        _check_ok(resp, "Failed to set max charge current")
 
     def set_max_input_current(self, current: float):
         """Set the maximum input current for the PV PI"""
-        if current < 0.4 or current > 8:
-            raise ValueError(f"Current value {current} is invalid! Must be >0.4 and <8")
-        milliamps = current * 1000
-        cmd = f"SET_INPUT_MILLIAMPS,{milliamps}".encode()
-        resp = self._interface.write(cmd)
-        _, success = resp.split(",")
-        if success != "OK":
-            raise ValueError("Failed to set max charge current")
+        resp = self._interface.write(_set_max_input_current_command(current))
+        _check_ok(resp, "Failed to set max charge current")
 
     # ---------------------- Fault and Status Commands ---------------------- #
     def get_charge_state_code(self) -> PvPiChargeState:
         """Get PV PI charge state"""
-        resp = self._interface.write(b"GET_CHARGE_STATE")
-        type_, value = resp.split(",")
-        if type_ != "CHARGE_STATE":
-            raise ValueError("Failed to read Pv Pi charge state")
-        return PvPiChargeState(int(value))
+        return _parse_charge_state(self._interface.write(b"GET_CHARGE_STATE"))
 
     def get_charge_state(self) -> str:
         """Get PV PI charge state description"""
@@ -277,49 +495,24 @@ class PvPiClient:
         return PvPiChargeStateDescriptions[charge_state_code]
 
     def get_fault_code(self) -> PvPiFaultState:
-        resp = self._interface.write(b"GET_FAULT_CODE")
-        type_, value = resp.split(",")
-        if type_ != "FAULT_CODE":
-            raise ValueError("Failed to read Pv Pi fault state")
-
-        return PvPiFaultState(int(value))
+        return _parse_fault_code(self._interface.write(b"GET_FAULT_CODE"))
 
     def get_fault_states(self) -> list[str]:
         """Get PV PI fault states description"""
-        fault_codes = self.get_fault_code()
-
-        return [PvPiFaultStateDescriptions[f] for f in PvPiFaultState if f in fault_codes]
+        return _fault_descriptions(self.get_fault_code())
 
     # ---------------------- Set Behaviour Commands ---------------------- #
     def set_mppt_state(self, state: Literal["ON", "OFF"]):
         """Enable/Disable the Maximum Power Point Tracking"""
-        state = state.upper()
-        if state not in ("ON", "OFF"):
-            raise ValueError("State can only be set to 'ON' or 'OFF'")
-        cmd = f"SET_MPPT_STATE,{state}".encode()
-        resp = self._interface.write(cmd)
-        _, success = resp.split(",")
-        if success != "OK":
-            raise ValueError("Failed to set MPPT")
+        resp = self._interface.write(_set_on_off_command("SET_MPPT_STATE", state))
+        _check_ok(resp, "Failed to set MPPT")
 
     def set_ts_state(self, state: Literal["ON", "OFF"]):
         """Enable/Disable the BQ25756 Battery Temperature monitoring"""
-        state = state.upper()
-        if state not in ("ON", "OFF"):
-            raise ValueError("State can only be set to 'ON' or 'OFF'")
-        cmd = f"SET_TS_STATE,{state}".encode()
-        resp = self._interface.write(cmd)
-        _, success = resp.split(",")
-        if success != "OK":
-            raise ValueError("Failed to set TS")
+        resp = self._interface.write(_set_on_off_command("SET_TS_STATE", state))
+        _check_ok(resp, "Failed to set TS")
 
     def set_charge_state(self, state: Literal["ON", "OFF"]):
         """Enable/Disable the PV PI charging"""
-        state = state.upper()
-        if state not in ("ON", "OFF"):
-            raise ValueError("State can only be set to 'ON' or 'OFF'")
-        cmd = f"SET_CHARGE_STATE,{state}".encode()
-        resp = self._interface.write(cmd)
-        _, success = resp.split(",")
-        if success != "OK":
-            raise ValueError("Failed to set charging state")
+        resp = self._interface.write(_set_on_off_command("SET_CHARGE_STATE", state))
+        _check_ok(resp, "Failed to set charging state")
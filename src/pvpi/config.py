@@ -2,6 +2,7 @@ import json
 import pathlib
 from datetime import time
 from pathlib import Path
+from typing import Literal
 
 from platformdirs import user_data_dir
 from pydantic import Field
@@ -9,18 +10,69 @@ from pydantic_settings import (
     BaseSettings,
 )
 
+from pvpi.constants import DEFAULT_PROXY_IPC_ADDR, DEFAULT_SHM_PATH, local_addr
+from pvpi.soc import Chemistry
 from pvpi.utils import default_uart_port
 
 
 class PvPiConfig(BaseSettings, extra="forbid"):
     uart_port: str = Field(default_factory=default_uart_port, description="UART port path")
+    proxy_tcp_addr: str = Field(
+        "tcp://*:5555", description="TCP endpoint the UART proxy binds, e.g. for remote clients ('' disables)"
+    )
+    proxy_ipc_addr: str = Field(
+        DEFAULT_PROXY_IPC_ADDR,
+        description="Unix socket endpoint the UART proxy binds, preferred by local clients ('' disables)",
+    )
+    proxy_cache_ttl: float = Field(
+        1.0, description="Seconds the UART proxy serves repeated telemetry reads from cache", ge=0
+    )  # secs
+    telemetry_publish_period: float = Field(
+        0, description="Seconds between telemetry snapshots published by the UART proxy (0 disables)", ge=0
+    )  # secs
+    telemetry_shm_path: str = Field(
+        DEFAULT_SHM_PATH,
+        description="Shared memory file the UART proxy keeps the latest telemetry snapshot in for local readers, "
+        "when telemetry_publish_period is set ('' disables)",
+    )
+    proxy_metrics_port: int = Field(
+        9464, description="Local port of the UART proxy's OpenMetrics /metrics endpoint (0 disables)", ge=0
+    )
+    manager_metrics_port: int = Field(
+        9465, description="Local port of the manager's OpenMetrics /metrics endpoint (0 disables)", ge=0
+    )
 
     log_period: int = Field(5, description="Pv Pi system metrics logging interval minutes", gt=0)  # mins
+    sample_period: float = Field(
+        0,
+        description="Seconds between samples aggregated (mean/min/max/last) into each log row (0 samples once per row)",
+        ge=0,
+    )  # secs
     startup_delay: int = Field(20, description="Seconds delay after service start before proceeding", ge=0)  # secs
 
     low_bat_volt: float = Field(12.5, description="Voltage at which to shutdown the Raspberry Pi", ge=0)  # volts
     wake_up_volt: float = Field(13, description="Voltage at which power supply will be turned on", ge=0)  # volts
 
+    # Battery, for State of Charge estimates
+    battery_chemistry: Chemistry = Field("lifepo4", description="Battery chemistry: lifepo4, lead_acid or li_ion")
+    battery_cells: int = Field(4, description="Battery cells in series, e.g. 4 for a 12V LiFePO4 battery", gt=0)
+    soc_table: list[tuple[float, float]] | None = Field(
+        None, description="Custom per-cell [voltage, SoC %] points, overriding battery_chemistry's table"
+    )
+    battery_capacity_ah: float = Field(
+        0, description="Usable battery capacity in Ah, enabling the manager's coulomb-counted SoC (0 disables)", ge=0
+    )  # amp hours
+    soc_rest_current: float = Field(
+        0.1, description="Battery current below which the battery counts as resting, either way", ge=0
+    )  # amps
+    soc_rest_period: float = Field(
+        1800, description="Seconds of rest after which coulomb counting re-anchors on the voltage SoC", ge=0
+    )  # secs
+    soc_state_path: Path = Field(
+        default_factory=lambda: Path(user_data_dir("pvpi")) / "soc_state.json",
+        description="Checkpoint of the coulomb-counted SoC, resumed on restart",
+    )
+
     # Turning the power supply off on shutdown
     power_off_on_shutdown: bool = Field(True, description="Turn off power supply on shutdown")
     power_off_delay: int = Field(20, description="Seconds delay after shutdown to turn off power supply", ge=0)
@@ -32,10 +84,18 @@ class PvPiConfig(BaseSettings, extra="forbid"):
 
     # Enable CSV logging of voltages, currents, and temperatures
     log_pvpi_stats: bool = Field(True, description="Enable CSV logging of Pv Pi metrics")
+    log_format: Literal["csv", "binary"] = Field(
+        "csv", description="Pv Pi metrics log storage: text CSV or fixed-record binary (.tlm) files"
+    )
+    log_rollups: bool = Field(True, description="Maintain 1 min / 15 min / 1 h rollups of logged Pv Pi metrics")
     data_log_path: Path = Field(
         default_factory=lambda: Path(user_data_dir("pvpi")), description="Pv Pi CSV log file path"
     )
     keep_for_days: int = Field(7, description="Num of days logging to retain")
+    log_flush_interval: float = Field(
+        0, description="Seconds logged rows may be buffered before being written out (0 writes every row)", ge=0
+    )  # secs
+    log_fsync: bool = Field(False, description="fsync logs on every flush so they survive a power cut")
 
     # Watchdog
     enable_watchdog: bool = Field(False, description="Enable power watchdog")
@@ -47,6 +107,18 @@ class PvPiConfig(BaseSettings, extra="forbid"):
 
     # Dashboard
     full_dashboard: bool = Field(True, description="Plot out historical data as well as live stats")
+    chart_max_points: int = Field(
+        1000, description="Most points per dashboard history chart, raw data and moving average together", ge=100
+    )
+    chart_downsampling: Literal["minmax", "lttb"] = Field(
+        "minmax",
+        description="Downsampling of long chart series: per-bucket min & max (keeps every peak) or LTTB (keeps shape)",
+    )
+
+    @property
+    def proxy_addr(self) -> str:
+        """Address local clients connect to the UART proxy at"""
+        return self.proxy_ipc_addr or local_addr(self.proxy_tcp_addr)
 
     @classmethod
     def from_file(cls, path: str | None = None):
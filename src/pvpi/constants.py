@@ -0,0 +1,20 @@
+"""
+Default addresses and paths shared by the config, transports and services.
+
+Kept free of third-party imports, so loading the config doesn't pull in the transport stack.
+"""
+
+from pathlib import Path
+
+DEFAULT_PROXY_ADDR = "tcp://127.0.0.1:5555"
+# Unix-domain socket of the UART proxy; local clients prefer it to loopback TCP
+DEFAULT_PROXY_IPC_ADDR = "ipc:///tmp/pvpi-uart.ipc"
+DEFAULT_TELEMETRY_ADDR = "tcp://127.0.0.1:5556"
+
+# Shared memory segment the UART proxy keeps the latest telemetry in
+DEFAULT_SHM_PATH = "/dev/shm/pvpi-telemetry" if Path("/dev/shm").is_dir() else "/tmp/pvpi-telemetry"
+
+
+def local_addr(bind_addr: str) -> str:
+    """The address to connect to a socket bound at `bind_addr` from the same machine, e.g. `tcp://*:5555`"""
+    return bind_addr.replace("://*:", "://127.0.0.1:").replace("://0.0.0.0:", "://127.0.0.1:")
@@ -0,0 +1,217 @@
+import io
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pvpi import telemetry_store
+from pvpi.soc import SocEstimator
+
+_logger = logging.getLogger(__name__)
+
+CSV_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+@dataclass
+class _FileState:
+    offset: int = 0  # bytes (CSV) or records (binary) already loaded
+    mtime_ns: int = 0
+    size: int = 0
+    rows: int = 0  # rows this file contributes to the cached frame
+    columns: list[str] = field(default_factory=list)
+
+
+class IncrementalHistoryLoader:
+    def __init__(
+        self,
+        log_dir: Path,
+        log_format: str = "csv",
+        soc_estimator: SocEstimator | None = None,
+        start: date | None = None,
+        end: date | None = None,
+    ):
+        """
+        Keeps the logged history in memory, parsing only what was appended since the last refresh.
+
+        Log files are daily and named by their day, so only the files from `start` to `end` are opened at all;
+        memory and load time scale with that window rather than the retention period.
+
+        Args:
+            log_dir: Directory of the daily log files
+            log_format: "csv" or "binary", matching `PvPiConfig.log_format`
+            soc_estimator: If given, add an "SoC" column estimated from "Battery Voltage" as rows are loaded
+            start: First day to load (inclusive), None for the oldest
+            end: Last day to load (inclusive), None for the newest
+        """
+        self.log_dir = Path(log_dir)
+        self.log_format = log_format
+        self.soc_estimator = soc_estimator
+        self.start = start
+        self.end = end
+        self._lock = threading.Lock()
+        self._states: dict[Path, _FileState] = {}  # in file (= day) order
+        self._frame: pd.DataFrame | None = None
+
+    def _list_all_files(self) -> list[Path]:
+        if self.log_format == "binary":
+            return telemetry_store.list_files(self.log_dir)
+        return sorted(self.log_dir.glob("*.csv"))
+
+    def _list_files(self) -> list[Path]:
+        """The daily files within the loader's date range"""
+        if self.start is None and self.end is None:
+            return self._list_all_files()
+        files = []
+        for path in self._list_all_files():
+            day = _file_day(path)
+            if day is None:
+                continue
+            if (self.start is None or day >= self.start) and (self.end is None or day <= self.end):
+                files.append(path)
+        return files
+
+    def date_range(self) -> tuple[date, date] | None:
+        """First and last day with a log file, from the file names alone, or None if there are none"""
+        days = [day for day in map(_file_day, self._list_all_files()) if day is not None]
+        if not days:
+            return None
+        return min(days), max(days)
+
+    def reset(self):
+        with self._lock:
+            self._states.clear()
+            self._frame = None
+
+    def load(self) -> pd.DataFrame | None:
+        """Return the logged rows in the date range sorted by `Timestamp`, or None if there are none"""
+        with self._lock:
+            try:
+                self._refresh()
+            except _NeedsReload:
+                _logger.info("Log files were rewritten, reloading history from scratch")
+                self._states.clear()
+                self._frame = None
+                self._refresh()
+            return self._frame
+
+    def _refresh(self):
+        files = self._list_files()
+        present = set(files)
+
+        # Retention only ever deletes the oldest days, whose rows are at the front of the frame
+        removed = [path for path in self._states if path not in present]
+        if removed:
+            if any(path > min(present) for path in removed if present):
+                raise _NeedsReload  # a day other than the oldest was deleted
+            drop_rows = 0
+            for path in removed:
+                drop_rows += self._states.pop(path).rows
+            if self._frame is not None:
+                self._frame = self._frame.iloc[drop_rows:].reset_index(drop=True)
+
+        latest_known = next(reversed(self._states), None)
+        new_chunks = []
+        for path in files:
+            state = self._states.get(path)
+            if state is None:
+                if latest_known is not None and path < latest_known:
+                    raise _NeedsReload  # a day older than what we already hold appeared
+                state = self._states[path] = _FileState()
+            elif path != latest_known and self._has_changed(path, state):
+                raise _NeedsReload  # only the newest known day is expected to grow
+
+            try:
+                chunk = self._read_new_rows(path, state)
+            except (OSError, ValueError, pd.errors.ParserError):
+                _logger.warning("Skipping unreadable log file %s", path)
+                continue
+            if chunk is not None and not chunk.empty:
+                state.rows += len(chunk)
+                new_chunks.append(chunk)
+
+        if not new_chunks:
+            return
+
+        frames = [] if self._frame is None else [self._frame]
+        new_rows = pd.concat(new_chunks, axis=0, join="inner", ignore_index=True)
+        if self.soc_estimator is not None:
+            new_rows = self.soc_estimator.add_soc_column(new_rows)
+        if not new_rows["Timestamp"].is_monotonic_increasing:
+            new_rows = new_rows.sort_values("Timestamp", kind="stable", ignore_index=True)
+        frames.append(new_rows)
+        frame = pd.concat(frames, axis=0, join="inner", ignore_index=True) if len(frames) > 1 else new_rows
+        if self._frame is not None and new_rows["Timestamp"].iloc[0] < self._frame["Timestamp"].iloc[-1]:
+            frame = frame.sort_values("Timestamp", kind="stable", ignore_index=True)
+        self._frame = frame
+
+    @staticmethod
+    def _has_changed(path: Path, state: _FileState) -> bool:
+        stat = path.stat()
+        return (stat.st_mtime_ns, stat.st_size) != (state.mtime_ns, state.size)
+
+    def _read_new_rows(self, path: Path, state: _FileState) -> pd.DataFrame | None:
+        stat = path.stat()
+        if (stat.st_mtime_ns, stat.st_size) == (state.mtime_ns, state.size):
+            return None
+        if self.log_format == "binary":
+            chunk = self._read_binary_tail(path, state)
+        else:
+            chunk = self._read_csv_tail(path, state, stat.st_size)
+        state.mtime_ns, state.size = stat.st_mtime_ns, stat.st_size
+        return chunk
+
+    @staticmethod
+    def _read_binary_tail(path: Path, state: _FileState) -> pd.DataFrame | None:
+        records = telemetry_store.read_records(path)
+        if len(records) < state.offset:
+            raise _NeedsReload
+        new_records = np.asarray(records[state.offset :])
+        state.offset = len(records)
+        if not len(new_records):
+            return None
+        return telemetry_store.records_to_frame(new_records)
+
+    @staticmethod
+    def _read_csv_tail(path: Path, state: _FileState, size: int) -> pd.DataFrame | None:
+        if size < state.offset:
+            raise _NeedsReload
+        with path.open("rb") as fh:
+            fh.seek(state.offset)
+            data = fh.read(size - state.offset)
+
+        # Only consume complete lines; a partially written last line is picked up next time
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return None
+        data = data[:end]
+
+        consumed = end
+        columns = state.columns
+        if not columns:
+            header, _, data = data.partition(b"\n")
+            columns = [column.strip() for column in header.decode().split(",")]
+
+        chunk = None
+        if data.strip():
+            chunk = pd.read_csv(io.BytesIO(data), header=None, names=columns)
+            chunk["Timestamp"] = pd.to_datetime(chunk["Timestamp"], format=CSV_TIMESTAMP_FORMAT)
+        # Only advance once the rows parsed, so a failed read is retried rather than skipped
+        state.columns = columns
+        state.offset += consumed
+        return chunk
+
+
+def _file_day(path: Path) -> date | None:
+    """Day of a daily log file, from its `YYYY-MM-DD[-HHMMSS].<ext>` name"""
+    try:
+        return date.fromisoformat(path.name[:10])
+    except ValueError:
+        return None
+
+
+class _NeedsReload(Exception):
+    """Raised when the log files changed in a way an incremental refresh can't follow"""
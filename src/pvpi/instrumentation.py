@@ -0,0 +1,185 @@
+"""
+Optional per-command instrumentation of the transport layer: wall time, bytes in/out and failures.
+
+Wrap a transport in `InstrumentedTransport` to record into a `TransportStats`; transports that aren't wrapped pay
+nothing. Latencies go into fixed log-linear histograms, so recording is a few integer operations under a lock, and
+percentiles are bucket upper bounds, at most 12.5% above the true value.
+"""
+
+import threading
+import time
+from collections.abc import Sequence
+
+from pvpi.transports import BaseTransportInterface
+
+# Latency histogram buckets in microseconds: each power of two is split into 8 equal-width sub-buckets (exact below
+# 16 us), so a bucket is at most 1/8 as wide as its lower bound. The last bucket also holds everything above ~17 s.
+_SUB_BUCKET_BITS = 3
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+
+
+def _bucket_index(elapsed_us: int) -> int:
+    shift = max(0, elapsed_us.bit_length() - _SUB_BUCKET_BITS - 1)
+    return shift * _SUB_BUCKETS + (elapsed_us >> shift)
+
+
+def _bucket_upper_us(index: int) -> int:
+    """Exclusive upper bound of bucket `index`, in microseconds"""
+    shift = max(0, index // _SUB_BUCKETS - 1)
+    return (index - shift * _SUB_BUCKETS + 1) << shift
+
+
+_N_BUCKETS = _bucket_index(2**24 - 1) + 1
+
+
+class CommandStats:
+    __slots__ = (
+        "count",
+        "timed",
+        "failures",
+        "timeouts",
+        "bytes_out",
+        "bytes_in",
+        "total_sec",
+        "min_sec",
+        "max_sec",
+        "buckets",
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.timed = 0  # commands sent alone; pipelined ones are only timed as part of their batch
+        self.failures = 0  # the transport raised
+        self.timeouts = 0  # an empty response, which the UART gives when the PV Pi doesn't answer in time
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.total_sec = 0.0
+        self.min_sec = float("inf")
+        self.max_sec = 0.0
+        self.buckets = [0] * _N_BUCKETS
+
+    def observe(self, elapsed_sec: float):
+        self.count += 1
+        self.timed += 1
+        self.total_sec += elapsed_sec
+        self.min_sec = min(self.min_sec, elapsed_sec)
+        self.max_sec = max(self.max_sec, elapsed_sec)
+        self.buckets[min(_bucket_index(int(elapsed_sec * 1e6)), _N_BUCKETS - 1)] += 1
+
+    def percentile_ms(self, pct: float) -> float:
+        """Upper bound of the `pct` percentile: that of its histogram bucket, or the maximum if lower"""
+        target = pct / 100 * self.timed
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min(_bucket_upper_us(index) / 1000, self.max_sec * 1000)
+        return self.max_sec * 1000
+
+    def as_dict(self) -> dict:
+        timed = self.timed > 0
+        return {
+            "count": self.count,
+            "timed": self.timed,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "mean_ms": round(self.total_sec / self.timed * 1000, 3) if timed else 0.0,
+            "min_ms": round(self.min_sec * 1000, 3) if timed else 0.0,
+            "p50_ms": round(self.percentile_ms(50), 3) if timed else 0.0,
+            "p99_ms": round(self.percentile_ms(99), 3) if timed else 0.0,
+            "max_ms": round(self.max_sec * 1000, 3),
+        }
+
+
+class TransportStats:
+    """Per-command wall time, bytes and failures of a transport"""
+
+    # Key of the whole-exchange timings of `write_many`
+    BATCH = "<write_many>"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commands: dict[str, CommandStats] = {}
+
+    def _get(self, name: str) -> CommandStats:
+        stats = self._commands.get(name)
+        if stats is None:
+            stats = self._commands[name] = CommandStats()
+        return stats
+
+    def record(self, message: bytes, response: str | None, elapsed_sec: float | None):
+        """Record one command; `response` is None if the transport raised, `elapsed_sec` None if timed elsewhere"""
+        name = message.split(b",", 1)[0].decode(errors="replace")
+        with self._lock:
+            stats = self._get(name)
+            stats.bytes_out += len(message)
+            if response is None:
+                stats.failures += 1
+                return
+            stats.bytes_in += len(response)
+            if message and not response:
+                stats.timeouts += 1
+            if elapsed_sec is None:
+                stats.count += 1
+            else:
+                stats.observe(elapsed_sec)
+
+    def record_batch(self, elapsed_sec: float):
+        with self._lock:
+            self._get(self.BATCH).observe(elapsed_sec)
+
+    def reset(self):
+        with self._lock:
+            self._commands.clear()
+
+    def as_dict(self) -> dict[str, dict]:
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._commands.items()}
+
+
+class InstrumentedTransport(BaseTransportInterface):
+    def __init__(self, interface: BaseTransportInterface, stats: TransportStats | None = None):
+        """
+        Wraps a transport, recording per-command wall time, bytes in/out and failures in `stats`.
+
+        Uninstrumented transports pay nothing; wrapping one adds two clock reads and a dict update per command.
+        Other attributes (e.g. `get_proxy_stats`) pass through to the wrapped transport.
+
+        Args:
+            interface: Transport to wrap
+            stats: Where to record, e.g. to share one `TransportStats` between transports
+        """
+        self.interface = interface
+        self.stats = stats or TransportStats()
+
+    def __getattr__(self, name: str):
+        return getattr(self.interface, name)
+
+    def close(self):
+        self.interface.close()
+
+    def write(self, message: bytes) -> str:
+        started = time.perf_counter()
+        try:
+            response = self.interface.write(message)
+        except Exception:
+            self.stats.record(message, None, None)
+            raise
+        self.stats.record(message, response, time.perf_counter() - started)
+        return response
+
+    def write_many(self, messages: Sequence[bytes]) -> list[str]:
+        """Pipelined commands are answered together, so the exchange is timed as a whole"""
+        started = time.perf_counter()
+        try:
+            responses = self.interface.write_many(messages)
+        except Exception:
+            for message in messages:
+                self.stats.record(message, None, None)
+            raise
+        self.stats.record_batch(time.perf_counter() - started)
+        for message, response in zip(messages, responses, strict=True):
+            self.stats.record(message, response, None)
+        return responses
@@ -1,7 +1,13 @@
 import csv
 import logging
+import os
+import time
+from collections.abc import Sequence
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import IO
+
+_logger = logging.getLogger(__name__)
 
 
 def init_logging(logger: logging.Logger, level: int = logging.INFO):
@@ -25,32 +31,143 @@ def init_logging(logger: logging.Logger, level: int = logging.INFO):
     logger.addHandler(console_handler)
 
 
+class GroupCommit:
+    def __init__(self, flush_interval_sec: float = 0, fsync: bool = False):
+        """
+        Batches buffered log writes into periodic flushes.
+
+        Args:
+            flush_interval_sec: Longest time written rows may sit in memory; 0 flushes every row
+            fsync: Also fsync on each flush, so flushed rows survive a power cut rather than only a crash
+        """
+        self.flush_interval_sec = flush_interval_sec
+        self.fsync = fsync
+        self._pending = False
+        self._last_flush = time.monotonic()
+
+    def wrote(self, f: IO):
+        """Record a write to `f`, flushing it if the flush interval has passed"""
+        self._pending = True
+        if time.monotonic() - self._last_flush >= self.flush_interval_sec:
+            self.flush(f)
+
+    def flush(self, f: IO | None):
+        if f is not None and self._pending:
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._pending = False
+        self._last_flush = time.monotonic()
+
+    def flush_if_due(self, f: IO | None):
+        if self._pending and time.monotonic() - self._last_flush >= self.flush_interval_sec:
+            self.flush(f)
+
+
+def recover_torn_line(path: Path) -> None:
+    """Truncate a partially written last row (e.g. after a power cut) so appends start on a fresh line"""
+    with path.open("rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Walk back to the last newline
+        block = 4096
+        pos = size
+        while pos > 0:
+            start = max(0, pos - block)
+            f.seek(start)
+            chunk = f.read(pos - start)
+            index = chunk.rfind(b"\n")
+            if index >= 0:
+                f.truncate(start + index + 1)
+                break
+            pos = start
+        else:
+            f.truncate(0)
+    _logger.warning("Removed torn last line from %s", path)
+
+
+def set_aside(path: Path) -> Path:
+    """
+    Rename a daily log whose columns no longer match the logger, so a fresh file can be started.
+
+    The new name keeps the date prefix (for retention) and sorts before the day's current file.
+    """
+    aside = path.with_name(f"{path.stem}-{datetime.now():%H%M%S}{path.suffix}")
+    path.rename(aside)
+    _logger.warning("Log columns changed, moved %s to %s", path, aside)
+    return aside
+
+
 class RotatingCSVLogger:
-    def __init__(self, log_dir: Path, retention_days: int = 7):
+    def __init__(
+        self,
+        log_dir: Path,
+        retention_days: int = 7,
+        flush_interval_sec: float = 0,
+        fsync: bool = False,
+        columns: Sequence[str] | None = None,
+    ):
         """
         Daily CSV logger with automatic deletion of old files.
 
+        Today's file is kept open, and old files are only swept when the day rolls over.
+
         Args:
             log_dir: Directory to store CSV logs
             retention_days: Number of days to keep old logs
+            flush_interval_sec: Group commit interval; rows may be lost on a crash for up to this long
+            fsync: fsync each group commit so it also survives a power cut
+            columns: Value columns following the timestamp, defaults to the five Pv Pi stats
         """
         self.log_dir = log_dir
         self.log_dir.mkdir(exist_ok=True)
         self.retention_days = retention_days
         self.headers = [
             "Timestamp",
-            "Battery Voltage",
-            "Battery Current",
-            "PV Voltage",
-            "PV Current",
-            "PV PI Temperature",
+            *(
+                columns
+                or (
+                    "Battery Voltage",
+                    "Battery Current",
+                    "PV Voltage",
+                    "PV Current",
+                    "PV PI Temperature",
+                )
+            ),
         ]
+        self._commit = GroupCommit(flush_interval_sec=flush_interval_sec, fsync=fsync)
+        self._file: IO | None = None
+        self._writer = None
+        self._file_day: str | None = None
         self.cleanup_old_logs()
 
     def log_stats(self, bat_v: float, bat_c: float, pv_v: float, pv_c: float, temp):
-        datetime_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        row = [datetime_str, bat_v, bat_c, pv_v, pv_c, temp]
-        self._log_row(row)
+        self.log_values([bat_v, bat_c, pv_v, pv_c, temp])
+
+    def log_values(self, values: Sequence[float], timestamp: datetime | None = None):
+        """Append a row of `values`, in column order after the timestamp"""
+        datetime_str = (timestamp or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+        self._log_row([datetime_str, *values])
+
+    def flush(self):
+        """Commit buffered rows now"""
+        self._commit.flush(self._file)
+
+    def flush_if_due(self):
+        """Commit buffered rows if the flush interval has passed"""
+        self._commit.flush_if_due(self._file)
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+            self._writer = None
+            self._file_day = None
 
     def _get_today_file(self) -> Path:
         """Return the Path object for today's CSV file."""
@@ -62,20 +179,42 @@ class RotatingCSVLogger:
         cutoff = datetime.now() - timedelta(days=self.retention_days)
         for file in self.log_dir.glob("*.csv"):
             try:
-                file_date = datetime.strptime(file.stem, "%Y-%m-%d")
+                file_date = datetime.strptime(file.stem[:10], "%Y-%m-%d")
                 if file_date < cutoff:
                     file.unlink()
             except ValueError:
                 # Skip files that don't match the date pattern
                 continue
 
-    def _log_row(self, row: list):
-        """Append a row to today's CSV file, creating headers if needed. Clean old logs files."""
+    def _open_today(self):
+        """(Re)open today's file on day rollover, sweeping old logs and writing headers if needed"""
+        today_str = datetime.now().strftime("%Y-%m-%d")
+        if today_str == self._file_day:
+            return
+
+        self.close()
         self.cleanup_old_logs()
         current_log_path = self._get_today_file()
-        write_header = not current_log_path.exists() and bool(self.headers)
-        with current_log_path.open("a", newline="") as f:
-            writer = csv.writer(f)
-            if write_header:
-                writer.writerow(self.headers)
-            writer.writerow(row)
+        if current_log_path.exists():
+            recover_torn_line(current_log_path)
+            if self._read_header(current_log_path) not in ([], self.headers):
+                set_aside(current_log_path)
+        write_header = (not current_log_path.exists() or current_log_path.stat().st_size == 0) and bool(self.headers)
+        # Buffered when group committing; line buffered files would flush every row
+        buffering = -1 if self._commit.flush_interval_sec > 0 else 1
+        self._file = current_log_path.open("a", newline="", buffering=buffering)
+        self._writer = csv.writer(self._file)
+        self._file_day = today_str
+        if write_header:
+            self._writer.writerow(self.headers)
+
+    @staticmethod
+    def _read_header(path: Path) -> list[str]:
+        with path.open(newline="") as f:
+            return next(csv.reader(f), [])
+
+    def _log_row(self, row: list):
+        """Append a row to today's CSV file, rolling over to a new file (and cleaning old log files) on a new day."""
+        self._open_today()
+        self._writer.writerow(row)
+        self._commit.wrote(self._file)
@@ -0,0 +1,214 @@
+"""
+Minimal OpenMetrics exporter: counters, gauges and histograms served on a local HTTP `/metrics` endpoint.
+
+Updating a metric costs a dict lookup under a lock, so instrumentation stays cheap on a Pi Zero. Values
+that already live elsewhere (queue depth, latest telemetry) are copied in by `on_scrape` callbacks instead
+of being updated on every change.
+"""
+
+import bisect
+import logging
+import math
+import threading
+from collections.abc import Callable, Iterable, Sequence
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+# Seconds; spans cached proxy replies (sub-millisecond) to UART timeouts
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_ = "unknown"
+
+    def __init__(self, name: str, help_: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], object] = {}
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        """Drop every labelled series, e.g. clients that went away"""
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# TYPE {self.name} {self.type_}", f"# HELP {self.name} {_escape(self.help)}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines += self._render_series(key, value)
+        return lines
+
+    def _render_series(self, key: tuple[str, ...], value) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    type_ = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, total: float, **labels):
+        """Set the running total, for counts kept by another component"""
+        with self._lock:
+            self._values[self._key(labels)] = total
+
+    def _render_series(self, key, value) -> list[str]:
+        return [f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Gauge(_Metric):
+    type_ = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type_ = "histogram"
+
+    def __init__(self, name: str, help_: str, labelnames: Sequence[str] = (), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, help_, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _render_series(self, key, value) -> list[str]:
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._scrape_callbacks: list[Callable[[], None]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_, labelnames))
+
+    def gauge(self, name: str, help_: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_, labelnames))
+
+    def histogram(
+        self, name: str, help_: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help_, labelnames, buckets))
+
+    def on_scrape(self, callback: Callable[[], None]):
+        """Run `callback` before every scrape, to copy values kept elsewhere into gauges"""
+        self._scrape_callbacks.append(callback)
+
+    def render(self) -> str:
+        for callback in self._scrape_callbacks:
+            try:
+                callback()
+            except Exception:
+                _logger.exception("Metrics scrape callback failed")
+        lines = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class TelemetryGauges:
+    """Gauges of the latest PV Pi readings"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.battery_voltage = registry.gauge("pvpi_battery_voltage_volts", "Battery voltage")
+        self.battery_current = registry.gauge("pvpi_battery_current_amperes", "Battery charge current")
+        self.pv_voltage = registry.gauge("pvpi_pv_voltage_volts", "PV (solar) input voltage")
+        self.pv_current = registry.gauge("pvpi_pv_current_amperes", "PV (solar) input current")
+        self.board_temp = registry.gauge("pvpi_board_temperature_celsius", "PV Pi board temperature")
+        self.soc = registry.gauge("pvpi_battery_soc_percent", "Estimated battery state of charge")
+        self.charge_state = registry.gauge("pvpi_charge_state", "BQ25756 charge state code")
+        self.fault_code = registry.gauge("pvpi_fault_code", "PV Pi fault flags")
+        self.sampled_at = registry.gauge("pvpi_telemetry_timestamp_seconds", "Unix time the readings were taken")
+
+    def update(self, snapshot):
+        """Copy a `PvPiSnapshot` into the gauges"""
+        self.battery_voltage.set(snapshot.battery_voltage)
+        self.battery_current.set(snapshot.battery_current)
+        self.pv_voltage.set(snapshot.pv_voltage)
+        self.pv_current.set(snapshot.pv_current)
+        self.board_temp.set(snapshot.board_temp)
+        self.soc.set(snapshot.soc)
+        self.charge_state.set(int(snapshot.charge_state))
+        self.fault_code.set(int(snapshot.fault_code))
+        self.sampled_at.set(snapshot.sampled_at.timestamp())
+
+
+def start_metrics_server(registry: MetricsRegistry, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve `registry` at `http://<host>:<port>/metrics` from a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            _logger.debug("Metrics request: %s", fmt % args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="pvpi-metrics", daemon=True).start()
+    _logger.info("Serving metrics at http://%s:%i/metrics", host, port)
+    return server
@@ -0,0 +1,199 @@
+import csv
+import logging
+import math
+import os
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from pvpi.telemetry_store import DEFAULT_CHANNELS
+
+_logger = logging.getLogger(__name__)
+
+# Rollup name -> bucket width (seconds), finest first
+ROLLUP_RESOLUTIONS = {
+    "1min": 60,
+    "15min": 15 * 60,
+    "1h": 60 * 60,
+}
+ROLLUP_DIR = "rollups"
+# Fewest points a chart should have before a coarser rollup is considered too coarse
+MIN_CHART_POINTS = 300
+# Bytes read from the end of a rollup file to find its last row, comfortably more than one row
+_TAIL_BYTES = 4096
+
+
+def rollup_dir(log_dir: Path, resolution: str) -> Path:
+    return Path(log_dir) / ROLLUP_DIR / resolution
+
+
+def rollup_headers(channels: Sequence[str]) -> list[str]:
+    """Bucket start, then mean (under the channel's own name), min and max per channel, then the sample count"""
+    headers = ["Timestamp"]
+    for channel in channels:
+        headers += [channel, f"{channel} Min", f"{channel} Max"]
+    headers.append("Count")
+    return headers
+
+
+def choose_resolution(span_sec: float, raw_period_sec: float, min_points: int = MIN_CHART_POINTS) -> str | None:
+    """
+    Return the coarsest rollup that still gives a `span_sec` chart at least `min_points` points,
+    or None when the raw log is the better choice.
+    """
+    best = None
+    for resolution, width_sec in ROLLUP_RESOLUTIONS.items():
+        if width_sec <= raw_period_sec:
+            continue  # no coarser than the raw log
+        if span_sec / width_sec >= min_points:
+            best = resolution
+    return best
+
+
+class _Bucket:
+    __slots__ = ("start", "count", "sums", "mins", "maxs")
+
+    def __init__(self, start: datetime, n_channels: int):
+        self.start = start
+        self.count = 0
+        self.sums = [0.0] * n_channels
+        self.mins = [math.inf] * n_channels
+        self.maxs = [-math.inf] * n_channels
+
+    def add(self, values: Sequence[float]):
+        self.count += 1
+        for i, value in enumerate(values):
+            self.sums[i] += value
+            if value < self.mins[i]:
+                self.mins[i] = value
+            if value > self.maxs[i]:
+                self.maxs[i] = value
+
+    def row(self) -> list:
+        row = [self.start.strftime("%Y-%m-%d %H:%M:%S")]
+        for total, low, high in zip(self.sums, self.mins, self.maxs, strict=True):
+            row += [round(total / self.count, 4), low, high]
+        row.append(self.count)
+        return row
+
+    def merge_row(self, row: Sequence[str]):
+        """Fold in a row written by `row` for the same bucket, weighting its means by its count"""
+        if len(row) != 3 * len(self.sums) + 2:
+            raise ValueError(f"Rollup row has {len(row)} fields, expected {3 * len(self.sums) + 2}")
+        count = int(row[-1])
+        self.count += count
+        for i in range(len(self.sums)):
+            mean, low, high = (float(value) for value in row[1 + 3 * i : 4 + 3 * i])
+            self.sums[i] += mean * count
+            self.mins[i] = min(self.mins[i], low)
+            self.maxs[i] = max(self.maxs[i], high)
+
+
+class RollupLogger:
+    def __init__(
+        self,
+        log_dir: Path,
+        retention_days: int = 7,
+        channels: Sequence[str] = DEFAULT_CHANNELS,
+        resolutions: Sequence[str] = tuple(ROLLUP_RESOLUTIONS),
+    ):
+        """
+        Maintains min/max/mean/count rollups of logged samples at several resolutions.
+
+        Each completed bucket is appended to `<log_dir>/rollups/<resolution>/YYYY-MM-DD.csv`,
+        so the dashboard can chart long date ranges from a few hundred rows.
+
+        Args:
+            log_dir: Directory of the raw logs; rollups are kept in a subdirectory
+            retention_days: Number of days of rollups to keep
+            channels: Names of the channels passed to `add`
+            resolutions: Rollups to maintain, keys of `ROLLUP_RESOLUTIONS`
+        """
+        self.log_dir = Path(log_dir)
+        self.retention_days = retention_days
+        self.channels = tuple(channels)
+        self.headers = rollup_headers(self.channels)
+        self.resolutions = {resolution: ROLLUP_RESOLUTIONS[resolution] for resolution in resolutions}
+        self._buckets: dict[str, _Bucket] = {}
+        self._last_day: str | None = None
+        for resolution in self.resolutions:
+            rollup_dir(self.log_dir, resolution).mkdir(parents=True, exist_ok=True)
+
+    def add(self, values: Sequence[float], timestamp: datetime | None = None):
+        """Add one sample; `values` are in `channels` order"""
+        timestamp = timestamp or datetime.now()
+        for resolution, width_sec in self.resolutions.items():
+            start = self._bucket_start(timestamp, width_sec)
+            bucket = self._buckets.get(resolution)
+            if bucket is None:
+                # First bucket since opening (or closing): it may carry on one written out by `close`
+                bucket = self._buckets[resolution] = self._resume(resolution, start)
+            elif bucket.start != start:
+                self._write(resolution, bucket)
+                bucket = self._buckets[resolution] = _Bucket(start, len(self.channels))
+            bucket.add(values)
+
+    def close(self):
+        """
+        Write out the partially filled buckets. A logger reopened within the same bucket takes the partial row back
+        and carries on filling it, so each bucket still ends up as a single row.
+        """
+        for resolution, bucket in self._buckets.items():
+            self._write(resolution, bucket)
+        self._buckets.clear()
+
+    @staticmethod
+    def _bucket_start(timestamp: datetime, width_sec: int) -> datetime:
+        midnight = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+        offset_sec = int((timestamp - midnight).total_seconds()) // width_sec * width_sec
+        return midnight + timedelta(seconds=offset_sec)
+
+    def _resume(self, resolution: str, start: datetime) -> _Bucket:
+        """New bucket starting at `start`, taking over the file's last row if it is a partial row of that bucket"""
+        bucket = _Bucket(start, len(self.channels))
+        path = rollup_dir(self.log_dir, resolution) / f"{start.strftime('%Y-%m-%d')}.csv"
+        try:
+            with path.open("rb+") as f:
+                size = f.seek(0, os.SEEK_END)
+                tail_start = max(0, size - _TAIL_BYTES)
+                f.seek(tail_start)
+                tail = f.read()
+                line_start = tail.rstrip(b"\r\n").rfind(b"\n") + 1
+                row = next(csv.reader([tail[line_start:].decode().strip()]), [])
+                if not row or row[0] != start.strftime("%Y-%m-%d %H:%M:%S"):
+                    return bucket
+                bucket.merge_row(row)
+                # The merged bucket replaces the row when it is next written
+                f.truncate(tail_start + line_start)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, UnicodeDecodeError):
+            _logger.warning("Could not resume the %s rollup bucket at %s from %s", resolution, start, path)
+            return _Bucket(start, len(self.channels))
+        return bucket
+
+    def _write(self, resolution: str, bucket: _Bucket):
+        day = bucket.start.strftime("%Y-%m-%d")
+        if day != self._last_day:
+            self._last_day = day
+            self.cleanup_old_logs()
+        path = rollup_dir(self.log_dir, resolution) / f"{day}.csv"
+        write_header = not path.exists()
+        with path.open("a", newline="") as f:
+            writer = csv.writer(f)
+            if write_header:
+                writer.writerow(self.headers)
+            writer.writerow(bucket.row())
+
+    def cleanup_old_logs(self):
+        """Delete rollup files older than retention_days."""
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        for resolution in self.resolutions:
+            for file in rollup_dir(self.log_dir, resolution).glob("*.csv"):
+                try:
+                    file_date = datetime.strptime(file.stem, "%Y-%m-%d")
+                    if file_date < cutoff:
+                        file.unlink()
+                except ValueError:
+                    # Skip files that don't match the date pattern
+                    continue
@@ -0,0 +1,65 @@
+import math
+from collections.abc import Sequence
+
+import numpy as np
+
+AGGREGATE_SUFFIXES = ("Min", "Max", "Last")
+
+
+def aggregate_headers(channels: Sequence[str]) -> list[str]:
+    """Per channel: the mean (under the channel's own name), then min, max and last; then the sample count"""
+    headers = []
+    for channel in channels:
+        headers += [channel, *(f"{channel} {suffix}" for suffix in AGGREGATE_SUFFIXES)]
+    headers.append("Samples")
+    return headers
+
+
+class SampleRingBuffer:
+    def __init__(self, capacity: int, n_channels: int):
+        """
+        Fixed-size, array-backed buffer of the samples taken between two log rows.
+
+        When more than `capacity` samples arrive, the oldest are overwritten.
+
+        Args:
+            capacity: Number of samples held
+            n_channels: Number of values per sample
+        """
+        self.capacity = capacity
+        self._samples = np.empty((capacity, n_channels), dtype=np.float64)
+        self._next = 0
+        self._count = 0
+
+    @classmethod
+    def for_periods(cls, log_period_sec: float, sample_period_sec: float, n_channels: int) -> "SampleRingBuffer":
+        """Buffer sized to hold one log period of samples, with some slack for timing jitter"""
+        return cls(math.ceil(log_period_sec / sample_period_sec) + 8, n_channels)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, values: Sequence[float]):
+        self._samples[self._next] = values
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+    def reduce(self) -> list[float]:
+        """Reduce the buffered samples to one row in `aggregate_headers` order"""
+        if not self._count:
+            raise ValueError("No samples to reduce")
+        samples = self._samples[: self._count] if self._count < self.capacity else self._samples
+        last = self._samples[(self._next - 1) % self.capacity]
+        means = samples.mean(axis=0)
+        mins = samples.min(axis=0)
+        maxs = samples.max(axis=0)
+
+        row = []
+        for i in range(samples.shape[1]):
+            row += [round(float(means[i]), 4), float(mins[i]), float(maxs[i]), float(last[i])]
+        row.append(self._count)
+        return row
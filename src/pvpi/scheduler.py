@@ -0,0 +1,110 @@
+import heapq
+import itertools
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobStats:
+    runs: int = 0
+    missed: int = 0  # deadlines skipped because the previous run (or the process) was late
+    last_drift_ms: float = 0.0  # how late the job started after its deadline
+    max_drift_ms: float = 0.0
+    total_drift_ms: float = 0.0
+    last_run_ms: float = 0.0
+    max_run_ms: float = 0.0
+
+    def as_dict(self) -> dict:
+        stats = asdict(self)
+        stats["mean_drift_ms"] = self.total_drift_ms / self.runs if self.runs else 0.0
+        return stats
+
+
+@dataclass
+class _Job:
+    name: str
+    func: Callable[[], None]
+    period_sec: float | None  # None for one-shot jobs
+    stats: JobStats
+
+
+class DeadlineScheduler:
+    def __init__(self, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        Runs timed jobs from a heap of deadlines, sleeping exactly until the next one is due.
+
+        Periodic jobs keep a fixed rate: each deadline is the previous deadline plus the period,
+        so lateness does not accumulate. Deadlines that already passed by the time a job finishes
+        are skipped (and counted as missed) rather than run back to back.
+
+        Args:
+            clock: Monotonic clock in seconds, unaffected by changes to the system time
+            sleep: Function used to wait for the next deadline
+        """
+        self._clock = clock
+        self._sleep = sleep
+        self._heap: list[tuple[float, int, _Job]] = []
+        self._seq = itertools.count()  # keeps jobs due at the same time in the order they were added
+        self._stats: dict[str, JobStats] = {}
+        self._stopped = False
+
+    def every(self, name: str, period_sec: float, func: Callable[[], None], first_in_sec: float = 0):
+        """Run `func` every `period_sec` seconds, the first time after `first_in_sec`"""
+        if period_sec <= 0:
+            raise ValueError(f"Job {name} needs a positive period, got {period_sec}")
+        self._push(self._clock() + first_in_sec, _Job(name, func, period_sec, self._job_stats(name)))
+
+    def after(self, name: str, delay_sec: float, func: Callable[[], None]):
+        """Run `func` once, `delay_sec` seconds from now"""
+        self._push(self._clock() + max(0.0, delay_sec), _Job(name, func, None, self._job_stats(name)))
+
+    def stop(self):
+        """Make `run` return once the current job finishes"""
+        self._stopped = True
+
+    def run(self):
+        """Run jobs until `stop` is called or none are left. Exceptions raised by jobs propagate."""
+        self._stopped = False
+        while self._heap and not self._stopped:
+            deadline, _, job = self._heap[0]
+            now = self._clock()
+            if now < deadline:
+                self._sleep(deadline - now)
+                continue  # re-check, the sleep may have returned early
+            heapq.heappop(self._heap)
+
+            drift_ms = (now - deadline) * 1000
+            stats = job.stats
+            stats.runs += 1
+            stats.last_drift_ms = drift_ms
+            stats.max_drift_ms = max(stats.max_drift_ms, drift_ms)
+            stats.total_drift_ms += drift_ms
+
+            job.func()
+
+            finished = self._clock()
+            stats.last_run_ms = (finished - now) * 1000
+            stats.max_run_ms = max(stats.max_run_ms, stats.last_run_ms)
+
+            if job.period_sec is not None:
+                next_deadline = deadline + job.period_sec
+                if next_deadline <= finished:
+                    skipped = int((finished - next_deadline) // job.period_sec) + 1
+                    stats.missed += skipped
+                    next_deadline += skipped * job.period_sec
+                    _logger.debug("Job %s missed %i deadline(s)", job.name, skipped)
+                self._push(next_deadline, job)
+
+    def stats(self) -> dict[str, dict]:
+        """Per-job run counts, missed deadlines, start drift and run time"""
+        return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def _job_stats(self, name: str) -> JobStats:
+        return self._stats.setdefault(name, JobStats())
+
+    def _push(self, deadline: float, job: _Job):
+        heapq.heappush(self._heap, (deadline, next(self._seq), job))
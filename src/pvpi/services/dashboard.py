@@ -1,12 +1,15 @@
 import os
+import threading
 import streamlit as st
-import pandas as pd
-import glob
 from pathlib import Path
 import altair as alt
-from datetime import timedelta
+from datetime import datetime, timedelta
 
+from pvpi.charts import trend_frame
 from pvpi.config import PvPiConfig
+from pvpi.history import IncrementalHistoryLoader
+from pvpi.rollups import choose_resolution, rollup_dir
+from pvpi.soc import SocEstimator
 from pvpi import PvPiClient
 
 
@@ -17,7 +20,30 @@ st.set_page_config(page_title="PV Pi Full System Monitor", layout="wide")
 
 @st.cache_resource
 def get_client():
-    return PvPiClient()
+    return PvPiClient(soc_estimator=SocEstimator.from_config(load_config()))
+
+
+@st.cache_resource
+def get_telemetry_stream():
+    """Shared subscription to the UART proxy's telemetry stream, or None when it is not publishing"""
+    period = load_config().telemetry_publish_period
+    if not period:
+        return None
+    stream = PvPiClient.subscribe(conflate=True, timeout_ms=int(2_000 * period))
+    return stream, threading.Lock()
+
+
+def read_snapshot(client):
+    """Latest published snapshot if it is fresh, otherwise read one directly"""
+    telemetry = get_telemetry_stream()
+    if telemetry is not None:
+        stream, lock = telemetry
+        with lock:
+            snapshot = next(stream)
+        max_age = timedelta(seconds=2 * load_config().telemetry_publish_period)
+        if snapshot is not None and datetime.now() - snapshot.sampled_at <= max_age:
+            return snapshot
+    return client.read_snapshot()
 
 
 @st.cache_resource
@@ -28,39 +54,30 @@ def load_config():
     return PvPiConfig()
 
 
-@st.cache_data(ttl=60)
-def load_all_data(csv_data_path):
-    files = glob.glob(str(csv_data_path / "*.csv"))
-    if not files:
-        return None
+@st.cache_resource(max_entries=8)
+def get_history_loader(data_path, log_format="csv", start_date=None, end_date=None):
+    return IncrementalHistoryLoader(
+        data_path,
+        log_format,
+        soc_estimator=SocEstimator.from_config(load_config()),
+        start=start_date,
+        end=end_date,
+    )
 
-    dataframes = []
-    for f in files:
-        try:
-            with open(f, 'r') as fh:
-                temp_df = pd.read_csv(fh)
-            if not temp_df.empty:
-                temp_df.columns = temp_df.columns.str.strip()
-                dataframes.append(temp_df)
-        except Exception:
-            continue
-
-    if not dataframes:
-        return None
 
-    all_df = pd.concat(dataframes, axis=0, join='inner', ignore_index=True)
-    all_df['Timestamp'] = pd.to_datetime(all_df['Timestamp'])
-    return all_df.sort_values('Timestamp')
+def load_all_data(data_path, log_format="csv", start_date=None, end_date=None):
+    """
+    Logged history from `start_date` to `end_date`, reading only that range's daily files.
+    Only rows appended since the previous call for the same range are parsed.
+    """
+    return get_history_loader(data_path, log_format, start_date, end_date).load()
 
 
 # --- PLOTTING ---
 
 def plot_with_trend(series, color, label="Value", window=12):
-    """Plots a bold moving average with a faded raw data line."""
-    raw = series.rename("Raw Data")
-    trend = series.rolling(window=window, center=True).mean().rename("Moving Average")
-    plot_df = pd.concat([raw, trend], axis=1).reset_index()
-    plot_df = plot_df.melt(id_vars=plot_df.columns[0], var_name="Type", value_name="Value")
+    """Plots a bold moving average with a faded raw data line, downsampled to the chart point budget."""
+    plot_df = trend_frame(series, window, max_points=config.chart_max_points, method=config.chart_downsampling)
 
     chart = (
         alt.Chart(plot_df)
@@ -88,14 +105,13 @@ def plot_with_trend(series, color, label="Value", window=12):
 config = load_config()
 csv_data_path = Path(config.data_log_path)
 
-# Load once to populate sidebar date bounds
-df_initial = load_all_data(csv_data_path)
+# Sidebar date bounds come from the daily log file names, without loading any data
+date_bounds = get_history_loader(csv_data_path, config.log_format).date_range()
 
 selected_range = None
-if df_initial is not None:
+if date_bounds is not None:
     st.sidebar.header("📅 History Filter")
-    min_date = df_initial['Timestamp'].min().date()
-    max_date = df_initial['Timestamp'].max().date()
+    min_date, max_date = date_bounds
 
     default_start = max(max_date - timedelta(days=2), min_date)
     default_end = max_date
@@ -118,53 +134,64 @@ def dashboard():
 
     # Live metrics
     st.title("☀️ Live PV Pi Overview")
+    snapshot = read_snapshot(client)
     m1, m2, m3, m4, m5, m6 = st.columns(6)
-    m1.metric("Estimated SoC", f"{client.estimated_soc():.2f} %")
-    m2.metric("Battery V",     f"{client.get_battery_voltage():.2f} V")
-    m3.metric("Battery A",     f"{client.get_battery_current():.2f} A")
-    m4.metric("PV Voltage",    f"{client.get_pv_voltage():.2f} V")
-    m5.metric("PV Current",    f"{client.get_pv_current():.2f} A")
-    m6.metric("Board Temp",    f"{client.get_board_temp()} °C")
+    m1.metric("Estimated SoC", f"{snapshot.soc:.2f} %")
+    m2.metric("Battery V",     f"{snapshot.battery_voltage:.2f} V")
+    m3.metric("Battery A",     f"{snapshot.battery_current:.2f} A")
+    m4.metric("PV Voltage",    f"{snapshot.pv_voltage:.2f} V")
+    m5.metric("PV Current",    f"{snapshot.pv_current:.2f} A")
+    m6.metric("Board Temp",    f"{snapshot.board_temp} °C")
 
     st.divider()
 
     if config.full_dashboard:
         # Historical data
         st.title("Historical PV Pi Data")
-        df_master = load_all_data(csv_data_path)
 
-        if df_master is None:
+        if selected_range is None:
             st.warning(
                 "Cannot display historical data — no log files found. "
                 "Please check your system path or enable log_pvpi_stats in config.json"
             )
             return
 
-        # Apply date filter
-        if selected_range is None:
-            return
-
         if isinstance(selected_range, tuple) and len(selected_range) == 2:
             start_date, end_date = selected_range
-            df_filtered = df_master[df_master['Timestamp'].dt.date.between(start_date, end_date)]
+        elif isinstance(selected_range, tuple):
+            return  # the end date is still being picked
         else:
-            df_filtered = df_master[df_master['Timestamp'].dt.date == selected_range]
+            start_date = end_date = selected_range
+
+        # Long ranges are charted from the coarsest rollup that still fills the chart
+        span_sec = ((end_date - start_date).days + 1) * 24 * 60 * 60
+        resolution = choose_resolution(span_sec, raw_period_sec=config.log_period * 60)
+        df_filtered = None
+        if resolution is not None:
+            df_filtered = load_all_data(rollup_dir(csv_data_path, resolution), "csv", start_date, end_date)
+            if df_filtered is not None:
+                st.caption(f"Showing {resolution} averages")
+        if df_filtered is None:
+            # Daily files only hold their own day's rows, so loading the range's files is the date filter
+            df_filtered = load_all_data(csv_data_path, config.log_format, start_date, end_date)
+        if df_filtered is None:
+            st.info("No logged data in the selected date range")
+            return
+
+        df_charts = df_filtered.set_index('Timestamp')  # once, shared by every chart
 
         # Section 1: Solar Input
         st.header("1. Solar Input")
         col1, col2, col3 = st.columns(3)
         with col1:
             st.subheader("Input Voltage (V)")
-            plot_with_trend(df_filtered.set_index('Timestamp')['PV Voltage'], "#FFCC00", "Volts")
+            plot_with_trend(df_charts['PV Voltage'], "#FFCC00", "Volts")
         with col2:
             st.subheader("Input Current (A)")
-            plot_with_trend(df_filtered.set_index('Timestamp')['PV Current'], "#FFAA00", "Amps")
+            plot_with_trend(df_charts['PV Current'], "#FFAA00", "Amps")
         with col3:
             st.subheader("Input Power Estimate (W)")
-            pv_pwr = (
-                df_filtered.set_index('Timestamp')['PV Voltage'] *
-                df_filtered.set_index('Timestamp')['PV Current']
-            )
+            pv_pwr = df_charts['PV Voltage'] * df_charts['PV Current']
             plot_with_trend(pv_pwr, "#FFAA00", "Watts")
 
         st.divider()
@@ -174,23 +201,23 @@ def dashboard():
         col4, col5, col6 = st.columns(3)
         with col4:
             st.subheader("Battery Voltage (V)")
-            plot_with_trend(df_filtered.set_index('Timestamp')['Battery Voltage'], "#00CCFF", "Volts")
+            plot_with_trend(df_charts['Battery Voltage'], "#00CCFF", "Volts")
         with col5:
             st.subheader("Battery Charge Current (A)")
-            plot_with_trend(df_filtered.set_index('Timestamp')['Battery Current'], "#0077FF", "Amps")
+            plot_with_trend(df_charts['Battery Current'], "#0077FF", "Amps")
         with col6:
             st.subheader("Battery Charge Power Estimate (W)")
-            batt_pwr = (
-                df_filtered.set_index('Timestamp')['Battery Voltage'] *
-                df_filtered.set_index('Timestamp')['Battery Current']
-            )
+            batt_pwr = df_charts['Battery Voltage'] * df_charts['Battery Current']
             plot_with_trend(batt_pwr, "#0077FF", "Watts")
 
+        st.subheader("Estimated State of Charge (%)")
+        plot_with_trend(df_charts['SoC'], "#00CC88", "SoC %")
+
         st.divider()
 
         # Section 3: Thermal
         st.header("3. PV Pi Thermal")
-        plot_with_trend(df_filtered.set_index('Timestamp')['PV PI Temperature'], "#FF4B4B", "Temp (°C)")
+        plot_with_trend(df_charts['PV PI Temperature'], "#FF4B4B", "Temp (°C)")
 
 
 dashboard()
\ No newline at end of file
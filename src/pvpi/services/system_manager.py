@@ -1,20 +1,113 @@
 import logging
 import os
 import time
+from collections.abc import Callable, Iterator
 from datetime import datetime, timedelta
 
-from pvpi.client import PvPiClient
+from pvpi.client import PvPiClient, PvPiSnapshot
 from pvpi.config import PvPiConfig
 from pvpi.logging_ import RotatingCSVLogger
+from pvpi.metrics import MetricsRegistry, TelemetryGauges, start_metrics_server
+from pvpi.rollups import RollupLogger
+from pvpi.sampling import SampleRingBuffer, aggregate_headers
+from pvpi.scheduler import DeadlineScheduler
+from pvpi.soc import CoulombCounter, SocEstimator
+from pvpi.telemetry_store import DEFAULT_CHANNELS, BinaryTelemetryLogger
 from pvpi.transports import ZmqSerialProxyInterface
 from pvpi.utils import set_system_time
 
 _logger = logging.getLogger(__name__)
 
+# Longest wait between shutdown schedule checks, so a stepped system clock is noticed
+SCHEDULE_RECHECK_SEC = 60
+
+
+def _read_snapshot(
+    client: PvPiClient, telemetry: Iterator[PvPiSnapshot | None] | None, max_age: timedelta
+) -> PvPiSnapshot:
+    """Latest snapshot from the proxy's telemetry stream if it is fresh, otherwise read one directly"""
+    if telemetry is not None:
+        snapshot = next(telemetry)
+        if snapshot is not None and datetime.now() - snapshot.sampled_at <= max_age:
+            return snapshot
+        _logger.debug("No fresh telemetry published, reading snapshot directly")
+    return client.read_snapshot()
+
+
+def _snapshot_values(snapshot: PvPiSnapshot) -> list[float]:
+    """Logged values, in `DEFAULT_CHANNELS` order"""
+    return [
+        snapshot.battery_voltage,
+        snapshot.battery_current,
+        snapshot.pv_voltage,
+        snapshot.pv_current,
+        snapshot.board_temp,
+    ]
+
+
+def _in_shutdown_window(config: PvPiConfig, now: datetime) -> bool:
+    shutdown = config.shutdown_time
+    wakeup = config.wakeup_time
+    if shutdown < wakeup:
+        # Same day: shutdown window is between shutdown_time and wakeup_time
+        return shutdown <= now.time() < wakeup
+    # Overnight: e.g. shutdown=23:00, wakeup=06:00
+    return now.time() >= shutdown or now.time() < wakeup
+
+
+def _seconds_until_shutdown(config: PvPiConfig, now: datetime) -> float:
+    shutdown_at = datetime.combine(now.date(), config.shutdown_time)
+    if shutdown_at <= now:
+        shutdown_at += timedelta(days=1)
+    return (shutdown_at - now).total_seconds()
+
+
+def _serve_manager_metrics(
+    port: int,
+    scheduler: DeadlineScheduler,
+    latest_snapshot: Callable[[], PvPiSnapshot | None],
+    soc_counter: CoulombCounter | None = None,
+):
+    """Serve the scheduler's job timing and the latest readings on a local OpenMetrics endpoint"""
+    registry = MetricsRegistry()
+    runs = registry.counter("pvpi_manager_job_runs", "Times each manager job ran", ("job",))
+    missed = registry.counter("pvpi_manager_job_missed_deadlines", "Deadlines each job skipped", ("job",))
+    drift = registry.gauge("pvpi_manager_job_drift_seconds", "How late each job last started", ("job",))
+    max_drift = registry.gauge("pvpi_manager_job_max_drift_seconds", "Latest each job has started", ("job",))
+    mean_drift = registry.gauge("pvpi_manager_job_mean_drift_seconds", "Mean start lateness of each job", ("job",))
+    run_time = registry.gauge("pvpi_manager_job_run_seconds", "Time each job last took", ("job",))
+    max_run_time = registry.gauge("pvpi_manager_job_max_run_seconds", "Longest each job has taken", ("job",))
+    telemetry = TelemetryGauges(registry)
+    coulomb_soc = registry.gauge("pvpi_battery_coulomb_soc_percent", "Coulomb-counted battery state of charge")
+
+    def on_scrape():
+        for job, stats in scheduler.stats().items():
+            runs.set(stats["runs"], job=job)
+            missed.set(stats["missed"], job=job)
+            drift.set(stats["last_drift_ms"] / 1000, job=job)
+            max_drift.set(stats["max_drift_ms"] / 1000, job=job)
+            mean_drift.set(stats["mean_drift_ms"] / 1000, job=job)
+            run_time.set(stats["last_run_ms"] / 1000, job=job)
+            max_run_time.set(stats["max_run_ms"] / 1000, job=job)
+        snapshot = latest_snapshot()
+        if snapshot is not None:
+            telemetry.update(snapshot)
+        if soc_counter is not None and soc_counter.soc is not None:
+            coulomb_soc.set(soc_counter.soc)
+
+    registry.on_scrape(on_scrape)
+    # Metrics are a side feature: a taken port mustn't stop the manager shutting the Pi down on low battery
+    try:
+        start_metrics_server(registry, port)
+    except OSError as e:
+        _logger.warning("Manager metrics disabled, could not serve them on port %i: %s", port, e)
+
 
 def run(config: PvPiConfig):
-    serial_interface = ZmqSerialProxyInterface()
-    client = PvPiClient(interface=serial_interface)
+    # The proxy may still be starting alongside the manager, so wait as long as for any reply
+    serial_interface = ZmqSerialProxyInterface(config.proxy_addr, probe_timeout_ms=10_000)
+    soc_estimator = SocEstimator.from_config(config)
+    client = PvPiClient(interface=serial_interface, soc_estimator=soc_estimator)
 
     # Check Pv Pi status
     is_alive = client.get_alive()
@@ -27,11 +120,49 @@ def run(config: PvPiConfig):
     if config.time_pi2mcu:
         client.set_mcu_time()
 
+    # Sample faster than the log period, logging the aggregate of each period's samples
+    log_period_sec = config.log_period * 60
+    samples: SampleRingBuffer | None = None
+    log_channels = DEFAULT_CHANNELS
+    if config.sample_period and config.sample_period < log_period_sec:
+        samples = SampleRingBuffer.for_periods(log_period_sec, config.sample_period, len(DEFAULT_CHANNELS))
+        log_channels = aggregate_headers(DEFAULT_CHANNELS)
+        _logger.info("Sampling every %ss, logging mean/min/max/last per log period", config.sample_period)
+
     # Setup CSV logger
-    stats_data_logger: RotatingCSVLogger | None = None
+    stats_data_logger: RotatingCSVLogger | BinaryTelemetryLogger | None = None
     if config.log_pvpi_stats:
-        _logger.info("Logging PV PI statistics to %s", config.data_log_path)
-        stats_data_logger = RotatingCSVLogger(config.data_log_path, config.keep_for_days)
+        _logger.info("Logging PV PI statistics to %s (%s)", config.data_log_path, config.log_format)
+        if config.log_format == "binary":
+            stats_data_logger = BinaryTelemetryLogger(
+                config.data_log_path,
+                config.keep_for_days,
+                channels=log_channels,
+                flush_interval_sec=config.log_flush_interval,
+                fsync=config.log_fsync,
+            )
+        else:
+            stats_data_logger = RotatingCSVLogger(
+                config.data_log_path,
+                config.keep_for_days,
+                flush_interval_sec=config.log_flush_interval,
+                fsync=config.log_fsync,
+                columns=log_channels,
+            )
+    rollup_logger: RollupLogger | None = None
+    if config.log_pvpi_stats and config.log_rollups:
+        rollup_logger = RollupLogger(config.data_log_path, config.keep_for_days)
+
+    # Coulomb-counted SoC, fed every sample and resumed from its checkpoint
+    soc_counter: CoulombCounter | None = None
+    if config.battery_capacity_ah:
+        soc_counter = CoulombCounter(
+            config.battery_capacity_ah,
+            soc_estimator,
+            state_path=config.soc_state_path,
+            rest_current_a=config.soc_rest_current,
+            rest_sec=config.soc_rest_period,
+        )
 
     # Delay start
     if config.startup_delay:
@@ -45,9 +176,6 @@ def run(config: PvPiConfig):
     _logger.info("Watchdog: %s", "On" if config.enable_watchdog else "Off")
     if config.enable_watchdog:
         client.set_watchdog(config.watchdog_period_mins)
-        # Make sure watchdog is reset twice every watchdog period
-        watchdog_period_sec = (config.watchdog_period_mins * 60)//2
-        prev_watchdog_time = datetime.now() - timedelta(seconds=watchdog_period_sec)
         _logger.info("Watchdog polling interval set to %s min", config.watchdog_period_mins)
     else:
         client.stop_watchdog()
@@ -55,68 +183,111 @@ def run(config: PvPiConfig):
     client.set_wakeup_voltage(config.wake_up_volt)
     _logger.info("Wakeup Voltage set at: %sV", config.wake_up_volt)
 
-    # Pv Pi Logging loop
-    log_period_sec = config.log_period * 60
-    prev_log_time = datetime.now() - timedelta(seconds=log_period_sec)
+    # Consume the proxy's telemetry stream when it is publishing one
+    telemetry: Iterator[PvPiSnapshot | None] | None = None
+    telemetry_max_age = timedelta(seconds=2 * config.telemetry_publish_period)
+    if config.telemetry_publish_period:
+        _logger.info("Reading telemetry published by the UART proxy")
+        telemetry = client.subscribe(conflate=True, timeout_ms=int(telemetry_max_age.total_seconds() * 1000))
+
+    # Pv Pi jobs, each run at its own deadline
+    scheduler = DeadlineScheduler()
+    latest: PvPiSnapshot | None = None
+
+    def kick_watchdog():
+        _logger.info("Watchdog Alive: %s", client.get_alive())
+
+    def take_sample():
+        nonlocal latest
+        latest = _read_snapshot(client, telemetry, telemetry_max_age)
+        if soc_counter:
+            soc_counter.update_from_snapshot(latest)
+        values = _snapshot_values(latest)
+        samples.append(values)
+        if rollup_logger:
+            rollup_logger.add(values)
+
+    def log_stats():
+        nonlocal latest
+        if samples is not None:
+            if not samples:
+                return
+            _logger.info("Battery: %s V, %s A", latest.battery_voltage, latest.battery_current)
+            _logger.info("PV: %s V, %s A", latest.pv_voltage, latest.pv_current)
+            if soc_counter:
+                _logger.info("Coulomb-counted SoC: %.2f %%", soc_counter.soc)
+            _logger.info("Logging aggregate of %i samples", len(samples))
+            if stats_data_logger:
+                stats_data_logger.log_values(samples.reduce())
+            samples.clear()
+        else:
+            latest = _read_snapshot(client, telemetry, telemetry_max_age)
+            _logger.info("Current MCU time: %s", latest.mcu_time)
+            _logger.info("System time: %s", datetime.now().strftime("%y-%m-%d %H:%M:%S"))
+            _logger.info("Battery: %s V, %s A", latest.battery_voltage, latest.battery_current)
+            _logger.info("PV: %s V, %s A", latest.pv_voltage, latest.pv_current)
+            _logger.info("PV PI Temp: %sC", latest.board_temp)
+            if soc_counter:
+                _logger.info("Coulomb-counted SoC: %.2f %%", soc_counter.update_from_snapshot(latest))
+            values = _snapshot_values(latest)
+            if stats_data_logger:
+                stats_data_logger.log_values(values)
+            if rollup_logger:
+                rollup_logger.add(values)
+        _logger.debug("Scheduler stats: %s", scheduler.stats())
+
+    def check_voltage():
+        if latest is not None and latest.battery_voltage <= config.low_bat_volt:
+            _logger.info("Shutdown Voltage!")
+            scheduler.stop()
+
+    def check_schedule():
+        now = datetime.now()
+        if _in_shutdown_window(config, now):
+            _logger.info("Shutdown Time!")
+            scheduler.stop()
+            return
+        # Re-check at least every SCHEDULE_RECHECK_SEC in case the system clock is stepped
+        scheduler.after("schedule", min(_seconds_until_shutdown(config, now), SCHEDULE_RECHECK_SEC), check_schedule)
+
+    if config.manager_metrics_port:
+        _serve_manager_metrics(config.manager_metrics_port, scheduler, lambda: latest, soc_counter)
+
+    # Jobs due together run in the order they are added here
+    if config.schedule_time:
+        scheduler.after("schedule", 0, check_schedule)
+    if config.enable_watchdog:
+        # Make sure watchdog is reset twice every watchdog period
+        scheduler.every("watchdog", config.watchdog_period_mins * 60 / 2, kick_watchdog)
+    if samples is not None:
+        scheduler.every("sample", config.sample_period, take_sample)
+    scheduler.every("log", log_period_sec, log_stats)
+    scheduler.every("voltage", config.sample_period if samples is not None else log_period_sec, check_voltage)
+    if stats_data_logger and config.log_flush_interval:
+        scheduler.every("flush", config.log_flush_interval, stats_data_logger.flush_if_due, config.log_flush_interval)
 
     try:
-        while True:
-            curr_time = datetime.now()
-            if config.schedule_time:
-                shutdown = config.shutdown_time
-                wakeup = config.wakeup_time
-
-                if shutdown < wakeup:
-                    # Same day: shutdown window is between shutdown_time and wakeup_time
-                    should_shutdown = shutdown <= curr_time.time() < wakeup
-                else:
-                    # Overnight: e.g. shutdown=23:00, wakeup=06:00
-                    should_shutdown = curr_time.time() >= shutdown or curr_time.time() < wakeup
-
-                if should_shutdown:
-                    _logger.info("Shutdown Time!")
-                    break
-
-            if config.enable_watchdog:
-                sec_since_last_wd = (curr_time - prev_watchdog_time).seconds
-                if sec_since_last_wd >= watchdog_period_sec:
-                    is_alive = client.get_alive()
-                    _logger.info("Watchdog Alive: %s", is_alive)
-                    prev_watchdog_time = datetime.now()
-
-            sec_since_last_log = (curr_time - prev_log_time).seconds
-            if sec_since_last_log >= log_period_sec:
-                prev_log_time = datetime.now()
-
-                is_alive = client.get_alive()
-                mcu_time = client.get_mcu_time()
-                _logger.info("Alive: %s", is_alive)
-                _logger.info("Current MCU time: %s", mcu_time)
-                _logger.info("System time: %s", datetime.now().strftime("%y-%m-%d %H:%M:%S"))
-
-                bat_v = client.get_battery_voltage()
-                bat_c = client.get_battery_current()
-                pv_v = client.get_pv_voltage()
-                pv_c = client.get_pv_current()
-                temperature = client.get_board_temp()
-                _logger.info("Battery: %s V, %s A", bat_v, bat_c)
-                _logger.info("PV: %s V, %s A", pv_v, pv_c)
-                _logger.info("PV PI Temp: %sC", temperature)
-                if stats_data_logger:
-                    stats_data_logger.log_stats(bat_v, bat_c, pv_v, pv_c, temperature)
-
-                if bat_v <= config.low_bat_volt:
-                    _logger.info("Shutdown Voltage!")
-                    break
-
-            time.sleep(10)
+        scheduler.run()
+        _logger.info("Scheduler stats: %s", scheduler.stats())
     except Exception as err:
         _logger.warning("Exception raised %s", err)
+        if stats_data_logger:
+            stats_data_logger.close()
+        if rollup_logger:
+            rollup_logger.close()
+        if soc_counter:
+            soc_counter.checkpoint()
         client.stop_watchdog()
         serial_interface.close()
         raise
     else:
         _logger.info("Closing down...")
+        if stats_data_logger:
+            stats_data_logger.close()
+        if rollup_logger:
+            rollup_logger.close()
+        if soc_counter:
+            soc_counter.checkpoint()
         client.stop_watchdog()
         _logger.info("Watchdog stopped")
 
@@ -1,57 +1,423 @@
 import asyncio
+import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
 
 import zmq
 import zmq.asyncio
 
+from pvpi.client import SNAPSHOT_COMMANDS, PvPiSnapshot
+from pvpi.instrumentation import InstrumentedTransport, TransportStats
+from pvpi.metrics import MetricsRegistry, TelemetryGauges
+from pvpi.shared_telemetry import SharedTelemetryWriter
+from pvpi.soc import SocEstimator
 from pvpi.transports import SerialInterface
 
 _logger = logging.getLogger(__name__)
 
+# Proxy-local command answered without touching the UART
+PROXY_STATS_COMMAND = b"PROXY_STATS"
+
+# Idempotent telemetry reads, served from cache for `cache_ttl_sec`
+TELEMETRY_READ_COMMANDS = (
+    b"GET_BAT_V",
+    b"GET_BAT_C",
+    b"GET_PV_V",
+    b"GET_PV_C",
+    b"GET_TEMP",
+    b"GET_CHARGE_STATE",
+    b"GET_FAULT_CODE",
+)
+# Other idempotent reads with their own TTL (seconds). A TTL of 0 only coalesces identical in-flight reads.
+# GET_ALIVE is deliberately absent: it kicks the power watchdog, so every call must reach the PV Pi.
+READ_COMMAND_TTL_OVERRIDES_SEC = {
+    b"GET_VERSION": 3600.0,
+    b"GET_TIME": 0.0,
+}
+# Commands that change PV Pi state. They are never cached and invalidate all cached reads.
+WRITE_COMMAND_PREFIXES = (b"SET_", b"POWER_OFF", b"WATCHDOG_")
+
+
+# Clients not heard from for this long are dropped from the connected client metrics
+CLIENT_EXPIRY_SEC = 600
+# Longest a metrics scrape waits for the event loop to copy the proxy's state
+SCRAPE_TIMEOUT_SEC = 2.0
+
+
+def is_write_command(message: bytes) -> bool:
+    return message.startswith(WRITE_COMMAND_PREFIXES)
+
+
+def command_name(message: bytes) -> str:
+    """Command without its arguments, e.g. `SET_CHARGE_STATE` for `SET_CHARGE_STATE,ON`"""
+    return message.split(b",", 1)[0].decode(errors="replace")
+
+
+@dataclass
+class _SerialCommand:
+    message: bytes
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class ProxyStats:
+    requests: int = 0  # serial commands sent to the UART
+    heartbeats: int = 0
+    errors: int = 0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    last_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+    total_wait_ms: float = 0.0
+    last_serial_ms: float = 0.0
+    max_serial_ms: float = 0.0
+    total_serial_ms: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    uncached_reads: int = 0  # reads that skip the cache, e.g. the telemetry sampler's
+    coalesced: int = 0  # reads answered by joining an identical in-flight read
+    invalidations: int = 0
+    published: int = 0  # telemetry snapshots published
+
+    def as_dict(self) -> dict:
+        stats = asdict(self)
+        stats["mean_wait_ms"] = self.total_wait_ms / self.requests if self.requests else 0.0
+        stats["mean_serial_ms"] = self.total_serial_ms / self.requests if self.requests else 0.0
+        return stats
+
+
+class _ProxyMetrics:
+    """OpenMetrics instruments of the proxy, see `pvpi.metrics`"""
+
+    def __init__(self, registry: MetricsRegistry, proxy: "ZmqSerialProxy"):
+        self.proxy = proxy
+        self.commands = registry.counter(
+            "pvpi_proxy_commands", "Commands answered, by where the answer came from", ("command", "source")
+        )
+        self.request_seconds = registry.histogram(
+            "pvpi_proxy_request_seconds", "Time from receiving a request to sending its reply"
+        )
+        self.queue_wait_seconds = registry.histogram(
+            "pvpi_proxy_queue_wait_seconds", "Time commands waited for the UART", ("command",)
+        )
+        self.serial_seconds = registry.histogram(
+            "pvpi_proxy_serial_seconds", "UART transaction time per command", ("command",)
+        )
+        self.serial_timeouts = registry.counter(
+            "pvpi_proxy_serial_timeouts", "UART commands that got no response", ("command",)
+        )
+        self.serial_errors = registry.counter("pvpi_proxy_serial_errors", "UART commands that failed", ("command",))
+        self.heartbeats = registry.counter("pvpi_proxy_heartbeats", "Heartbeats answered")
+        self.queue_depth = registry.gauge("pvpi_proxy_queue_depth", "Commands waiting for the UART")
+        self.max_queue_depth = registry.gauge("pvpi_proxy_max_queue_depth", "Most commands ever waiting for the UART")
+        self.client_requests = registry.counter("pvpi_proxy_client_requests", "Requests per client", ("client",))
+        self.client_last_seen = registry.gauge(
+            "pvpi_proxy_client_last_seen_seconds", "Unix time of each connected client's last request", ("client",)
+        )
+        self.clients = registry.gauge("pvpi_proxy_clients", "Clients seen in the last 10 minutes")
+        self.telemetry = TelemetryGauges(registry)
+        registry.on_scrape(self._on_scrape)
+
+    def _on_scrape(self):
+        """Runs on the metrics server's thread, so reads the proxy's state on its event loop"""
+        loop = self.proxy._loop
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._collect(), loop).result(timeout=SCRAPE_TIMEOUT_SEC)
+
+    async def _collect(self):
+        proxy = self.proxy
+        self.queue_depth.set(proxy._queue.qsize())
+        self.max_queue_depth.set(proxy.stats.max_queue_depth)
+        self.heartbeats.set(proxy.stats.heartbeats)
+
+        expire_before = time.time() - CLIENT_EXPIRY_SEC
+        for client_id, last_seen in list(proxy.clients.items()):
+            if last_seen < expire_before:
+                del proxy.clients[client_id]
+        self.client_last_seen.clear()
+        for client_id, last_seen in list(proxy.clients.items()):
+            self.client_last_seen.set(last_seen, client=client_id.decode(errors="replace"))
+        self.clients.set(len(proxy.clients))
+
+        if proxy.latest_snapshot is not None:
+            self.telemetry.update(proxy.latest_snapshot)
+
 
 class ZmqSerialProxy:
-    def __init__(self, serial_interface: SerialInterface, bind_addr: str = "tcp://*:5555", timeout_ms: int = 1_000):
+    def __init__(
+        self,
+        serial_interface: SerialInterface,
+        bind_addr: str = "tcp://*:5555",
+        ipc_addr: str = "",
+        timeout_ms: int = 1_000,
+        cache_ttl_sec: float = 1.0,
+        sample_period_sec: float = 0,
+        publish_addr: str = "tcp://*:5556",
+        shm_path: str = "",
+        soc_estimator: SocEstimator | None = None,
+        metrics: MetricsRegistry | None = None,
+    ):
         self.serial_interface = serial_interface
+        if not bind_addr and not ipc_addr:
+            raise ValueError("UART proxy needs a TCP or IPC address to bind")
         self.bind_addr = bind_addr
+        self.ipc_addr = ipc_addr
         self.timeout_ms = timeout_ms
+        self.sample_period_sec = sample_period_sec
+        self.publish_addr = publish_addr
+        self.shm_path = shm_path
+        self.soc_estimator = soc_estimator or SocEstimator()
         self._stay_alive = asyncio.Event()
 
         self.context = zmq.asyncio.Context()
         self.socket = self.context.socket(zmq.ROUTER)
         self.socket.setsockopt(zmq.RCVTIMEO, timeout_ms)
 
+        # Telemetry stream, sampled by the proxy so serial load is independent of the number of readers
+        self.publisher: zmq.asyncio.Socket | None = None
+        if sample_period_sec > 0:
+            self.publisher = self.context.socket(zmq.PUB)
+            self.publisher.setsockopt(zmq.LINGER, 0)
+        self.latest_snapshot: PvPiSnapshot | None = None
+        self._shm_writer: SharedTelemetryWriter | None = None  # latest snapshot for local readers, see `run`
+
+        # All UART transactions run one at a time on a dedicated thread, fed by `_queue`
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pvpi-serial")
+        self._queue: asyncio.Queue[_SerialCommand] = asyncio.Queue()
+        self.stats = ProxyStats()
+        # Per-command UART timings, reported with PROXY_STATS to tell UART latency apart from proxy overhead
+        self.serial_stats = TransportStats()
+        self._serial = InstrumentedTransport(serial_interface, self.serial_stats)
+
+        # Read cache & single-flight state
+        self.read_ttl_sec: dict[bytes, float] = {
+            **{command: cache_ttl_sec for command in TELEMETRY_READ_COMMANDS},
+            **READ_COMMAND_TTL_OVERRIDES_SEC,
+        }
+        self._cache: dict[bytes, tuple[float, bytes]] = {}  # command -> (expires_at, response)
+        self._in_flight: dict[bytes, asyncio.Future] = {}
+        self._generation = 0  # bumped by every write, so reads overlapping a write are not cached
+        self._responders: set[asyncio.Task] = set()
+
+        self.clients: dict[bytes, float] = {}  # client identity -> Unix time of its last request
+        self._loop: asyncio.AbstractEventLoop | None = None  # set by `run`, for metrics scrapes from other threads
+        self._metrics = _ProxyMetrics(metrics, self) if metrics is not None else None
+
     async def run(self):
-        self.socket.bind(self.bind_addr)
-        _logger.info("Running UART proxy & listening at %s", self.bind_addr)
+        self._loop = asyncio.get_running_loop()
+        # The same ROUTER serves both endpoints, so IPC and TCP clients share one queue and cache
+        for addr in (self.ipc_addr, self.bind_addr):
+            if addr:
+                if addr.startswith("ipc://"):
+                    Path(addr.removeprefix("ipc://")).parent.mkdir(parents=True, exist_ok=True)
+                self.socket.bind(addr)
+                _logger.info("Running UART proxy & listening at %s", addr)
         self._stay_alive.set()
+        serial_worker = asyncio.create_task(self._serial_worker())
+        sampler = None
+        if self.publisher is not None:
+            self.publisher.bind(self.publish_addr)
+            _logger.info("Publishing telemetry every %ss at %s", self.sample_period_sec, self.publish_addr)
+            if self.shm_path:
+                self._shm_writer = SharedTelemetryWriter(self.shm_path)
+            sampler = asyncio.create_task(self._sampler())
         try:
-            while self._stay_alive:
+            while self._stay_alive.is_set():
                 try:
                     client_id, *payload = await self.socket.recv_multipart()
                 except zmq.Again:
                     await asyncio.sleep(0.1)
                     continue
-                message: bytes = b"".join(payload)
-                _logger.debug("Received request from %s: %s", client_id, message)
-
-                # Proxy heartbeat request
-                if message == b"":
-                    _logger.debug("Sending heartbeat response to %s", client_id)
-                    await self.socket.send_multipart([client_id, b""])
-                    continue
-
-                try:
-                    response = self.serial_interface.write(message=message)
-                except Exception:
-                    _logger.warning("Failed to serve client %s", client_id)
-                    await self.socket.send_multipart([client_id, b"ERROR"])
-                else:
-                    _logger.debug("Sending response to %s: %s", client_id, response)
-                    await self.socket.send_multipart([client_id, response.encode()])
+                await self._handle(client_id, payload)
         finally:
             _logger.info("Closing socket...")
+            # Let the tasks unwind before closing what they use
+            tasks = [serial_worker, *([sampler] if sampler is not None else []), *self._responders]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.publisher is not None:
+                self.publisher.close()
+            if self._shm_writer is not None:
+                self._shm_writer.close()
+            self._executor.shutdown(wait=False, cancel_futures=True)
             self.socket.close()
             self.context.term()
+            if self.ipc_addr.startswith("ipc://"):
+                Path(self.ipc_addr.removeprefix("ipc://")).unlink(missing_ok=True)
+
+    async def _handle(self, client_id: bytes, payload: list[bytes]):
+        """Answer proxy-local requests immediately and hand everything else to the serial worker"""
+        if len(payload) < 2:
+            _logger.warning("Dropping malformed request from %s: %s", client_id, payload)
+            return
+        seq, *messages = payload
+        _logger.debug("Received request [%s] from %s: %s", seq, client_id, messages)
+        received_at = time.monotonic()
+        self.clients[client_id] = time.time()
+        if self._metrics is not None:
+            self._metrics.client_requests.inc(client=client_id.decode(errors="replace"))
+
+        # Proxy heartbeat request
+        if messages == [b""]:
+            _logger.debug("Sending heartbeat response to %s", client_id)
+            self.stats.heartbeats += 1
+            await self.socket.send_multipart([client_id, seq, b""])
+            return
+
+        if messages == [PROXY_STATS_COMMAND]:
+            stats = {**self.stats.as_dict(), "serial_commands": self.serial_stats.as_dict()}
+            await self.socket.send_multipart([client_id, seq, json.dumps(stats).encode()])
+            return
+
+        # One command per frame, answered with one frame per command once they have all been served
+        task = asyncio.create_task(self._respond(client_id, seq, messages, received_at))
+        self._responders.add(task)
+        task.add_done_callback(self._responders.discard)
+
+    async def _respond(self, client_id: bytes, seq: bytes, messages: list[bytes], received_at: float):
+        responses = await asyncio.gather(*(self._submit(message) for message in messages))
+        _logger.debug("Sending response [%s] to %s: %s", seq, client_id, responses)
+        await self.socket.send_multipart([client_id, seq, *responses])
+        if self._metrics is not None:
+            self._metrics.request_seconds.observe(time.monotonic() - received_at)
+
+    def _count(self, message: bytes, source: str):
+        if self._metrics is not None:
+            self._metrics.commands.inc(command=command_name(message), source=source)
+
+    async def _submit(self, message: bytes, use_cache: bool = True) -> bytes:
+        """Resolve one command via the read cache, an identical in-flight read, or a new serial transaction"""
+        if message == b"":
+            return b""
+
+        if is_write_command(message):
+            self._invalidate()
+            self._count(message, "serial")
+            return await self._enqueue(message)
+
+        ttl_sec = self.read_ttl_sec.get(message)
+        if ttl_sec is None:
+            self._count(message, "serial")
+            return await self._enqueue(message)
+
+        if use_cache:
+            cached = self._cache.get(message)
+            if cached is not None and cached[0] > time.monotonic():
+                self.stats.cache_hits += 1
+                self._count(message, "cache")
+                return cached[1]
+            self.stats.cache_misses += 1
+        else:
+            self.stats.uncached_reads += 1
+
+        in_flight = self._in_flight.get(message)
+        if in_flight is not None:
+            self.stats.coalesced += 1
+            self._count(message, "coalesced")
+            return await asyncio.shield(in_flight)
+
+        self._count(message, "serial")
+        generation = self._generation
+        future = asyncio.ensure_future(self._enqueue(message))
+        self._in_flight[message] = future
+        try:
+            response = await asyncio.shield(future)
+        finally:
+            if self._in_flight.get(message) is future:
+                del self._in_flight[message]
+        if ttl_sec > 0 and response != b"ERROR" and generation == self._generation:
+            self._cache[message] = (time.monotonic() + ttl_sec, response)
+        return response
+
+    async def _sampler(self):
+        """Read a snapshot every `sample_period_sec` and publish it to subscribers and shared memory"""
+        loop = asyncio.get_running_loop()
+        next_sample_at = loop.time()
+        while True:
+            # Always sample the UART, refreshing the read cache for polling clients on the way
+            responses = await asyncio.gather(*(self._submit(command, use_cache=False) for command in SNAPSHOT_COMMANDS))
+            try:
+                snapshot = PvPiSnapshot.from_responses(
+                    [response.decode() for response in responses], soc_from_voltage=self.soc_estimator
+                )
+            except ValueError:
+                _logger.warning("Failed to sample telemetry: %s", responses)
+            else:
+                self.latest_snapshot = snapshot
+                self.stats.published += 1
+                if self._shm_writer is not None:
+                    self._shm_writer.write(snapshot)
+                await self.publisher.send(snapshot.to_json().encode())
+
+            # Fixed-rate schedule; skip missed slots rather than bursting to catch up
+            next_sample_at += self.sample_period_sec
+            now = loop.time()
+            if next_sample_at < now:
+                next_sample_at = now
+            await asyncio.sleep(next_sample_at - now)
+
+    def _invalidate(self):
+        self._generation += 1
+        self._cache.clear()
+        self._in_flight.clear()  # later reads must not join a read that started before this write
+        self.stats.invalidations += 1
+
+    def _enqueue(self, message: bytes) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_SerialCommand(message=message, future=future))
+        self.stats.queue_depth = self._queue.qsize()
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, self.stats.queue_depth)
+        return future
+
+    async def _serial_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            command = await self._queue.get()
+            self.stats.queue_depth = self._queue.qsize()
+
+            started_at = time.monotonic()
+            wait_ms = (started_at - command.enqueued_at) * 1000
+            response = await loop.run_in_executor(self._executor, self._serve, command.message)
+            serial_ms = (time.monotonic() - started_at) * 1000
+
+            self.stats.requests += 1
+            self.stats.last_wait_ms = wait_ms
+            self.stats.max_wait_ms = max(self.stats.max_wait_ms, wait_ms)
+            self.stats.total_wait_ms += wait_ms
+            self.stats.last_serial_ms = serial_ms
+            self.stats.max_serial_ms = max(self.stats.max_serial_ms, serial_ms)
+            self.stats.total_serial_ms += serial_ms
+            if self._metrics is not None:
+                command_label = command_name(command.message)
+                self._metrics.queue_wait_seconds.observe(wait_ms / 1000, command=command_label)
+                self._metrics.serial_seconds.observe(serial_ms / 1000, command=command_label)
+                if response == b"":
+                    self._metrics.serial_timeouts.inc(command=command_label)
+                elif response == b"ERROR":
+                    self._metrics.serial_errors.inc(command=command_label)
+            _logger.debug(
+                "Serial command %s waited %.1f ms, took %.1f ms (queue depth %i)",
+                command.message,
+                wait_ms,
+                serial_ms,
+                self.stats.queue_depth,
+            )
+            if not command.future.done():
+                command.future.set_result(response)
+
+    def _serve(self, message: bytes) -> bytes:
+        """Forward a single command to the serial port, returning the encoded response. Runs on the serial thread."""
+        try:
+            return self._serial.write(message=message).encode()
+        except Exception:
+            _logger.warning("Failed to serve serial command %s", message)
+            self.stats.errors += 1
+            return b"ERROR"
 
     def close(self):
         _logger.info("Signal shutdown")
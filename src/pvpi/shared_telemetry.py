@@ -0,0 +1,192 @@
+"""
+Latest PV Pi telemetry in a fixed-layout shared memory segment, for zero round trip local reads.
+
+The UART proxy's sampler writes each snapshot into a small file in `/dev/shm`, which readers map. Writes are
+guarded seqlock style: the writer makes the sequence number odd, writes the record and its CRC32, then makes it
+even again. A reader copies the record and retries if the sequence number was odd or changed, or the CRC doesn't
+match; the CRC also catches torn reads where weakly ordered CPUs (the Pi's ARM cores) reorder the stores, which
+pure Python can't fence. Reads are plain memory accesses, with no system calls after the file is mapped.
+
+Layout (little-endian, `SEGMENT_SIZE` bytes):
+
+    0   8s  magic b"PVPISHM\\0"       32  i  PV mV                  56  d  SoC %
+    8   I   layout version          36  i  PV mA                  64  d  sampled at (Unix time)
+    12  I   reserved                40  i  board temperature °C   72  I  CRC32 of bytes 24-71
+    16  Q   sequence number         44  i  charge state
+    24  i   battery mV              48  i  fault code
+    28  i   battery mA              52  i  MCU clock (seconds since 2000-01-01, as read)
+"""
+
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from pvpi.client import PvPiChargeState, PvPiFaultState, PvPiSnapshot
+from pvpi.constants import DEFAULT_SHM_PATH
+from pvpi.transports import BaseTransportInterface
+
+_logger = logging.getLogger(__name__)
+
+MAGIC = b"PVPISHM\0"
+LAYOUT_VERSION = 1
+SEGMENT_SIZE = 128
+
+_HEADER = struct.Struct("<8sII")
+_SEQ = struct.Struct("<Q")
+_RECORD = struct.Struct("<7iidd")
+_CRC = struct.Struct("<I")
+SEQ_OFFSET = _HEADER.size
+RECORD_OFFSET = SEQ_OFFSET + _SEQ.size
+CRC_OFFSET = RECORD_OFFSET + _RECORD.size
+
+# Attempts to get a consistent copy before giving up. The writer only holds the record for microseconds, but may
+# be descheduled mid-write, so after spinning briefly readers back off with short sleeps (~0.1 s in total).
+_SPIN_ATTEMPTS = 100
+_READ_ATTEMPTS = 1_100
+_BACKOFF_SEC = 0.0001
+_MCU_EPOCH = datetime(2000, 1, 1)
+
+
+class SharedTelemetryWriter:
+    def __init__(self, path: str | os.PathLike = DEFAULT_SHM_PATH):
+        """
+        Publishes snapshots to the shared memory segment at `path`, creating it if needed.
+
+        An existing segment is reused rather than replaced, so long-running readers keep working across proxy
+        restarts. There must only be one writer per segment.
+        """
+        self.path = Path(path)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, SEGMENT_SIZE)
+            self._mmap = mmap.mmap(fd, SEGMENT_SIZE)
+        finally:
+            os.close(fd)
+        magic, version, _ = _HEADER.unpack_from(self._mmap, 0)
+        (seq,) = _SEQ.unpack_from(self._mmap, SEQ_OFFSET)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            seq = 0
+            _SEQ.pack_into(self._mmap, SEQ_OFFSET, seq)
+            _HEADER.pack_into(self._mmap, 0, MAGIC, LAYOUT_VERSION, 0)
+        self._seq = seq + (seq & 1)  # a writer that died mid-write left it odd
+        _logger.info("Publishing latest telemetry to shared memory at %s", self.path)
+
+    def write(self, snapshot: PvPiSnapshot):
+        record = _RECORD.pack(
+            round(snapshot.battery_voltage * 1000),
+            round(snapshot.battery_current * 1000),
+            round(snapshot.pv_voltage * 1000),
+            round(snapshot.pv_current * 1000),
+            snapshot.board_temp,
+            int(snapshot.charge_state),
+            int(snapshot.fault_code),
+            int((snapshot.mcu_time - _MCU_EPOCH).total_seconds()),
+            snapshot.soc,
+            snapshot.sampled_at.timestamp(),
+        )
+        _SEQ.pack_into(self._mmap, SEQ_OFFSET, self._seq + 1)
+        self._mmap[RECORD_OFFSET:CRC_OFFSET] = record
+        _CRC.pack_into(self._mmap, CRC_OFFSET, zlib.crc32(record))
+        self._seq += 2
+        _SEQ.pack_into(self._mmap, SEQ_OFFSET, self._seq)
+
+    def close(self):
+        self._mmap.close()
+
+
+class SharedMemoryInterface(BaseTransportInterface):
+    def __init__(self, path: str | os.PathLike = DEFAULT_SHM_PATH, max_age_sec: float | None = None):
+        """
+        Read-only transport answering telemetry reads from the shared memory segment the UART proxy writes.
+
+        `PvPiClient(SharedMemoryInterface())` serves `get_battery_voltage`, `read_snapshot` & co. with no UART or
+        proxy round trip. The proxy only writes the segment when `telemetry_publish_period` is set. Commands that
+        need the PV Pi itself, such as setters and `GET_ALIVE` (which kicks the MCU watchdog), raise ValueError.
+
+        Args:
+            path: Shared memory segment written by the UART proxy
+            max_age_sec: Raise ValueError rather than return a sample older than this
+        """
+        self.path = Path(path)
+        self.max_age_sec = max_age_sec
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), SEGMENT_SIZE, access=mmap.ACCESS_READ)
+        magic, version, _ = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{self.path} is not a v{LAYOUT_VERSION} PV Pi telemetry segment")
+
+    def close(self):
+        self._mmap.close()
+
+    def read_record(self) -> tuple:
+        """A consistent copy of the latest record: the raw `_RECORD` fields"""
+        for attempt in range(_READ_ATTEMPTS):
+            if attempt >= _SPIN_ATTEMPTS:
+                time.sleep(_BACKOFF_SEC)
+            (seq,) = _SEQ.unpack_from(self._mmap, SEQ_OFFSET)
+            if seq == 0:
+                raise ValueError(f"No telemetry has been published to {self.path} yet")
+            if seq & 1:
+                continue
+            record = self._mmap[RECORD_OFFSET:CRC_OFFSET]
+            (crc,) = _CRC.unpack_from(self._mmap, CRC_OFFSET)
+            if _SEQ.unpack_from(self._mmap, SEQ_OFFSET)[0] != seq or zlib.crc32(record) != crc:
+                continue
+            fields = _RECORD.unpack(record)
+            if self.max_age_sec is not None and time.time() - fields[-1] > self.max_age_sec:
+                raise ValueError(f"Telemetry in {self.path} is older than {self.max_age_sec}s")
+            return fields
+        raise ValueError(f"Could not get a consistent read of {self.path}")
+
+    def read_snapshot(self) -> PvPiSnapshot:
+        """The latest snapshot, including the proxy's SoC estimate"""
+        bat_mv, bat_ma, pv_mv, pv_ma, temp, charge_state, fault_code, mcu_secs, soc, sampled_at = self.read_record()
+        return PvPiSnapshot(
+            battery_voltage=bat_mv / 1000,
+            battery_current=bat_ma / 1000,
+            pv_voltage=pv_mv / 1000,
+            pv_current=pv_ma / 1000,
+            board_temp=temp,
+            soc=soc,
+            charge_state=PvPiChargeState(charge_state),
+            fault_code=PvPiFaultState(fault_code),
+            mcu_time=_MCU_EPOCH + timedelta(seconds=mcu_secs),
+            sampled_at=datetime.fromtimestamp(sampled_at),
+        )
+
+    @staticmethod
+    def _respond(message: bytes, record: tuple) -> str:
+        bat_mv, bat_ma, pv_mv, pv_ma, temp, charge_state, fault_code, mcu_secs, _, _ = record
+        if message == b"GET_BAT_V":
+            return f"MILLIVOLTS,{bat_mv}"
+        if message == b"GET_BAT_C":
+            return f"MILLIAMPS,{bat_ma}"
+        if message == b"GET_PV_V":
+            return f"MILLIVOLTS,{pv_mv}"
+        if message == b"GET_PV_C":
+            return f"MILLIAMPS,{pv_ma}"
+        if message == b"GET_TEMP":
+            return f"TEMP,{temp}"
+        if message == b"GET_CHARGE_STATE":
+            return f"CHARGE_STATE,{charge_state}"
+        if message == b"GET_FAULT_CODE":
+            return f"FAULT_CODE,{fault_code}"
+        if message == b"GET_TIME":
+            dt = _MCU_EPOCH + timedelta(seconds=mcu_secs)
+            return f"GET_TIME,{dt.year % 100},{dt.month},{dt.day},{dt.hour},{dt.minute},{dt.second}"
+        raise ValueError(f"{message!r} can't be answered from shared memory telemetry")
+
+    def write(self, message: bytes) -> str:
+        return self._respond(message, self.read_record())
+
+    def write_many(self, messages: Sequence[bytes]) -> list[str]:
+        """Answer every command from the same sample"""
+        record = self.read_record()
+        return [self._respond(message, record) for message in messages]
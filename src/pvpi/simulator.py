@@ -0,0 +1,333 @@
+"""
+Simulated PV Pi, for running the manager, proxy and benchmarks without hardware.
+
+`SimulatedPvPi` answers the PV Pi UART command set in-process and can be passed anywhere a
+`BaseTransportInterface` is expected. `SimulatedSerialDevice` serves it on a pseudo-terminal,
+so `SerialInterface` and `pvpi uart-proxy` can open it like the real `/dev/ttyAMA0`.
+"""
+
+import itertools
+import logging
+import math
+import os
+import random
+import select
+import threading
+import time
+import tty
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from pvpi.client import PvPiChargeState, PvPiClient
+from pvpi.transports import BaseTransportInterface
+
+_logger = logging.getLogger(__name__)
+
+# Resting voltage -> SoC of the simulated battery, ascending; the inverse of `PvPiClient.voltage_soc_table`
+_SOC_VOLTAGE_TABLE = sorted((soc, voltage) for voltage, soc in PvPiClient.voltage_soc_table if voltage <= 13.6)
+
+
+def _resting_voltage(soc: float) -> float:
+    for (soc1, v1), (soc2, v2) in itertools.pairwise(_SOC_VOLTAGE_TABLE):
+        if soc1 <= soc <= soc2:
+            return v1 + (v2 - v1) * (soc - soc1) / (soc2 - soc1)
+    return _SOC_VOLTAGE_TABLE[0][1] if soc < _SOC_VOLTAGE_TABLE[0][0] else _SOC_VOLTAGE_TABLE[-1][1]
+
+
+class SimulatedPvPi(BaseTransportInterface):
+    def __init__(
+        self,
+        latency_sec: float = 0.005,
+        jitter_sec: float = 0.0,
+        command_latency_sec: Mapping[str, float] | None = None,
+        time_scale: float = 1.0,
+        start_time: datetime | None = None,
+        solar_peak_w: float = 100.0,
+        sunrise_hour: float = 6.0,
+        sunset_hour: float = 18.0,
+        battery_capacity_ah: float = 100.0,
+        initial_soc: float = 60.0,
+        load_w: float = 5.0,
+        seed: int | None = None,
+    ):
+        """
+        In-process PV Pi answering the UART command set, with a solar day and a coulomb-counted battery.
+
+        Args:
+            latency_sec: Time taken to answer each command
+            jitter_sec: Standard deviation of random extra latency per command
+            command_latency_sec: Latency overrides keyed by command name, e.g. {"GET_TIME": 0.02}
+            time_scale: Simulated seconds per real second for the solar and battery curves
+            start_time: Simulated time the curves start from, defaults to now
+            solar_peak_w: PV power at solar noon
+            sunrise_hour: Hour of day PV output starts
+            sunset_hour: Hour of day PV output stops
+            battery_capacity_ah: Battery capacity
+            initial_soc: Battery state of charge (%) at `start_time`
+            load_w: Constant power drawn from the battery by the Raspberry Pi
+            seed: Seed for the jitter and measurement noise, for repeatable runs
+        """
+        self.latency_sec = latency_sec
+        self.jitter_sec = jitter_sec
+        self.command_latency_sec = dict(command_latency_sec or {})
+        self.time_scale = time_scale
+        self.solar_peak_w = solar_peak_w
+        self.sunrise_hour = sunrise_hour
+        self.sunset_hour = sunset_hour
+        self.battery_capacity_ah = battery_capacity_ah
+        self.load_w = load_w
+        self.commands_served = 0
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()  # the UART serves one command at a time
+        self._start_time = start_time or datetime.now()
+        self._start_monotonic = time.monotonic()
+        self._last_update = self._start_time
+        self._soc = initial_soc
+        self._battery_current = 0.0
+        self._mcu_clock_offset = timedelta()
+
+        # Settings written by SET_* commands
+        self.max_charge_current = 10.0  # A
+        self.max_input_current = 8.0  # A
+        self.wakeup_voltage = 13.0  # V
+        self.mppt = True
+        self.ts = True
+        self.charging = True
+        self.watchdog_period_min: int | None = None
+        self.last_watchdog_kick: datetime | None = None
+        self.alarm: tuple[int, int, int] | None = None
+        self.power_off_at: datetime | None = None
+        self.fault_code = 0
+
+    def close(self):
+        pass
+
+    def write(self, message: bytes) -> str:
+        command = message.decode().strip()
+        with self._lock:
+            time.sleep(self._latency(command.split(",", 1)[0]))
+            self.commands_served += 1
+            return self.respond(command)
+
+    # ---------------------- Simulation ---------------------- #
+    def sim_time(self) -> datetime:
+        """Current simulated time of the solar and battery curves"""
+        elapsed_sec = (time.monotonic() - self._start_monotonic) * self.time_scale
+        return self._start_time + timedelta(seconds=elapsed_sec)
+
+    def pv_power(self, at: datetime) -> float:
+        """PV power (W) at a simulated time: a half sine between sunrise and sunset"""
+        hour = at.hour + at.minute / 60 + at.second / 3600
+        if not self.sunrise_hour < hour < self.sunset_hour:
+            return 0.0
+        daylight_hours = self.sunset_hour - self.sunrise_hour
+        return self.solar_peak_w * math.sin(math.pi * (hour - self.sunrise_hour) / daylight_hours)
+
+    def _update(self):
+        """Advance the battery to the current simulated time"""
+        now = self.sim_time()
+        elapsed_h = (now - self._last_update).total_seconds() / 3600
+        self._last_update = now
+
+        voltage = _resting_voltage(self._soc)
+        charge_current = 0.0
+        if self.charging:
+            charge_current = min(self.pv_power(now) * 0.95 / voltage, self.max_charge_current)
+            if self._soc >= 99:
+                charge_current *= max(0.0, (100 - self._soc))  # taper towards full
+        self._battery_current = charge_current - self.load_w / voltage
+        self._soc = min(100.0, max(0.0, self._soc + self._battery_current * elapsed_h / self.battery_capacity_ah * 100))
+
+    def _noise(self, scale: float) -> float:
+        return self._random.gauss(0, scale)
+
+    def _latency(self, command_name: str) -> float:
+        latency = self.command_latency_sec.get(command_name, self.latency_sec)
+        if self.jitter_sec:
+            latency += abs(self._random.gauss(0, self.jitter_sec))
+        return latency
+
+    def battery_voltage(self) -> float:
+        # Terminal voltage rises while charging and sags under load
+        return _resting_voltage(self._soc) + 0.02 * self._battery_current
+
+    def pv_voltage(self) -> float:
+        return 18.0 if self.pv_power(self._last_update) > 0 else 0.4
+
+    def charge_state(self) -> PvPiChargeState:
+        if not self.charging or self._battery_current <= 0:
+            return PvPiChargeState.NotCharging
+        if self._soc >= 100:
+            return PvPiChargeState.ChargeTerminationDone
+        if self._soc >= 99:
+            return PvPiChargeState.TaperCharge
+        return PvPiChargeState.FastCharge
+
+    # ---------------------- Protocol ---------------------- #
+    def respond(self, command: str) -> str:
+        """Answer one UART command the way the PV Pi firmware does"""
+        name, *args = command.split(",")
+        self._update()
+        handler = getattr(self, f"_cmd_{name.lower()}", None)
+        if handler is None:
+            return "ERROR,UNKNOWN_COMMAND"
+        try:
+            return handler(*args)
+        except (TypeError, ValueError):
+            return f"{name},ERROR"
+
+    def _cmd_get_alive(self) -> str:
+        self.last_watchdog_kick = datetime.now()
+        return "ALIVE"
+
+    def _cmd_get_version(self) -> str:
+        return "VERSION,PV_PI_SIM,1.0,sim"
+
+    def _cmd_get_bat_v(self) -> str:
+        return f"MILLIVOLTS,{round((self.battery_voltage() + self._noise(0.005)) * 1000)}"
+
+    def _cmd_get_bat_c(self) -> str:
+        return f"MILLIAMPS,{round((self._battery_current + self._noise(0.01)) * 1000)}"
+
+    def _cmd_get_pv_v(self) -> str:
+        return f"MILLIVOLTS,{round((self.pv_voltage() + self._noise(0.01)) * 1000)}"
+
+    def _cmd_get_pv_c(self) -> str:
+        pv_current = min(self.pv_power(self._last_update) / self.pv_voltage(), self.max_input_current)
+        return f"MILLIAMPS,{round(max(0.0, pv_current + self._noise(0.005)) * 1000)}"
+
+    def _cmd_get_temp(self) -> str:
+        return f"TEMP,{round(25 + self.pv_power(self._last_update) * 0.1)}"
+
+    def _cmd_get_charge_state(self) -> str:
+        return f"CHARGE_STATE,{int(self.charge_state())}"
+
+    def _cmd_get_fault_code(self) -> str:
+        return f"FAULT_CODE,{self.fault_code}"
+
+    def _cmd_get_time(self) -> str:
+        now = datetime.now() + self._mcu_clock_offset
+        return f"GET_TIME,{now.year % 100},{now.month},{now.day},{now.hour},{now.minute},{now.second}"
+
+    def _cmd_set_time(self, year: str, month: str, day: str, hour: str, minute: str, second: str) -> str:
+        mcu_time = datetime(2000 + int(year), int(month), int(day), int(hour), int(minute), int(second))
+        self._mcu_clock_offset = mcu_time - datetime.now().replace(microsecond=0)
+        return "SET_TIME,OK"
+
+    def _cmd_set_alarm(self, hour: str, minute: str, second: str) -> str:
+        self.alarm = (int(hour), int(minute), int(second))
+        return "SET_ALARM,OK"
+
+    def _cmd_power_off(self, delay_s: str) -> str:
+        if not 1 <= int(delay_s) <= 60:
+            raise ValueError
+        self.power_off_at = datetime.now() + timedelta(seconds=int(delay_s))
+        return "POWER_OFF,OK"
+
+    def _cmd_watchdog_on(self, period_min: str) -> str:
+        if not 1 <= int(period_min) <= 60:
+            raise ValueError
+        self.watchdog_period_min = int(period_min)
+        self.last_watchdog_kick = datetime.now()
+        return "WATCHDOG_ON,OK"
+
+    def _cmd_watchdog_off(self) -> str:
+        self.watchdog_period_min = None
+        return "WATCHDOG_OFF,OK"
+
+    def _cmd_set_wakeup_millivolt(self, millivolts: str) -> str:
+        self.wakeup_voltage = float(millivolts) / 1000
+        return "SET_WAKEUP_MILLIVOLT,OK"
+
+    def _cmd_set_charge_milliamps(self, milliamps: str) -> str:
+        self.max_charge_current = float(milliamps) / 1000
+        return "SET_CHARGE_MILLIAMPS,OK"
+
+    def _cmd_set_input_milliamps(self, milliamps: str) -> str:
+        self.max_input_current = float(milliamps) / 1000
+        return "SET_INPUT_MILLIAMPS,OK"
+
+    def _on_off(self, state: str) -> bool:
+        if state not in ("ON", "OFF"):
+            raise ValueError
+        return state == "ON"
+
+    def _cmd_set_mppt_state(self, state: str) -> str:
+        self.mppt = self._on_off(state)
+        return "SET_MPPT_STATE,OK"
+
+    def _cmd_set_ts_state(self, state: str) -> str:
+        self.ts = self._on_off(state)
+        return "SET_TS_STATE,OK"
+
+    def _cmd_set_charge_state(self, state: str) -> str:
+        self.charging = self._on_off(state)
+        return "SET_CHARGE_STATE,OK"
+
+
+class SimulatedSerialDevice:
+    # The UART commands are unterminated, so a command ends when the line goes quiet for this long
+    COMMAND_GAP_SEC = 0.002
+
+    def __init__(self, pvpi: SimulatedPvPi | None = None, link: Path | None = None):
+        """
+        Serves a `SimulatedPvPi` on a pseudo-terminal that `SerialInterface` can open as its port.
+
+        Args:
+            pvpi: Simulated device to serve, a default one is created if not given
+            link: Optional fixed path symlinked to the pty, e.g. for `uart_port` in config.json
+        """
+        self.pvpi = pvpi or SimulatedPvPi()
+        self.link = Path(link) if link else None
+        self._master_fd, self._slave_fd = os.openpty()
+        tty.setraw(self._slave_fd)
+        self.pty_path = os.ttyname(self._slave_fd)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, name="pvpi-sim-serial", daemon=True)
+
+    @property
+    def port(self) -> str:
+        """Serial port path to open"""
+        return str(self.link) if self.link else self.pty_path
+
+    def start(self) -> "SimulatedSerialDevice":
+        if self.link:
+            self.link.unlink(missing_ok=True)
+            self.link.symlink_to(self.pty_path)
+        self._thread.start()
+        _logger.info("Simulated PV Pi serving on %s", self.port)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if self.link and self.link.is_symlink():
+            self.link.unlink()
+        os.close(self._master_fd)
+        os.close(self._slave_fd)
+
+    def __enter__(self) -> "SimulatedSerialDevice":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _serve(self):
+        buffer = b""
+        while not self._stop.is_set():
+            # Block until a command starts, then read until the line goes quiet
+            timeout = self.COMMAND_GAP_SEC if buffer else 0.1
+            readable, _, _ = select.select([self._master_fd], [], [], timeout)
+            if readable:
+                buffer += os.read(self._master_fd, 4096)
+                continue
+            command = buffer.strip()
+            buffer = b""
+            if not command:
+                continue
+            response = self.pvpi.write(command)
+            _logger.debug("Simulated PV Pi: %s -> %s", command, response)
+            os.write(self._master_fd, response.encode() + b"\r\n")
@@ -0,0 +1,258 @@
+"""
+Battery State of Charge (SoC) estimated from voltage, for a single reading or a whole logged series at once.
+
+Voltage → SoC tables are per cell, so one table covers every pack of that chemistry: `SocEstimator("lifepo4", 4)`
+is a 12 V LiFePO4 battery. Between table points the SoC is interpolated linearly; outside the table it is clamped to
+the nearest end. Single readings are a bisect in pure Python, whole series one `numpy.interp` call, so the proxy's
+per-sample path doesn't need numpy.
+
+Voltage only reflects SoC once the battery has rested, so `CoulombCounter` tracks it under load by integrating the
+battery current, re-anchoring on the voltage estimate whenever the battery rests.
+"""
+
+import bisect
+import json
+import logging
+import os
+from collections.abc import Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from pvpi.client import PvPiSnapshot
+    from pvpi.config import PvPiConfig
+
+_logger = logging.getLogger(__name__)
+
+Chemistry = Literal["lifepo4", "lead_acid", "li_ion"]
+
+# Per-cell voltage → SoC (%) tables, descending
+SOC_TABLES: dict[str, tuple[tuple[float, float], ...]] = {
+    # 3.2 V nominal; 3.6 V is the charge voltage, above 3.4 V the cell is full but still settling
+    "lifepo4": (
+        (3.6, 100),
+        (3.4, 100),
+        (3.35, 99),
+        (3.325, 90),
+        (3.3, 80),
+        (3.275, 70),
+        (3.25, 60),
+        (3.225, 50),
+        (3.2, 40),
+        (3.175, 30),
+        (3.15, 20),
+        (3.125, 15),
+        (3.1, 10),
+        (3.0, 0),
+    ),
+    # 2 V nominal flooded / AGM, resting voltages
+    "lead_acid": (
+        (2.12, 100),
+        (2.09, 90),
+        (2.07, 80),
+        (2.05, 70),
+        (2.03, 60),
+        (2.01, 50),
+        (1.98, 40),
+        (1.96, 30),
+        (1.93, 20),
+        (1.89, 10),
+        (1.75, 0),
+    ),
+    # 3.6-3.7 V nominal NMC
+    "li_ion": (
+        (4.2, 100),
+        (4.1, 90),
+        (4.0, 80),
+        (3.92, 70),
+        (3.85, 60),
+        (3.79, 50),
+        (3.74, 40),
+        (3.7, 30),
+        (3.65, 20),
+        (3.55, 10),
+        (3.0, 0),
+    ),
+}
+
+
+class SocEstimator:
+    def __init__(
+        self, chemistry: Chemistry = "lifepo4", cells: int = 4, table: Sequence[tuple[float, float]] | None = None
+    ):
+        """
+        Voltage → SoC (%) of a battery of `cells` cells in series. Call it with a voltage, or use `estimate` for
+        whole arrays and Series.
+
+        Args:
+            chemistry: Key of `SOC_TABLES`
+            cells: Cells in series, e.g. 4 for a 12 V LiFePO4 battery
+            table: Per-cell (voltage, SoC %) points to use instead of the chemistry's table, in any order
+        """
+        points = sorted(SOC_TABLES[chemistry] if table is None else table)
+        if len(points) < 2 or len({voltage for voltage, _ in points}) != len(points):
+            raise ValueError("SoC table needs at least two points with distinct voltages")
+        if cells < 1:
+            raise ValueError("cells must be at least 1")
+        self.chemistry = chemistry
+        self.cells = cells
+        # Pack voltages, ascending
+        self.voltages = tuple(voltage * cells for voltage, _ in points)
+        self.socs = tuple(float(soc) for _, soc in points)
+
+    @classmethod
+    def from_config(cls, config: "PvPiConfig") -> "SocEstimator":
+        return cls(config.battery_chemistry, config.battery_cells, config.soc_table)
+
+    def __call__(self, voltage: float) -> float:
+        """SoC (%) of one battery voltage"""
+        i = bisect.bisect_right(self.voltages, voltage)
+        if i == 0:
+            return self.socs[0]
+        if i == len(self.voltages):
+            return self.socs[-1]
+        v1, v2 = self.voltages[i - 1], self.voltages[i]
+        soc1, soc2 = self.socs[i - 1], self.socs[i]
+        return round(soc1 + (soc2 - soc1) * (voltage - v1) / (v2 - v1), 2)
+
+    def estimate(self, voltages):
+        """
+        SoC (%) of every voltage in an array-like at once, as a numpy array, or as a Series named "SoC" sharing the
+        index of a Series argument. NaN voltages give NaN.
+        """
+        import numpy as np
+
+        socs = np.round(np.interp(voltages, self.voltages, self.socs), 2)
+        if hasattr(voltages, "index"):
+            import pandas as pd
+
+            return pd.Series(socs, index=voltages.index, name="SoC")
+        return socs
+
+    def add_soc_column(
+        self, frame: "pd.DataFrame", voltage_column: str = "Battery Voltage", name: str = "SoC"
+    ) -> "pd.DataFrame":
+        """Copy of a telemetry frame (raw log or rollup) with an SoC history column estimated from `voltage_column`"""
+        return frame.assign(**{name: self.estimate(frame[voltage_column])})
+
+
+class CoulombCounter:
+    def __init__(
+        self,
+        capacity_ah: float,
+        voltage_estimator: SocEstimator | None = None,
+        state_path: str | os.PathLike | None = None,
+        rest_current_a: float = 0.1,
+        rest_sec: float = 1800,
+        max_gap_sec: float = 3600,
+        checkpoint_interval_sec: float = 300,
+    ):
+        """
+        Battery SoC (%) tracked by integrating battery current, O(1) per sample.
+
+        Once the current has stayed within `rest_current_a` for `rest_sec`, the SoC is re-anchored on the voltage
+        estimate, which also corrects the drift of the integration. Before the first anchor it starts from the
+        voltage estimate of the first sample. Samples more than `max_gap_sec` apart (e.g. across a shutdown) aren't
+        integrated between. The state is checkpointed to `state_path` every `checkpoint_interval_sec` of samples,
+        so a restart carries on from the checkpoint.
+
+        Args:
+            capacity_ah: Usable battery capacity in Ah
+            voltage_estimator: Rested voltage → SoC, by default 12V LiFePO4
+            state_path: JSON file to checkpoint to and resume from (None keeps the state in memory only)
+            rest_current_a: Largest current, either way, at which the battery counts as resting
+            rest_sec: Time the battery must rest before its voltage is trusted
+            max_gap_sec: Longest gap between samples to integrate over
+            checkpoint_interval_sec: Sample time between checkpoints
+        """
+        if capacity_ah <= 0:
+            raise ValueError("capacity_ah must be positive")
+        self.capacity_ah = capacity_ah
+        self.voltage_estimator = voltage_estimator or SocEstimator()
+        self.state_path = Path(state_path) if state_path is not None else None
+        self.rest_current_a = rest_current_a
+        self.rest_sec = rest_sec
+        self.max_gap_sec = max_gap_sec
+        self.checkpoint_interval_sec = checkpoint_interval_sec
+
+        self.soc: float | None = None
+        self.anchored_at: float | None = None  # Unix time of the last rested-voltage anchor
+        self._last_at: float | None = None
+        self._last_current = 0.0
+        self._rest_since: float | None = None
+        self._checkpointed_at = float("-inf")
+        if self.state_path is not None:
+            self._restore()
+
+    def update(self, voltage: float, current: float, at: float) -> float:
+        """
+        Count one sample in, returning the updated SoC (%).
+
+        Args:
+            voltage: Battery voltage (V)
+            current: Battery current (A), positive when charging
+            at: Unix time of the sample
+        """
+        elapsed_sec = at - self._last_at if self._last_at is not None else None
+        continuous = elapsed_sec is not None and 0 < elapsed_sec <= self.max_gap_sec
+        if self.soc is None:
+            self.soc = self.voltage_estimator(voltage)
+        elif continuous:
+            # Trapezoidal rule, between the previous sample's current and this one's
+            amp_hours = (self._last_current + current) / 2 * elapsed_sec / 3600
+            self.soc = min(100.0, max(0.0, self.soc + amp_hours / self.capacity_ah * 100))
+
+        if abs(current) > self.rest_current_a:
+            self._rest_since = None
+        elif self._rest_since is None or not continuous:
+            self._rest_since = at
+        if self._rest_since is not None and at - self._rest_since >= self.rest_sec:
+            self.soc = self.voltage_estimator(voltage)
+            self.anchored_at = at
+
+        self._last_at, self._last_current = at, current
+        if self.state_path is not None and at - self._checkpointed_at >= self.checkpoint_interval_sec:
+            self.checkpoint()
+        return round(self.soc, 2)
+
+    def update_from_snapshot(self, snapshot: "PvPiSnapshot") -> float:
+        return self.update(snapshot.battery_voltage, snapshot.battery_current, snapshot.sampled_at.timestamp())
+
+    def checkpoint(self):
+        """Atomically write the state to `state_path`"""
+        if self.state_path is None or self.soc is None:
+            return
+        state = {
+            "soc": self.soc,
+            "anchored_at": self.anchored_at,
+            "last_at": self._last_at,
+            "last_current": self._last_current,
+            "rest_since": self._rest_since,
+        }
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_name(f"{self.state_path.name}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+        self._checkpointed_at = self._last_at if self._last_at is not None else float("-inf")
+
+    def _restore(self):
+        try:
+            state = json.loads(self.state_path.read_text())
+            soc = float(state["soc"])
+            anchored_at, last_at, rest_since = state["anchored_at"], state["last_at"], state["rest_since"]
+            last_current = float(state["last_current"])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, TypeError, KeyError):
+            _logger.warning("Ignoring unreadable SoC checkpoint %s", self.state_path)
+            return
+        self.soc = min(100.0, max(0.0, soc))
+        self.anchored_at, self._last_at, self._rest_since = anchored_at, last_at, rest_since
+        self._last_current = last_current
+        self._checkpointed_at = last_at if last_at is not None else float("-inf")
+        _logger.info("Resuming coulomb-counted SoC of %.2f %% from %s", self.soc, self.state_path)
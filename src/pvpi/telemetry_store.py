@@ -0,0 +1,216 @@
+"""
+Append-only binary telemetry store.
+
+One file per day (`YYYY-MM-DD.tlm`), made of a header (a multiple of 256 bytes, recorded in the header itself)
+followed by fixed-width little-endian records:
+an int64 timestamp (nanoseconds since the Unix epoch) and one float32 per channel. Readers memory-map the
+records straight into a NumPy structured array, so loading history involves no text parsing.
+"""
+
+import logging
+import os
+import struct
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from pvpi.logging_ import GroupCommit, set_aside
+from pvpi.utils import local_timezone
+
+_logger = logging.getLogger(__name__)
+
+FILE_SUFFIX = ".tlm"
+MAGIC = b"PVPITLM\x00"
+VERSION = 1
+HEADER_SIZE = 256  # header block size; headers with many channel names take several blocks
+# magic, version, channel count, header size; followed by NUL-separated UTF-8 channel names
+_HEADER_STRUCT = struct.Struct("<8sHHI")
+
+DEFAULT_CHANNELS = (
+    "Battery Voltage",
+    "Battery Current",
+    "PV Voltage",
+    "PV Current",
+    "PV PI Temperature",
+)
+
+
+def _encode_header(channels: Sequence[str]) -> bytes:
+    names = "\x00".join(channels).encode()
+    header_size = -(-(_HEADER_STRUCT.size + len(names)) // HEADER_SIZE) * HEADER_SIZE
+    header = _HEADER_STRUCT.pack(MAGIC, VERSION, len(channels), header_size) + names
+    return header.ljust(header_size, b"\x00")
+
+
+def _read_header(path: Path) -> tuple[tuple[str, ...], int]:
+    """Return the channel names and header size of a telemetry file"""
+    with path.open("rb") as f:
+        header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f"Truncated telemetry file header: {path}")
+        magic, version, n_channels, header_size = _HEADER_STRUCT.unpack_from(header)
+        if magic != MAGIC or version != VERSION or header_size < HEADER_SIZE or header_size % HEADER_SIZE:
+            raise ValueError(f"Not a version {VERSION} telemetry file: {path}")
+        header += f.read(header_size - HEADER_SIZE)
+    if len(header) < header_size:
+        raise ValueError(f"Truncated telemetry file header: {path}")
+    names = header[_HEADER_STRUCT.size :].rstrip(b"\x00").decode().split("\x00")
+    if len(names) != n_channels:
+        raise ValueError(f"Corrupt telemetry file header: {path}")
+    return tuple(names), header_size
+
+
+def read_header(path: Path) -> tuple[str, ...]:
+    """Return the channel names of a telemetry file"""
+    return _read_header(path)[0]
+
+
+class BinaryTelemetryLogger:
+    def __init__(
+        self,
+        log_dir: Path,
+        retention_days: int = 7,
+        channels: Sequence[str] = DEFAULT_CHANNELS,
+        flush_interval_sec: float = 0,
+        fsync: bool = False,
+    ):
+        """
+        Daily fixed-record binary logger with automatic deletion of old files.
+
+        Args:
+            log_dir: Directory to store telemetry files
+            retention_days: Number of days to keep old files
+            channels: Names of the float32 channels stored in each record
+            flush_interval_sec: Group commit interval; records may be lost on a crash for up to this long
+            fsync: fsync each group commit so it also survives a power cut
+        """
+        self.log_dir = log_dir
+        self.log_dir.mkdir(exist_ok=True)
+        self.retention_days = retention_days
+        self.channels = tuple(channels)
+        self._record = struct.Struct(f"<q{len(self.channels)}f")
+        self._commit = GroupCommit(flush_interval_sec=flush_interval_sec, fsync=fsync)
+        self._file = None
+        self._file_day: str | None = None
+        self.cleanup_old_logs()
+
+    def log_stats(self, bat_v: float, bat_c: float, pv_v: float, pv_c: float, temp):
+        self.log_values([bat_v, bat_c, pv_v, pv_c, temp])
+
+    def log_values(self, values: Sequence[float], timestamp: datetime | None = None):
+        """Append one record; `values` are in `channels` order"""
+        timestamp = timestamp or datetime.now()
+        timestamp_ns = round(timestamp.timestamp() * 1e6) * 1000  # float seconds only hold microseconds exactly
+        self._get_file(timestamp).write(self._record.pack(timestamp_ns, *values))
+        self._commit.wrote(self._file)
+
+    def flush(self):
+        """Commit buffered records now"""
+        self._commit.flush(self._file)
+
+    def flush_if_due(self):
+        """Commit buffered records if the flush interval has passed"""
+        self._commit.flush_if_due(self._file)
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+            self._file_day = None
+
+    def cleanup_old_logs(self):
+        """Delete telemetry files older than retention_days."""
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        for file in self.log_dir.glob(f"*{FILE_SUFFIX}"):
+            try:
+                file_date = datetime.strptime(file.stem[:10], "%Y-%m-%d")
+                if file_date < cutoff:
+                    file.unlink()
+            except ValueError:
+                # Skip files that don't match the date pattern
+                continue
+
+    def _get_file(self, timestamp: datetime):
+        """Return the open file for the timestamp's day, rolling over (and sweeping old files) on a new day"""
+        day = timestamp.strftime("%Y-%m-%d")
+        if day == self._file_day:
+            return self._file
+
+        self.close()
+        self.cleanup_old_logs()
+        path = self.log_dir / f"{day}{FILE_SUFFIX}"
+        if path.exists() and path.stat().st_size >= HEADER_SIZE:
+            channels, header_size = _read_header(path)
+            if channels != self.channels:
+                set_aside(path)
+                return self._open_new(path, day)
+            # Drop a record torn by a power cut, so later records stay aligned
+            torn = (path.stat().st_size - header_size) % self._record.size
+            if torn:
+                _logger.warning("Truncating %i byte torn record from %s", torn, path)
+                os.truncate(path, path.stat().st_size - torn)
+            self._file = path.open("ab")
+            self._file_day = day
+            return self._file
+        return self._open_new(path, day)
+
+    def _open_new(self, path: Path, day: str):
+        self._file = path.open("wb")
+        self._file.write(_encode_header(self.channels))
+        self._file_day = day
+        return self._file
+
+
+def read_records(path: Path):
+    """Memory-map a telemetry file's records as a NumPy structured array (`Timestamp` + one field per channel)"""
+    import numpy as np
+
+    channels, header_size = _read_header(path)
+    dtype = np.dtype([("Timestamp", "<i8")] + [(name, "<f4") for name in channels])
+    n_records = (path.stat().st_size - header_size) // dtype.itemsize  # ignores a torn trailing record
+    if n_records <= 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=header_size, shape=(n_records,))
+
+
+def records_to_frame(records):
+    """Convert structured records to a DataFrame with naive local `Timestamp`s, matching the CSV logs"""
+    import pandas as pd
+
+    frame = pd.DataFrame({name: records[name] for name in records.dtype.names if name != "Timestamp"})
+    timestamps = pd.to_datetime(records["Timestamp"], unit="ns", utc=True)
+    frame.insert(0, "Timestamp", timestamps.tz_convert(local_timezone()).tz_localize(None))
+    return frame
+
+
+def list_files(log_dir: Path) -> list[Path]:
+    return sorted(Path(log_dir).glob(f"*{FILE_SUFFIX}"))
+
+
+def load_telemetry(log_dir: Path):
+    """Load every telemetry file in `log_dir` into one DataFrame sorted by `Timestamp`, or None if there are none"""
+    import numpy as np
+    import pandas as pd
+
+    arrays = []
+    for path in list_files(log_dir):
+        try:
+            records = read_records(path)
+        except (OSError, ValueError):
+            _logger.warning("Skipping unreadable telemetry file %s", path)
+            continue
+        if len(records):
+            arrays.append(records)
+
+    if not arrays:
+        return None
+    if len({records.dtype for records in arrays}) > 1:
+        # Channel layout changed between days; keep the channels common to every file
+        frame = pd.concat([records_to_frame(records) for records in arrays], join="inner", ignore_index=True)
+    else:
+        frame = records_to_frame(np.concatenate(arrays))
+    # Files are named by day, so name order is normally already time order
+    if frame["Timestamp"].is_monotonic_increasing:
+        return frame
+    return frame.sort_values("Timestamp", kind="stable", ignore_index=True)
@@ -1,20 +1,32 @@
+import itertools
+import json
 import logging
 import os
+import socket
+import time
+from collections.abc import Sequence
 from typing import Protocol
 
 import serial
 import zmq
-import zmq.asyncio
 
+from pvpi.constants import DEFAULT_PROXY_ADDR, DEFAULT_PROXY_IPC_ADDR, DEFAULT_TELEMETRY_ADDR
 from pvpi.utils import default_uart_port
 
 _logger = logging.getLogger(__name__)
 
+# Heartbeat wait when probing for a running proxy; it answers heartbeats without the UART
+PROXY_PROBE_TIMEOUT_MS = 500
+
 
 class BaseTransportInterface(Protocol):
     def write(self, message: bytes) -> str: ...
     def close(self) -> None: ...
 
+    def write_many(self, messages: Sequence[bytes]) -> list[str]:
+        """Send several commands in one exchange, returning responses in request order."""
+        return [self.write(message) for message in messages]
+
 
 # TODO service stop
 # TODO serial not found or similar
@@ -50,22 +62,86 @@ class SerialInterface(BaseTransportInterface):
             raise
 
 
-class ZmqSerialProxyInterface(BaseTransportInterface):
-    def __init__(self, addr: str = "tcp://127.0.0.1:5555", recv_timeout_ms=10_000):
-        self.addr = addr
+# Client <-> proxy framing. Every request is a multipart message `[seq, *commands]` and every reply is
+# `[seq, *responses]`, one response frame per command frame. `seq` is the ASCII request sequence number,
+# echoed back by the proxy so replies can be matched to requests. A heartbeat is the single empty command.
+_instance_ids = itertools.count()
+
+
+def _new_client_id(kind: str) -> bytes:
+    """A DEALER identity unique to this interface instance"""
+    return f"client_pid#{os.getpid()}#{kind}{next(_instance_ids)}".encode()
+
+
+def _decode_reply(frames: list[bytes]) -> tuple[int, list[bytes]]:
+    seq, *responses = frames
+    return int(seq), responses
+
 
-        _logger.info("Connecting to socket at %s", addr)
+def proxy_listening(addr: str = DEFAULT_PROXY_ADDR, timeout_sec: float = 0.2) -> bool:
+    """
+    Quick check that something accepts connections at a `tcp://` or `ipc://` proxy address.
+
+    ZMQ connects lazily and retries forever, so without this a missing proxy only shows up as a heartbeat timeout.
+    Other transports can't be checked this way and are assumed to be listening.
+    """
+    scheme, _, endpoint = addr.partition("://")
+    try:
+        if scheme == "ipc":
+            with socket.socket(socket.AF_UNIX) as sock:
+                sock.settimeout(timeout_sec)
+                sock.connect(endpoint)
+            return True
+        if scheme == "tcp":
+            host, _, port = endpoint.rpartition(":")
+            with socket.create_connection((host, int(port)), timeout=timeout_sec):
+                return True
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def listening_proxy_addr() -> str | None:
+    """The first of the proxy's IPC and loopback TCP endpoints that is listening, probing each at most once"""
+    for addr in (DEFAULT_PROXY_IPC_ADDR, DEFAULT_PROXY_ADDR):
+        if proxy_listening(addr):
+            return addr
+    return None
+
+
+def default_proxy_addr() -> str:
+    """The proxy's IPC endpoint if it is listening there, else its loopback TCP endpoint"""
+    return DEFAULT_PROXY_IPC_ADDR if proxy_listening(DEFAULT_PROXY_IPC_ADDR) else DEFAULT_PROXY_ADDR
+
+
+class ZmqSerialProxyInterface(BaseTransportInterface):
+    def __init__(self, addr: str | None = None, recv_timeout_ms=10_000, probe_timeout_ms: int | None = None):
+        """
+        Args:
+            addr: UART proxy address, by default its IPC endpoint if it is listening there, else loopback TCP
+            recv_timeout_ms: How long to wait for replies to commands, which may queue behind other clients'
+            probe_timeout_ms: How long to wait for the connection heartbeat, by default `recv_timeout_ms`. Transport
+                discovery uses the shorter `PROXY_PROBE_TIMEOUT_MS`, which suits a proxy that is already running.
+        """
+        self.addr = addr or default_proxy_addr()
+        self.recv_timeout_ms = recv_timeout_ms
+
+        _logger.info("Connecting to socket at %s", self.addr)
         self.context = zmq.Context()
         self.socket = self.context.socket(zmq.DEALER)
-        self.client_id = f"client_pid#{os.getpid()}".encode()
+        self.client_id = _new_client_id("sync")
         self.socket.setsockopt(zmq.IDENTITY, self.client_id)
         self.socket.setsockopt(zmq.LINGER, 0)
         self.socket.setsockopt(zmq.CONNECT_TIMEOUT, 2_000)  # ms
-        self.socket.setsockopt(zmq.RCVTIMEO, recv_timeout_ms)  # ms
         self.socket.connect(self.addr)
         _logger.info("Socket connected")
 
-        if not self.send_heartbeat():
+        self._seq = itertools.count(1)
+        self._outstanding: dict[int, int] = {}  # seq -> number of commands
+        self._replies: dict[int, list[bytes]] = {}  # replies received while waiting for another request
+
+        if not self.send_heartbeat(timeout_ms=probe_timeout_ms):
+            self.close()
             raise ValueError("ZmqSerialProxyInterface failed heartbeat")
 
     def close(self):
@@ -73,21 +149,80 @@ class ZmqSerialProxyInterface(BaseTransportInterface):
         self.socket.close()
         self.context.term()
 
-    def send_heartbeat(self) -> bool:
+    def send_heartbeat(self, timeout_ms: int | None = None) -> bool:
         try:
             _logger.info("Sending heartbeat")
-            return self.write(b"") == ""
+            return self.recv_response(self.send_request([b""]), timeout_ms) == [""]
         except Exception:
             _logger.debug("Heartbeat failed to respond")
             return False
 
-    def write(self, message: bytes) -> str:
-        self.socket.send_multipart([message])
-        _logger.debug("Written to proxy: %s", message)
+    def get_proxy_stats(self) -> dict:
+        """Return the proxy's serial queue depth and wait time statistics"""
+        return json.loads(self.write(b"PROXY_STATS"))
+
+    def send_request(self, messages: Sequence[bytes]) -> int:
+        """Send commands without waiting for the reply, returning the request's sequence number"""
+        seq = next(self._seq)
+        self.socket.send_multipart([str(seq).encode(), *messages])
+        self._outstanding[seq] = len(messages)
+        _logger.debug("Written to proxy [%i]: %s", seq, messages)
+        return seq
+
+    def recv_response(self, seq: int, timeout_ms: int | None = None) -> list[str]:
+        """Wait for the reply to request `seq`, buffering replies to other outstanding requests"""
+        deadline = time.monotonic() + (self.recv_timeout_ms if timeout_ms is None else timeout_ms) / 1000
         try:
-            response = b"".join(self.socket.recv_multipart())
-            _logger.debug("Received from proxy: %s", response)
-        except zmq.Again:
-            _logger.debug("Timed out waiting for response from zmq-serial proxy")
-            raise
-        return response.decode()
+            while seq not in self._replies:
+                remaining_ms = max(0, int((deadline - time.monotonic()) * 1000))
+                if not self.socket.poll(remaining_ms, zmq.POLLIN):
+                    _logger.debug("Timed out waiting for response from zmq-serial proxy")
+                    raise zmq.Again("Timed out waiting for response from zmq-serial proxy")
+                reply_seq, responses = _decode_reply(self.socket.recv_multipart())
+                if reply_seq not in self._outstanding:
+                    _logger.debug("Discarding stale reply [%i] from proxy", reply_seq)
+                    continue
+                self._replies[reply_seq] = responses
+        finally:
+            expected = self._outstanding.pop(seq)
+        responses = self._replies.pop(seq)
+        _logger.debug("Received from proxy [%i]: %s", seq, responses)
+        if len(responses) != expected:
+            raise ValueError(f"Expected {expected} responses from proxy, got {len(responses)}")
+        return [response.decode() for response in responses]
+
+    def write(self, message: bytes) -> str:
+        return self.write_many([message])[0]
+
+    def write_many(self, messages: Sequence[bytes]) -> list[str]:
+        if not messages:
+            return []
+        return self.recv_response(self.send_request(messages))
+
+
+class ZmqTelemetrySubscriber:
+    """SUB socket receiving the JSON telemetry snapshots published by the UART proxy"""
+
+    def __init__(self, addr: str = DEFAULT_TELEMETRY_ADDR, conflate: bool = False, recv_timeout_ms: int | None = None):
+        self.addr = addr
+        self.recv_timeout_ms = recv_timeout_ms
+
+        _logger.info("Subscribing to telemetry at %s", addr)
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.SUB)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        if conflate:
+            self.socket.setsockopt(zmq.CONFLATE, 1)
+        self.socket.setsockopt(zmq.SUBSCRIBE, b"")
+        self.socket.connect(self.addr)
+
+    def close(self):
+        _logger.info("Closing telemetry socket...")
+        self.socket.close()
+        self.context.term()
+
+    def recv(self) -> bytes | None:
+        """Return the next published snapshot, or None if none arrives within `recv_timeout_ms`"""
+        if self.recv_timeout_ms is not None and not self.socket.poll(self.recv_timeout_ms, zmq.POLLIN):
+            return None
+        return self.socket.recv()
@@ -3,12 +3,14 @@ import os
 import platform
 import subprocess
 import sys
-from datetime import datetime
+from datetime import datetime, tzinfo
 from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 _logger = logging.getLogger(__name__)
 
 _MODEL_PATH = "/proc/device-tree/model"
+_LOCALTIME_PATH = "/etc/localtime"
 
 
 def set_system_time(dt: datetime) -> bool:
@@ -47,3 +49,17 @@ def is_linux() -> bool:
 
     # paranoia tier
     return os.name == "posix" and platform.system() == "Linux"
+
+
+@lru_cache(maxsize=1)
+def local_timezone() -> tzinfo:
+    """Return the host's local timezone, including its DST rules where the system provides them."""
+    # /etc/localtime links into the tz database, e.g. /usr/share/zoneinfo/Australia/Melbourne
+    _, found, key = os.path.realpath(_LOCALTIME_PATH).partition("zoneinfo/")
+    try:
+        if found:
+            return ZoneInfo(key)
+    except (ValueError, ZoneInfoNotFoundError):
+        pass
+    _logger.debug("Could not resolve timezone from %s; falling back to the current UTC offset", _LOCALTIME_PATH)
+    return datetime.now().astimezone().tzinfo